@@ -0,0 +1,57 @@
+from pathlib import Path
+from typing import Annotated, Optional
+
+import typer
+
+from .harness import (
+    compare,
+    format_comparison,
+    format_results,
+    read_results,
+    run_benchmarks,
+    write_results,
+)
+
+app = typer.Typer()
+
+
+@app.command()
+def main(
+    pattern: Annotated[
+        Optional[str],
+        typer.Option("--filter", "-k", help="Only run cases whose names contain this"),
+    ] = None,
+    repeat: Annotated[int, typer.Option(help="Timed runs of each case")] = 5,
+    quick: Annotated[
+        bool, typer.Option(help="Only run the smallest size of each benchmark")
+    ] = False,
+    output: Annotated[
+        Optional[Path], typer.Option("--output", "-o", help="Write results as JSON")
+    ] = None,
+    baseline: Annotated[
+        Optional[Path],
+        typer.Option(help="Results from an earlier --output to compare against"),
+    ] = None,
+    threshold: Annotated[
+        float,
+        typer.Option(help="Fail when a median is this many times the baseline's"),
+    ] = 1.25,
+):
+    """Benchmark settings, resources, synth and CLI start up"""
+    from . import suite  # noqa: F401, registers the benchmarks
+
+    results = run_benchmarks(pattern, repeat=repeat, quick=quick, echo=typer.echo)
+    if output:
+        write_results(results, output)
+    if not baseline:
+        typer.echo(format_results(results))
+        return
+    rows = compare(results, read_results(baseline), threshold)
+    typer.echo(format_comparison(rows))
+    slower = [row[0] for row in rows if row[4] == "slower"]
+    if slower:
+        typer.echo(f"Slower than the baseline: {', '.join(slower)}")
+        raise typer.Exit(1)
+
+
+app()
@@ -0,0 +1,155 @@
+import inspect
+import json
+import platform
+import statistics
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+from importlib.metadata import PackageNotFoundError, version
+
+# Registered benchmarks by name, see benchmark()
+BENCHMARKS = {}
+
+
+def benchmark(params=(None,), warmup=True):
+    """Register a benchmark, run once for each of params
+
+    The decorated function does any setup for one param and returns a
+    callable, which is what's timed. Functions that need to clean up after
+    it's timed yield it instead. Set warmup=False when the first call is
+    the one that matters, eg. for cold starts.
+    """
+
+    def register(func):
+        BENCHMARKS[func.__name__] = (func, list(params), warmup)
+        return func
+
+    return register
+
+
+def case_name(name, param):
+    return name if param is None else f"{name}[{param}]"
+
+
+def set_up(func, param):
+    """A context giving the callable func sets up for param"""
+    if inspect.isgeneratorfunction(func):
+        return contextmanager(func)(param)
+    return nullcontext(func(param))
+
+
+def time_case(run, repeat, warmup):
+    if warmup:
+        run()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return {
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.mean(times),
+        "stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "runs": len(times),
+    }
+
+
+def run_benchmarks(pattern=None, repeat=5, quick=False, echo=print):
+    """Time the registered benchmarks whose case names contain pattern
+
+    quick only runs the first, smallest, param of each. Returns results by
+    case name, in seconds.
+    """
+    results = {}
+    for name, (func, params, warmup) in BENCHMARKS.items():
+        for param in params[:1] if quick else params:
+            case = case_name(name, param)
+            if pattern and pattern not in case:
+                continue
+            echo(f"Running {case}")
+            with set_up(func, param) as run:
+                results[case] = time_case(run, repeat, warmup)
+    return results
+
+
+def machine_info():
+    try:
+        helpers = version("cdktf-helpers")
+    except PackageNotFoundError:
+        helpers = "unknown"
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "executable": sys.executable,
+        "cdktf_helpers": helpers,
+    }
+
+
+def write_results(results, path):
+    with open(path, "w") as fh:
+        json.dump({"machine": machine_info(), "results": results}, fh, indent=2)
+
+
+def read_results(path):
+    with open(path) as fh:
+        return json.load(fh)["results"]
+
+
+def compare(results, baseline, threshold=1.25):
+    """Compare median times against a baseline's
+
+    Returns rows of (case, baseline median, median, ratio, status), status
+    being "slower" when the ratio is over threshold, "faster" when under
+    its inverse, "new" when the case isn't in the baseline and otherwise "".
+    """
+    rows = []
+    for case, result in results.items():
+        before = baseline.get(case)
+        if before is None:
+            rows.append((case, None, result["median"], None, "new"))
+            continue
+        ratio = result["median"] / before["median"] if before["median"] else None
+        if ratio is not None and ratio > threshold:
+            status = "slower"
+        elif ratio is not None and ratio < 1 / threshold:
+            status = "faster"
+        else:
+            status = ""
+        rows.append((case, before["median"], result["median"], ratio, status))
+    return rows
+
+
+def format_results(results):
+    from tabulate import tabulate
+
+    return tabulate(
+        [
+            [case, r["min"] * 1000, r["median"] * 1000, r["stdev"] * 1000, r["runs"]]
+            for case, r in results.items()
+        ],
+        headers=["Benchmark", "Min ms", "Median ms", "Stdev ms", "Runs"],
+        floatfmt=".2f",
+    )
+
+
+def format_comparison(rows):
+    from tabulate import tabulate
+
+    def ms(seconds):
+        return "-" if seconds is None else f"{seconds * 1000:.2f}"
+
+    return tabulate(
+        [
+            [
+                case,
+                ms(before),
+                ms(after),
+                "-" if ratio is None else f"{ratio:.2f}x",
+                status,
+            ]
+            for case, before, after, ratio, status in rows
+        ],
+        headers=["Benchmark", "Baseline ms", "Median ms", "Ratio", ""],
+    )
@@ -0,0 +1,151 @@
+import json
+import subprocess
+import sys
+from contextlib import contextmanager
+from tempfile import TemporaryDirectory
+
+from pydantic import create_model
+
+from cdktf_helpers.fake_aws import FakeAws
+from cdktf_helpers.settings.aws import (
+    AwsAppSettings,
+    AwsResources,
+    Subnet,
+    SubnetsField,
+    Vpc,
+    VpcField,
+)
+from cdktf_helpers.settings.aws.utils import (
+    boto3_session,
+    clear_aws_caches,
+    set_session_provider,
+)
+
+from .harness import benchmark
+
+APP = "bench"
+ENVIRONMENT = "dev"
+
+FIELDS = [10, 100, 500]
+RESOURCES = [10, 100, 1000]
+PARAMETERS = [10, 100, 1000]
+STACKS = [1, 5, 20]
+
+# Resources each stack adds in build()
+RESOURCES_PER_STACK = 5
+
+# The same as tests/test_startup.py
+RUN_CLI = "import sys; from cdktf_helpers.cli import main; main(sys.argv[1:])"
+
+
+@contextmanager
+def fresh_aws():
+    """Stand a new FakeAws in for AWS while a benchmark runs"""
+    aws = FakeAws()
+    clear_aws_caches()
+    previous = set_session_provider(aws.session)
+    try:
+        yield aws
+    finally:
+        set_session_provider(previous)
+        clear_aws_caches()
+
+
+def settings_model(fields):
+    return create_model(
+        f"Settings{fields}",
+        __base__=AwsAppSettings,
+        vpc=(Vpc, VpcField()),
+        subnets=(AwsResources[Subnet], SubnetsField()),
+        **{f"field_{i}": (str, f"value {i}") for i in range(fields)},
+    )
+
+
+@benchmark(FIELDS)
+def settings_validation(fields):
+    with fresh_aws():
+        model = settings_model(fields)
+        yield lambda: model(app=APP, environment=ENVIRONMENT)
+
+
+@benchmark(RESOURCES)
+def resource_lists(resources):
+    with fresh_aws():
+        model = create_model(
+            "ResourceSettings",
+            __base__=AwsAppSettings,
+            subnets=(AwsResources[Subnet], SubnetsField()),
+        )
+        ids = [f"subnet-{i:017x}" for i in range(resources)]
+        yield lambda: model(app=APP, environment=ENVIRONMENT, subnets=ids)
+
+
+@benchmark(FIELDS)
+def serialize_value(fields):
+    with fresh_aws():
+        settings = settings_model(fields)(app=APP, environment=ENVIRONMENT)
+        names = list(settings.get_model_fields(include_computed=True))
+        yield lambda: [settings.serialize_value(name) for name in names]
+
+
+@benchmark(FIELDS)
+def settings_dict(fields):
+    with fresh_aws():
+        model = settings_model(fields)
+        yield lambda: model.settings_dict(APP, ENVIRONMENT)
+
+
+@benchmark(PARAMETERS)
+def fetch(parameters):
+    with fresh_aws():
+        ssm = boto3_session().client("ssm")
+        for i in range(parameters):
+            ssm.put_parameter(
+                Name=f"/{APP}/{ENVIRONMENT}/field_{i}", Value=json.dumps(f"value {i}")
+            )
+        model = settings_model(parameters)
+        yield lambda: model(app=APP, environment=ENVIRONMENT)
+
+
+@benchmark(FIELDS)
+def save(fields):
+    with fresh_aws():
+        settings = settings_model(fields)(app=APP, environment=ENVIRONMENT)
+        yield settings.save
+
+
+def build_app(stacks, settings, outdir):
+    from cdktf import App
+    from cdktf_cdktf_provider_aws.s3_bucket import S3Bucket
+
+    from cdktf_helpers.stacks import AwsS3StateStack
+
+    class BenchStack(AwsS3StateStack[AwsAppSettings]):
+        def build(self):
+            for i in range(RESOURCES_PER_STACK):
+                S3Bucket(self, f"bucket{i}", bucket=f"{self.node.id}-bucket{i}")
+
+    app = App(outdir=outdir)
+    for i in range(stacks):
+        BenchStack(app, f"stack{i}", settings)
+    return app
+
+
+@benchmark(STACKS)
+def stack_construction(stacks):
+    with fresh_aws(), TemporaryDirectory(prefix="cdktf-bench-") as outdir:
+        settings = AwsAppSettings(app=APP, environment=ENVIRONMENT)
+        yield lambda: build_app(stacks, settings, outdir)
+
+
+@benchmark(STACKS)
+def synth(stacks):
+    with fresh_aws(), TemporaryDirectory(prefix="cdktf-bench-") as outdir:
+        settings = AwsAppSettings(app=APP, environment=ENVIRONMENT)
+        yield lambda: build_app(stacks, settings, outdir).synth()
+
+
+@benchmark(["--help", "synth --help", "settings --help"], warmup=False)
+def cli_cold_start(args):
+    command = [sys.executable, "-c", RUN_CLI, *args.split()]
+    return lambda: subprocess.run(command, capture_output=True, check=True)
@@ -1,4 +1,3 @@
-
 from cdktf import S3Backend
 
 
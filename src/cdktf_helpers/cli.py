@@ -5,30 +5,30 @@ import shutil
 import subprocess
 import sys
 import textwrap
-from collections import UserList
-from functools import cache
+from contextlib import contextmanager, nullcontext, redirect_stdout
+from functools import cache, partial
 from pathlib import Path
-from typing import Annotated, List, Optional, get_origin
+from typing import Annotated, List, Optional
 
 import typer
-from botocore.exceptions import NoCredentialsError, UnauthorizedSSOTokenError
-from cdktf import App
-from pydantic import TypeAdapter, ValidationError
-from pydantic_core import PydanticUndefined
 from rich import print
-from tabulate import tabulate
 
-from cdktf_helpers.settings.aws.utils import boto3_session
-from cdktf_helpers.utils import extract_default
+from .memory import is_memory_profiling, memory_phase
+from .profiling import is_profiling
+from .timing import is_recording, span
 
-from .settings.aws import AwsResource, AwsResources, ensure_backend_resources
+# Heavy modules (cdktf and its jsii runtime, boto3, pydantic and the settings
+# models built on them) are imported inside the commands that use them, so
+# that --help and commands which never synthesize start quickly.
+# tests/test_startup.py keeps this in check.
 
 
 def import_from_string(path):
     module_name, class_name = path.rsplit(".", 1)
     try:
         sys.path.insert(0, "")
-        module = importlib.import_module(module_name)
+        with span(f"import {module_name}"):
+            module = importlib.import_module(module_name)
         sys.path.pop(0)
         cls = getattr(module, class_name)
     except (ImportError, AttributeError) as e:
@@ -80,6 +80,15 @@ def app_from_config():
     return load_cdktf_python_config()["app"]
 
 
+def output_dir_from_config():
+    config_file = Path("cdktf.json")
+    output = "cdktf.out"
+    if config_file.exists():
+        with open(config_file.name, "r") as fh:
+            output = json.load(fh).get("output", output)
+    return Path(output).resolve()
+
+
 main = typer.Typer(
     no_args_is_help=True,
     pretty_exceptions_enable=False,
@@ -88,8 +97,70 @@ main = typer.Typer(
 )
 settings = typer.Typer(no_args_is_help=True, help="Manage stored app settings")
 backend = typer.Typer(no_args_is_help=True, help="Manage Terraform state backend")
+caches = typer.Typer(no_args_is_help=True, help="Manage local caches")
 main.add_typer(settings, name="settings")
 main.add_typer(backend, name="backend")
+main.add_typer(caches, name="cache")
+
+
+@contextmanager
+def timed_run(command, show_timings=False, trace_file=None):
+    """Record how long each phase of a command takes, then report it"""
+    from .timing import format_timings, recording, write_trace
+
+    # Commands may change directory, resolve the trace path up front
+    trace_file = trace_file and Path(trace_file).resolve()
+    with recording() as spans:
+        try:
+            with span(f"cdktf-python {command}"):
+                yield
+        finally:
+            if show_timings:
+                typer.echo(format_timings(spans))
+            if trace_file:
+                write_trace(spans, trace_file)
+                typer.echo(f"Wrote trace to {trace_file}")
+
+
+@contextmanager
+def profiled_run():
+    """Profile the constructs stacks create in build(), then report them"""
+    from .profiling import profiling
+
+    with profiling() as profile:
+        try:
+            yield
+        finally:
+            typer.echo(profile.format())
+
+
+@main.callback()
+def main_options(
+    ctx: typer.Context,
+    timings: Annotated[
+        bool, typer.Option(help="Print how long each phase of the command took")
+    ] = False,
+    trace: Annotated[
+        Optional[Path],
+        typer.Option(
+            help="Write a Chrome trace of the command to this file, "
+            "for viewing in Perfetto",
+            dir_okay=False,
+        ),
+    ] = None,
+    profile_build: Annotated[
+        bool,
+        typer.Option(
+            help="Report the constructs each stack's build() creates by type "
+            "and module, with time spent creating them and their JSON size",
+        ),
+    ] = False,
+):
+    if timings or trace:
+        ctx.with_resource(timed_run(ctx.invoked_subcommand, timings, trace))
+    if profile_build:
+        ctx.with_resource(profiled_run())
+
 
 app_arg = typer.Option(
     help="Short unique application ID string. The same for all environments (eg. mywebapp)",
@@ -114,6 +185,16 @@ env_arg = typer.Option(
 )
 
 
+envs_arg = typer.Option(
+    "--environment",
+    callback=env_option_validate,
+    envvar="CDKTF_APP_ENVIRONMENT",
+    help="Environment instances of application. Repeat to synthesize several "
+    "at once, each into its own output directory",
+    default_factory=lambda: None,
+)
+
+
 # env_option = typer.Option(
 #     callback=env_option_validate,
 #     envvar="CDKTF_APP_ENVIRONMENT",
@@ -128,6 +209,14 @@ stacks_arg = typer.Option(
     default_factory=stacks_from_config,
 )
 
+stack_paths_arg = typer.Option(
+    "--stacks",
+    min=1,
+    help="Python class path strings of CDKTF stack classes",
+    envvar="CDKTF_APP_STACKS",
+    default_factory=stacks_from_config,
+)
+
 stack_arg = typer.Option(
     help="Python class path string of CDKTF stack class",
     envvar="CDKTF_APP_STACKS",
@@ -139,71 +228,558 @@ dry_run_option = typer.Option(help="Simulate command without apply changes")
 
 
 def synth_cdktf_app(
-    app_name, environment, *stack_classes, create_state_resources=False
+    app_name,
+    environments,
+    *stack_classes,
+    create_state_resources=False,
+    outdir=None,
+    cache=True,
+    executor=None,
 ):
-    app = App()
-
-    for stack_class in stack_classes:
+    """Synthesize stacks for one or more environments in a single process
+
+    Each environment gets its own App. With more than one environment, each
+    is written to a subdirectory of the output directory named after it.
+    When nothing that affects the output has changed since a previous synth,
+    its output is copied from the cache instead of building the app.
+    Settings are resolved on executor, or a pool of threads started for the
+    synth, whose boto3 sessions are per thread.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    from .settings.aws.utils import boto3_session
+    from .state import state_reads
+    from .synth_cache import restore_synth, store_synth, synth_cache_key
+
+    if isinstance(environments, str):
+        environments = [environments]
+
+    # Settings lookups are network bound, so resolve them all up front
+    def resolve(job):
+        environment, stack_class = job
         settings_model = stack_class.get_settings_model()
-        settings = validate_settings(settings_model, app_name, environment)
-
-        stack_class(
-            app,
-            stack_class.__name__,
-            settings,
-            create_state_resources=create_state_resources,
-        )
-        print(f"Added {stack_class.__name__} to {app_name}/{environment}")
+        if getattr(stack_class, "deferred_settings", False):
+            from pydantic import ValidationError
+
+            from .settings.aws import DeferredSettings
+
+            settings = DeferredSettings(settings_model, app_name, environment)
+            try:
+                settings.eager_values()
+            except ValidationError as e:
+                invalid_settings(e, settings_model, app_name, environment)
+            return settings
+        return validate_settings(settings_model, app_name, environment)
+
+    jobs = [(env, stack_class) for env in environments for stack_class in stack_classes]
+    if executor is None:
+        executor = ThreadPoolExecutor(max_workers=min(len(jobs), 8) or 1)
+        pool = executor
+    else:
+        pool = nullcontext()
+    with span("resolve settings"), memory_phase("resolve settings"), pool:
+        resolved = dict(zip(jobs, executor.map(resolve, jobs)))
+
+    outdir = Path(outdir or os.environ.get("CDKTF_OUTDIR") or output_dir_from_config())
+    names = [stack_class.__name__ for stack_class in stack_classes]
+    # Creating state resources is a side effect of building the stacks, and
+    # profiling measures building them, so they always need building
+    profiled = is_profiling() or is_memory_profiling()
+    cache = cache and not create_state_resources and not profiled
+    # Nor can stacks that inline other stacks' outputs, which come from state
+    cache = cache and not any(
+        getattr(stack_class, "inline_remote_outputs", False)
+        for stack_class in stack_classes
+    )
 
-    app.synth()
+    for environment in environments:
+        app_outdir = outdir / environment if len(environments) > 1 else outdir
+        app_outdir.mkdir(parents=True, exist_ok=True)
+
+        key = None
+        if cache:
+            stacks = [(c, resolved[(environment, c)]) for c in stack_classes]
+            region = boto3_session().region_name
+            with span("synth cache key"):
+                key = synth_cache_key(app_name, environment, stacks, region=region)
+            with span("restore cached synth"):
+                restored = restore_synth(key, app_outdir, names)
+            if restored:
+                print(f"Reused cached synth of {app_name}/{environment}")
+                continue
+
+        from cdktf import App
+
+        app = App(outdir=str(app_outdir))
+        reads = state_reads()
+        for stack_class in stack_classes:
+            phase = memory_phase(f"add {stack_class.__name__} ({environment})")
+            with span(f"add {stack_class.__name__}", environment=environment), phase:
+                stack_class(
+                    app,
+                    stack_class.__name__,
+                    resolved[(environment, stack_class)],
+                    create_state_resources=create_state_resources,
+                )
+            print(f"Added {stack_class.__name__} to {app_name}/{environment}")
+
+        phase = memory_phase(f"app.synth ({environment})")
+        with span("app.synth", environment=environment), phase:
+            app.synth()
+        if key and state_reads() == reads:
+            with span("store synth cache"):
+                store_synth(key, app_outdir, names)
 
 
 @main.command(help="Synthesize app directly without invoking cdktf")
 def synth(
     app: Annotated[str, app_arg],
-    stacks: Annotated[Optional[list[str]], stacks_arg],
-    environment: Annotated[Optional[str], env_arg],
+    stacks: Annotated[Optional[list[str]], stack_paths_arg],
+    environments: Annotated[Optional[List[str]], envs_arg],
+    cache: Annotated[
+        bool, typer.Option(help="Reuse the previous output if nothing has changed")
+    ] = True,
+    server: Annotated[
+        bool,
+        typer.Option(help="Hand the synth to `cdktf-python serve` if it's running"),
+    ] = False,
+    memory_profile: Annotated[
+        bool,
+        typer.Option(
+            help="Report peak memory use of Python and the jsii runtime for each "
+            "phase of the synth, with the top allocation sites"
+        ),
+    ] = False,
+    memory_budget: Annotated[
+        Optional[float],
+        typer.Option(
+            help="Fail when Python and the jsii runtime together peak above this "
+            "many MB. Only samples RSS unless --memory-profile is given too",
+            envvar="CDKTF_PYTHON_MEMORY_BUDGET",
+            min=1,
+        ),
+    ] = None,
 ):
-    synth_cdktf_app(app, environment, *stacks)
+    request = {
+        "app": app,
+        "environments": environments,
+        "stacks": stacks,
+        "cache": cache,
+    }
+    if memory_profile or memory_budget:
+        run_memory_profiled(request, memory_budget, allocations=memory_profile)
+        return
+    # A server's spans and profile aren't recorded here, so timed and
+    # profiled runs synthesize locally
+    if server and not is_recording() and not is_profiling():
+        from .server import forward, socket_path
+
+        exit_code = forward(socket_path(), request, echo=typer.echo)
+        if exit_code is not None:
+            raise typer.Exit(exit_code)
+    run_synth_request(request)
+
+
+def run_memory_profiled(request, budget=None, allocations=True):
+    from .memory import MB, memory_profiling
+
+    with memory_profiling(allocations=allocations) as profile:
+        try:
+            run_synth_request(request)
+        finally:
+            typer.echo(profile.format())
+    if budget and profile.peak > budget * MB:
+        print(
+            f"Peak memory use of {profile.peak / MB:.0f} MB is over the budget "
+            f"of {budget:.0f} MB"
+        )
+        sys.exit(1)
+
+
+def run_synth_request(request, executor=None):
+    stack_classes = import_from_strings(request["stacks"])
+    synth_cdktf_app(
+        request["app"],
+        request["environments"],
+        *stack_classes,
+        cache=request["cache"],
+        executor=executor,
+    )
+
+
+def serve_synth(request, executor=None):
+    from .server import forget_project_modules
+    from .settings.aws.utils import clear_aws_caches
+    from .state import cached_state_outputs
+
+    # Pick up any changes to the project's stacks since the last request,
+    # and to any values looked up in AWS once per process. Sessions and
+    # their clients stay with the executor's threads.
+    forget_project_modules()
+    clear_aws_caches()
+    cached_state_outputs.cache_clear()
+    run_synth_request(request, executor=executor)
+
+
+@main.command(help="Run a synth server that keeps cdktf and AWS clients loaded")
+def serve():
+    # Load everything that's slow to start once, up front
+    import cdktf  # noqa: F401
+    import cdktf_cdktf_provider_aws.provider  # noqa: F401
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    from .server import serve as run_server
+    from .server import socket_path
+    from .settings.aws.utils import boto3_session
+
+    boto3_session()
+    # The threads settings are resolved on, and so their boto3 sessions,
+    # last as long as the server
+    executor = ThreadPoolExecutor(max_workers=8)
+
+    path = socket_path()
+    print(f"Listening on {path}, synth --server run here will use this server")
+    try:
+        with executor:
+            run_server(path, partial(serve_synth, executor=executor))
+    except RuntimeError as e:
+        print(str(e))
+        sys.exit(1)
+    except KeyboardInterrupt:
+        pass
+
+
+def plugin_cache():
+    """Share downloaded terraform providers between the commands run"""
+    from .plugin_cache import shared_plugin_cache
+
+    return shared_plugin_cache(echo=typer.echo)
+
+
+def init_stacks(outdir, names):
+    """Init each stack one at a time, before cdktf runs them concurrently
+
+    cdktf runs terraform init itself, and terraform's plugin cache isn't
+    safe for concurrent writes. Once each stack has its providers the inits
+    cdktf runs have nothing to write to it. Returns exit codes by name.
+    """
+    from .terraform import ensure_init, stack_dir
+
+    return {
+        name: ensure_init(stack_dir(outdir, name), name, echo=typer.echo)
+        for name in names
+    }
+
 
+def prepare_stacks(app, environment, stack_classes):
+    """Synthesize in-process, then init each stack for cdktf to run
 
-def cdktf_multi_stack(parent, command, help):
+    Returns the output directory, the names of the stacks and init's exit
+    codes by name.
+    """
+    outdir = output_dir_from_config()
+    synth_cdktf_app(app, environment, *stack_classes, outdir=outdir)
+    names = [stack_class.__name__ for stack_class in stack_classes]
+    return outdir, names, init_stacks(outdir, names)
+
+
+def run_cdktf(command, app, environment, stack_classes, *args):
+    """Run one cdktf command over every stack, once they're all initialised"""
+    _, names, inits = prepare_stacks(app, environment, stack_classes)
+    if any(inits.values()):
+        sys.exit(1)
+    with span(f"cdktf {command}"):
+        subprocess.run(["cdktf", command, *names, "--skip-synth", *args])
+
+
+def run_scheduled(command, app, environment, stack_classes, parallelism):
+    """Synthesize once, then run command for each stack in dependency order"""
+    from tabulate import tabulate
+
+    from .scheduler import (
+        SUCCEEDED,
+        reverse_dependencies,
+        run_graph,
+        run_prefixed,
+        stack_dependencies,
+        stack_state_locations,
+    )
+
+    outdir, names, inits = prepare_stacks(app, environment, stack_classes)
+    dependencies = stack_dependencies(outdir / "manifest.json", names)
+    if command == "destroy":
+        dependencies = reverse_dependencies(dependencies)
+
+    def run(name):
+        if inits[name]:
+            return inits[name]
+        # run_graph already orders stacks by their dependencies, which cdktf
+        # would otherwise insist are part of the same command
+        args = ["cdktf", command, name, "--skip-synth", "--auto-approve"]
+        args.append("--ignore-missing-stack-dependencies")
+        return run_prefixed(args, name, echo=typer.echo)
+
+    # Stacks sharing a state, as they do with the default key, also share
+    # its lock, so run one after another
+    status = run_graph(
+        dependencies,
+        run,
+        parallelism=parallelism,
+        exclusive=stack_state_locations(outdir, names),
+    )
+    table_data = [[name, status[name]] for name in names]
+    print(tabulate(table_data, headers=["Stack", "Status"]))
+    if any(value != SUCCEEDED for value in status.values()):
+        sys.exit(1)
+
+
+def cdktf_scheduled_stacks(parent, command, help):
     def wrapper(
+        app: Annotated[str, app_arg],
         stacks: Annotated[Optional[list[str]], stacks_arg],
         environment: Annotated[Optional[str], env_arg],
+        parallelism: Annotated[
+            Optional[int],
+            typer.Option(
+                min=1,
+                help="Run stacks individually in dependency order, this many at "
+                "once. Requires --auto-approve",
+            ),
+        ] = None,
+        auto_approve: Annotated[
+            bool, typer.Option(help="Apply without asking for approval")
+        ] = False,
     ):
         os.environ["CDKTF_APP_ENVIRONMENT"] = environment
-        stacks = to_paths(*stacks)
-        subprocess.run(["cdktf", command, *stacks])
+        if parallelism is not None and not auto_approve:
+            print("Stacks run with --parallelism can't prompt, add --auto-approve")
+            sys.exit(1)
+        with plugin_cache():
+            if parallelism is None:
+                approve = ["--auto-approve"] if auto_approve else []
+                run_cdktf(command, app, environment, stacks, *approve)
+            else:
+                run_scheduled(command, app, environment, stacks, parallelism)
 
     return parent.command(name=command, help=help)(wrapper)
 
 
-def cdktf_single_stack(parent, command, help):
-    def wrapper(
-        stack: Annotated[str, stack_arg],
-        environment: Annotated[Optional[str], env_arg],
-    ):
-        os.environ["CDKTF_APP_ENVIRONMENT"] = environment
-        stack = to_paths(stack)
-        subprocess.run(["cdktf", command, stack])
+def run_diffs(app, environment, stack_classes, parallelism, detailed_exitcode):
+    """Synthesize once, then plan every stack concurrently and summarise"""
+    from tabulate import tabulate
 
-    return parent.command(name=command, help=help)(wrapper)
+    from .scheduler import (
+        SUCCEEDED,
+        parse_plan_summary,
+        run_graph,
+        run_prefixed,
+        stack_state_locations,
+    )
+
+    outdir = output_dir_from_config()
+    synth_cdktf_app(app, environment, *stack_classes, outdir=outdir)
+    names = [stack_class.__name__ for stack_class in stack_classes]
+    inits = init_stacks(outdir, names)
+    summaries = {}
+
+    def diff(name):
+        if inits[name]:
+            return inits[name]
+        lines = []
+
+        def echo(line):
+            lines.append(line)
+            typer.echo(line)
+
+        code = run_prefixed(["cdktf", "diff", name, "--skip-synth"], name, echo=echo)
+        summaries[name] = parse_plan_summary(lines)
+        return code
+
+    # Plans take the state lock, so stacks sharing a state run in turn
+    status = run_graph(
+        {name: set() for name in names},
+        diff,
+        parallelism=parallelism,
+        exclusive=stack_state_locations(outdir, names),
+    )
+
+    table_data = []
+    for name in names:
+        summary = summaries.get(name)
+        if status[name] != SUCCEEDED:
+            table_data.append([name, "", "", "", "error"])
+        elif summary is None:
+            # The plan ran, but its output didn't say what would change
+            table_data.append([name, "", "", "", "no summary"])
+        else:
+            changed = "changes" if any(summary.values()) else "no changes"
+            table_data.append(
+                [name, summary["add"], summary["change"], summary["destroy"], changed]
+            )
+    headers = ["Stack", "Add", "Change", "Destroy", "Status"]
+    print(tabulate(table_data, headers=headers))
+
+    if any(row[-1] == "error" for row in table_data):
+        sys.exit(1)
+    # Without a summary there's no telling whether the stack has changes
+    if detailed_exitcode and any(row[-1] == "no summary" for row in table_data):
+        sys.exit(1)
+    if detailed_exitcode and any(row[-1] == "changes" for row in table_data):
+        sys.exit(2)
+
+
+@main.command(help="Perform a diff (terraform plan) for the given stacks")
+def diff(
+    app: Annotated[str, app_arg],
+    stacks: Annotated[
+        Optional[List[str]],
+        typer.Option(
+            "--stack",
+            help="Python class path string of CDKTF stack class. Repeat for more",
+            envvar="CDKTF_APP_STACKS",
+            callback=import_from_strings,
+            default_factory=lambda: [stack_from_config()],
+        ),
+    ],
+    environment: Annotated[Optional[str], env_arg],
+    all_stacks: Annotated[
+        bool, typer.Option("--all", help="Diff every stack in the app")
+    ] = False,
+    parallelism: Annotated[
+        int, typer.Option(min=1, help="Number of stacks to plan at once")
+    ] = 4,
+    detailed_exitcode: Annotated[
+        bool,
+        typer.Option(
+            help="Exit with 2 when any stack has changes, 0 when none do, and 1 "
+            "when a plan doesn't say",
+        ),
+    ] = False,
+):
+    os.environ["CDKTF_APP_ENVIRONMENT"] = environment
+    if all_stacks:
+        stacks = import_from_strings(stacks_from_config())
+    with plugin_cache():
+        run_diffs(app, environment, stacks, parallelism, detailed_exitcode)
+
+
+def run_terraform_stacks(action, app, environment, stack_classes, parallelism):
+    """Synthesize once, then run terraform itself in each stack's directory"""
+    from tabulate import tabulate
+
+    from .scheduler import (
+        SUCCEEDED,
+        parse_plan_summary,
+        reverse_dependencies,
+        run_graph,
+        stack_dependencies,
+        stack_state_locations,
+    )
+    from .terraform import run_terraform, stack_dir
+
+    outdir = output_dir_from_config()
+    synth_cdktf_app(app, environment, *stack_classes, outdir=outdir)
+    names = [stack_class.__name__ for stack_class in stack_classes]
+    if action == "apply":
+        dependencies = stack_dependencies(outdir / "manifest.json", names)
+    elif action == "destroy":
+        dependencies = stack_dependencies(outdir / "manifest.json", names)
+        dependencies = reverse_dependencies(dependencies)
+    else:
+        # Plans and outputs don't change anything, so never wait on each other
+        dependencies = {name: set() for name in names}
+
+    summaries = {}
+
+    def run(name):
+        lines = []
+
+        def echo(line):
+            lines.append(line)
+            typer.echo(line)
+
+        code = run_terraform(action, stack_dir(outdir, name), name, echo=echo)
+        summaries[name] = parse_plan_summary(lines)
+        return code
+
+    # Even plans take the state lock, so stacks sharing a state run in turn
+    status = run_graph(
+        dependencies,
+        run,
+        parallelism=parallelism,
+        exclusive=stack_state_locations(outdir, names),
+    )
+    if action == "plan":
+        headers = ["Stack", "Add", "Change", "Destroy", "Status"]
+        table_data = []
+        for name in names:
+            summary = summaries.get(name)
+            if status[name] != SUCCEEDED or summary is None:
+                table_data.append([name, "", "", "", status[name]])
+            else:
+                table_data.append([name, *summary.values(), status[name]])
+    else:
+        headers = ["Stack", "Status"]
+        table_data = [[name, status[name]] for name in names]
+    print(tabulate(table_data, headers=headers))
+    if any(value != SUCCEEDED for value in status.values()):
+        sys.exit(1)
+
+
+def terraform_action_validate(value):
+    from .terraform import ACTIONS
+
+    if value not in ACTIONS:
+        raise typer.BadParameter(f"Must be one of {', '.join(ACTIONS)}")
+    return value
+
+
+@main.command(
+    help="Synthesize in-process, then run terraform directly in each stack's "
+    "output directory without going through the cdktf CLI"
+)
+def run(
+    action: Annotated[
+        str,
+        typer.Argument(
+            help="Terraform action: plan, apply, destroy or output",
+            callback=terraform_action_validate,
+        ),
+    ],
+    app: Annotated[str, app_arg],
+    stacks: Annotated[Optional[list[str]], stacks_arg],
+    environment: Annotated[Optional[str], env_arg],
+    parallelism: Annotated[
+        int,
+        typer.Option(
+            min=1, help="Number of independent stacks to run terraform for at once"
+        ),
+    ] = 4,
+    auto_approve: Annotated[
+        bool, typer.Option(help="Apply or destroy without asking for approval")
+    ] = False,
+):
+    if action in ("apply", "destroy") and not auto_approve:
+        print("Stacks are run without a terminal to prompt on, add --auto-approve")
+        sys.exit(1)
+    os.environ["CDKTF_APP_ENVIRONMENT"] = environment
+    with plugin_cache():
+        run_terraform_stacks(action, app, environment, stacks, parallelism)
 
 
 def cdtkf_simple(parent, command, help):
     def wrapper():
-        subprocess.run(["cdktf", command])
+        with span(f"cdktf {command}"):
+            subprocess.run(["cdktf", command])
 
     return parent.command(name=command, help=help)(wrapper)
 
 
 cdktf_commands = {
-    "deploy": (cdktf_multi_stack, "Deploy the given stacks"),
-    "destroy": (cdktf_multi_stack, "Destroy the given stacks"),
-    "diff": (cdktf_single_stack, "Perform a diff (terraform plan) for the given stack"),
+    "deploy": (cdktf_scheduled_stacks, "Deploy the given stacks"),
+    "destroy": (cdktf_scheduled_stacks, "Destroy the given stacks"),
     "list": (cdtkf_simple, "List stacks in app"),
-    "output": (cdktf_multi_stack, "Prints the output of stacks"),
     "debug": (
         cdtkf_simple,
         "Get debug information about the current project and environment",
@@ -214,13 +790,96 @@ for command, (create_command, help) in cdktf_commands.items():
     create_command(main, command, help)
 
 
+def show_outputs(app, environment, stack_classes, as_json=False, cache=True):
+    """Print stack outputs read straight from their S3 state objects
+
+    The stacks are synthesized first, in-process and usually from the synth
+    cache, to find the bucket and key each one's backend was built with.
+    Those can be set when a stack is constructed, not only by its class.
+    """
+    from tabulate import tabulate
+
+    from .scheduler import stack_state_locations
+    from .state import fetch_outputs
+
+    outdir = output_dir_from_config()
+    # Keep synth's progress out of the way of JSON output
+    with redirect_stdout(sys.stderr) if as_json else nullcontext():
+        synth_cdktf_app(app, environment, *stack_classes, outdir=outdir)
+    names = [stack_class.__name__ for stack_class in stack_classes]
+    locations = {}
+    for name, location in stack_state_locations(outdir, names).items():
+        if location is None:
+            typer.echo(f"{name}: doesn't keep its state in S3", err=True)
+        else:
+            locations[name] = location
+    by_bucket = {}
+    for bucket_name, key in locations.values():
+        by_bucket.setdefault(bucket_name, []).append(key)
+    outputs = {
+        (bucket_name, key): value
+        for bucket_name, keys in by_bucket.items()
+        for key, value in fetch_outputs(bucket_name, keys, cache=cache).items()
+    }
+
+    if as_json:
+        typer.echo(
+            json.dumps(
+                {
+                    name: {k: v["value"] for k, v in (outputs[location] or {}).items()}
+                    for name, location in locations.items()
+                },
+                indent=2,
+            )
+        )
+        return
+
+    for name, (bucket_name, key) in locations.items():
+        stack_outputs = outputs[(bucket_name, key)]
+        if stack_outputs is None:
+            print(f"{name}: no state found at s3://{bucket_name}/{key}")
+            continue
+        print(name)
+        table_data = [
+            [k, "<sensitive>" if v.get("sensitive") else json.dumps(v["value"])]
+            for k, v in stack_outputs.items()
+        ]
+        print(tabulate(table_data, headers=["Output", "Value"]))
+
+
+@main.command(help="Prints the output of stacks")
+def output(
+    app: Annotated[str, app_arg],
+    stacks: Annotated[Optional[list[str]], stacks_arg],
+    environment: Annotated[Optional[str], env_arg],
+    as_json: Annotated[
+        bool, typer.Option("--json", help="Print outputs as JSON")
+    ] = False,
+    direct: Annotated[
+        bool,
+        typer.Option(help="Read outputs from S3 state rather than running cdktf"),
+    ] = True,
+    cache: Annotated[
+        bool, typer.Option(help="Reuse locally cached outputs if state is unchanged")
+    ] = True,
+):
+    if not direct:
+        os.environ["CDKTF_APP_ENVIRONMENT"] = environment
+        with plugin_cache():
+            run_cdktf("output", app, environment, stacks)
+        return
+    show_outputs(app, environment, stacks, as_json=as_json, cache=cache)
+
+
 def initialise_settings(app, environment, settings_model, dry_run=False):
     """Interactive CLI prompts to initialise or update parameter store settings"""
+    from pydantic import TypeAdapter, ValidationError
 
     # Get a dict of settings with parmeterstore params and defaults applied
     settings = settings_model.settings_dict(app, environment)
 
-    for key, field in settings_model.get_model_fields().items():
+    for key, meta in settings_model.field_metadata().items():
+        field = meta.field
         # Default to the current value, which is either from paramstore
         # or automatically applied as a setting default
         current_value = settings.get(key, None)
@@ -234,13 +893,8 @@ def initialise_settings(app, environment, settings_model, dry_run=False):
                 current_value_str = str(current_value)
 
         # Check if the type is a list or resource type
-        origin = get_origin(field.annotation) or field.annotation
-        field_is_list = False
-        field_is_resource = False
-        if issubclass(origin, (list, UserList)):
-            field_is_list = True
-        elif issubclass(origin, AwsResource):
-            field_is_resource = True
+        field_is_list = meta.is_list
+        field_is_resource = meta.kind == "resource"
 
         # Prompt interactively for new value for each key, with defaults
         value = None
@@ -313,6 +967,9 @@ def get_terminal_width():
 
 def show_settings(app, environment, settings_model):
     """Pretty print the current paramstore settings for an app/environment"""
+    from tabulate import tabulate
+
+    from .settings.aws import AwsResources
 
     terminal_width = get_terminal_width()
     col_percent_widths = (20, 35, 35, 10)
@@ -326,18 +983,15 @@ def show_settings(app, environment, settings_model):
         return "\n".join(textwrap.wrap(text, width=width))
 
     table_data = []
-    for key, field in settings_model.get_model_fields(include_computed=True).items():
-        exclude = field.exclude if hasattr(field, "exclude") else False
-        required = field.is_required() if hasattr(field, "is_required") else False
-        computed = not hasattr(field, "exclude")
-        description = field.description or (
-            getattr(field, "json_schema_extra") or {}
-        ).get("description", "")
-
-        if exclude:
+    for key, meta in settings_model.field_metadata(include_computed=True).items():
+        required = meta.required
+        computed = meta.computed
+        description = meta.description
+
+        if meta.excluded:
             continue
 
-        default_value = extract_default(field)
+        default_value = meta.default()
         value = settings_dict.get(key, None)
 
         is_default = value == default_value
@@ -377,6 +1031,8 @@ def show(
 
 
 def delete_settings(app, environment, settings_model, dry_run=False):
+    from .settings.aws.utils import boto3_session
+
     namespace = settings_model.format_namespace(app, environment)
 
     print(f"\nWARNING! You are about to delete all settings for {namespace}!")
@@ -441,10 +1097,11 @@ def delete(
 
 @backend.command()
 def create(app: Annotated[str, app_arg]):
-    from .stacks import AwsS3StateStack
+    from .settings.aws import ensure_backend_resources
+    from .utils import format_dynamodb_table_name, format_s3_bucket_name
 
-    s3_bucket_name = AwsS3StateStack.format_s3_bucket_name(app)
-    dynamodb_table_name = AwsS3StateStack.format_dynamodb_table_name(app)
+    s3_bucket_name = format_s3_bucket_name(app)
+    dynamodb_table_name = format_dynamodb_table_name(app)
     created, existing = ensure_backend_resources(s3_bucket_name, dynamodb_table_name)
     created = ", ".join([str(r) for r in created])
     existing = ", ".join([str(r) for r in existing])
@@ -456,28 +1113,309 @@ def create(app: Annotated[str, app_arg]):
         print(f"Resources already present: {existing}")
 
 
+def format_age(seconds):
+    if seconds is None:
+        return "unknown"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m{seconds:02d}s"
+
+
+def show_locks(app, break_older_than=None, samples=1, interval=5.0, dry_run=False):
+    """Inspect the state lock table, report contention and break stale locks"""
+    import time
+
+    from tabulate import tabulate
+
+    from .state import break_lock, fetch_locks, lock_contention
+    from .utils import format_dynamodb_table_name
+
+    table_name = format_dynamodb_table_name(app)
+
+    taken = []
+    for i in range(samples):
+        if i:
+            time.sleep(interval)
+        taken.append(fetch_locks(table_name))
+    locks = taken[-1]
+
+    if not locks:
+        print(f"No locks held in {table_name}")
+    else:
+        table_data = [
+            [
+                lock["path"],
+                lock["who"],
+                lock["operation"],
+                lock["created"].isoformat() if lock["created"] else "",
+                format_age(lock["age"]),
+            ]
+            for lock in locks
+        ]
+        headers = ["State", "Who", "Operation", "Created", "Age"]
+        print(f"Locks held in {table_name}")
+        print(tabulate(table_data, headers=headers, tablefmt="fancy_grid"))
+
+    if samples > 1:
+        metrics = lock_contention(taken)
+        table_data = [
+            [
+                path,
+                f"{m['locked_ratio']:.0%}",
+                m["distinct_locks"],
+                m["distinct_holders"],
+                format_age(m["max_age"]),
+            ]
+            for path, m in metrics.items()
+        ]
+        headers = ["State", "Locked", "Locks", "Holders", "Max age"]
+        print(f"Lock contention over {samples} samples")
+        print(tabulate(table_data, headers=headers, tablefmt="fancy_grid"))
+
+    if break_older_than is not None:
+        stale = [
+            lock
+            for lock in locks
+            if lock["age"] is not None and lock["age"] > break_older_than
+        ]
+        for lock in stale:
+            if dry_run:
+                print(f"Would break lock on {lock['path']} held by {lock['who']}")
+            elif break_lock(table_name, lock):
+                print(f"Broke lock on {lock['path']} held by {lock['who']}")
+            else:
+                print(f"Lock on {lock['path']} changed, left in place")
+        if not stale:
+            print("No stale locks to break")
+
+
+@backend.command(help="Show state locks and optionally break stale ones")
+def locks(
+    app: Annotated[str, app_arg],
+    break_older_than: Annotated[
+        Optional[int],
+        typer.Option(help="Break locks older than this many seconds"),
+    ] = None,
+    samples: Annotated[
+        int, typer.Option(min=1, help="Number of scans to take for contention metrics")
+    ] = 1,
+    interval: Annotated[float, typer.Option(help="Seconds between scans")] = 5.0,
+    dry_run: Annotated[bool, dry_run_option] = False,
+):
+    show_locks(app, break_older_than, samples, interval, dry_run)
+
+
+def format_size(size):
+    for unit in ("B", "KiB", "MiB"):
+        if size < 1024:
+            return f"{size:.0f}{unit}" if unit == "B" else f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GiB"
+
+
+def show_state_stats(app, split_threshold=50, breakdown=False, top=5, workers=4):
+    """Report size and makeup of every state in the app's backend bucket"""
+    from tabulate import tabulate
+
+    from .state import fetch_state_stats
+    from .utils import format_s3_bucket_name
+
+    bucket_name = format_s3_bucket_name(app)
+    stats = sorted(
+        fetch_state_stats(bucket_name, workers=workers),
+        key=lambda s: s["size"],
+        reverse=True,
+    )
+    if not stats:
+        print(f"No state files found in {bucket_name}")
+        return
+
+    threshold = split_threshold * 1024 * 1024
+    table_data = []
+    for state in stats:
+        top_types = ", ".join(
+            f"{name} ({count})" for name, count in state["types"].most_common(top)
+        )
+        table_data.append(
+            [
+                state["key"],
+                format_size(state["size"]),
+                state["resources"],
+                state["instances"],
+                top_types,
+                "split" if state["size"] > threshold else "",
+            ]
+        )
+    headers = ["State", "Size", "Resources", "Instances", "Top types", "Candidate"]
+    print(f"State files in {bucket_name}")
+    print(tabulate(table_data, headers=headers, tablefmt="fancy_grid"))
+
+    if breakdown:
+        for state in stats:
+            print(f"\n{state['key']}")
+            rows = [["type", name, count] for name, count in state["types"].items()]
+            rows += [
+                ["module", name, count] for name, count in state["modules"].items()
+            ]
+            print(tabulate(rows, headers=["Kind", "Name", "Resources"]))
+
+
+@backend.command(help="Show size and resource breakdown of stored state files")
+def stats(
+    app: Annotated[str, app_arg],
+    split_threshold: Annotated[
+        int, typer.Option(help="Flag states larger than this many MiB for splitting")
+    ] = 50,
+    breakdown: Annotated[
+        bool, typer.Option(help="Show per type and per module resource counts")
+    ] = False,
+    workers: Annotated[
+        int, typer.Option(min=1, help="Number of states to read concurrently")
+    ] = 4,
+):
+    show_state_stats(app, split_threshold, breakdown, workers=workers)
+
+
+def migrate_backend(
+    app, from_app=None, key_map=None, overwrite=False, workers=4, dry_run=False
+):
+    """Copy state between backends or keys without downloading it"""
+    from tabulate import tabulate
+
+    from .settings.aws import ensure_backend_resources
+    from .state import migrate_states, plan_migration
+    from .utils import format_dynamodb_table_name, format_s3_bucket_name
+
+    from_app = from_app or app
+    source_bucket = format_s3_bucket_name(from_app)
+    source_table = format_dynamodb_table_name(from_app)
+    dest_bucket = format_s3_bucket_name(app)
+    dest_table = format_dynamodb_table_name(app)
+
+    try:
+        plan = plan_migration(source_bucket, dest_bucket, key_map)
+    except ValueError as e:
+        print(str(e))
+        sys.exit(1)
+    if not plan:
+        print("Nothing to migrate")
+        return
+
+    def show(entries, status=None):
+        table_data = [
+            [
+                f"s3://{source_bucket}/{e['source_key']}",
+                f"s3://{dest_bucket}/{e['dest_key']}",
+                format_size(e["size"]),
+                e.get("status") or ("overwrite" if e["dest_exists"] else "copy"),
+            ]
+            for e in entries
+        ]
+        headers = ["Source", "Destination", "Size", "Status"]
+        print(tabulate(table_data, headers=headers, tablefmt="fancy_grid"))
+
+    existing = [e for e in plan if e["dest_exists"]]
+    if existing and not overwrite:
+        show(existing)
+        print("Destination state already exists. Use --overwrite to replace it.")
+        sys.exit(1)
+
+    if dry_run:
+        show(plan)
+        print("Dry-run mode, nothing copied.")
+        return
+
+    ensure_backend_resources(dest_bucket, dest_table)
+    results = migrate_states(
+        source_bucket, source_table, dest_bucket, dest_table, plan, workers=workers
+    )
+    show(results)
+    failed = [r for r in results if r["status"] != "copied"]
+    if failed:
+        print(f"{len(failed)} of {len(results)} states were not migrated")
+        sys.exit(1)
+    print(f"Migrated and verified {len(results)} states")
+
+
+def parse_key_map(values):
+    if not values:
+        return None
+    key_map = {}
+    for value in values:
+        source, sep, dest = value.partition("=")
+        if not sep or not source or not dest:
+            raise typer.BadParameter(f"Expected SOURCE=DEST, got {value!r}")
+        key_map[source] = dest
+    return key_map
+
+
+@backend.command(help="Copy state files to another app's backend or to new keys")
+def migrate(
+    app: Annotated[str, app_arg],
+    from_app: Annotated[
+        Optional[str], typer.Option(help="App to copy state from. Defaults to --app")
+    ] = None,
+    key: Annotated[
+        Optional[List[str]],
+        typer.Option(
+            help="Map a state key to a new key as SOURCE=DEST. Defaults to all keys",
+        ),
+    ] = None,
+    overwrite: Annotated[
+        bool, typer.Option(help="Replace state that already exists at the destination")
+    ] = False,
+    workers: Annotated[
+        int, typer.Option(min=1, help="Number of states to copy concurrently")
+    ] = 4,
+    dry_run: Annotated[bool, dry_run_option] = False,
+):
+    migrate_backend(app, from_app, parse_key_map(key), overwrite, workers, dry_run)
+
+
+@caches.command(help="Remove cached synth output")
+def prune(
+    older_than: Annotated[
+        float, typer.Option(help="Remove entries not used for this many days")
+    ] = 30,
+    prune_all: Annotated[
+        bool, typer.Option("--all", help="Remove every entry")
+    ] = False,
+):
+    from .synth_cache import prune_synth_cache
+
+    removed = prune_synth_cache(None if prune_all else older_than * 86400)
+    print(f"Removed {removed} cached synths")
+
+
 def validate_settings(settings_model, app_name, environment):
+    from pydantic import ValidationError
+
     try:
-        settings = settings_model(app_name, environment)
+        with span(f"validate {settings_model.__name__}", environment=environment):
+            settings = settings_model(app=app_name, environment=environment)
     except ValidationError as e:
-        print("Settings failed validation:")
-        for error in e.errors():
-            key = error["loc"][0]
-            pos = f".{error['loc'][1]}" if len(error["loc"]) > 1 else ""
-            msg = error["msg"]
-            input = error["input"]
-            path = f"{settings_model.__module__}.{settings_model.__qualname__}"
-            print(f"- {key}{pos}: {msg} (input: {input})")
-            print(
-                "\nYou can review your settings with "
-                f"`cdktf-python settings show {app_name} {environment}` or "
-                f"update them with `cdktf-python settings init {app_name} {environment} "
-                f"--settings-model {path}`"
-            )
-        sys.exit(1)
+        invalid_settings(e, settings_model, app_name, environment)
     return settings
 
 
+def invalid_settings(e, settings_model, app_name, environment):
+    print("Settings failed validation:")
+    for error in e.errors():
+        key = error["loc"][0]
+        pos = f".{error['loc'][1]}" if len(error["loc"]) > 1 else ""
+        msg = error["msg"]
+        input = error["input"]
+        path = f"{settings_model.__module__}.{settings_model.__qualname__}"
+        print(f"- {key}{pos}: {msg} (input: {input})")
+        print(
+            "\nYou can review your settings with "
+            f"`cdktf-python settings show {app_name} {environment}` or "
+            f"update them with `cdktf-python settings init {app_name} {environment} "
+            f"--settings-model {path}`"
+        )
+    sys.exit(1)
+
+
 def entrypoint():
     if not shutil.which("cdktf"):
         print(
@@ -485,7 +1423,11 @@ def entrypoint():
         )
     try:
         main()
-    except (UnauthorizedSSOTokenError, NoCredentialsError):
+    except Exception as e:
+        from botocore.exceptions import NoCredentialsError, UnauthorizedSSOTokenError
+
+        if not isinstance(e, (UnauthorizedSSOTokenError, NoCredentialsError)):
+            raise
         print(
             "Looks like you don't have a valid AWS session. "
             "Start one with `aws sso login` or manually configure your "
@@ -0,0 +1,436 @@
+"""In-memory stand-in for the AWS APIs this library uses
+
+Much quicker to start than moto, at the cost of only covering the handful
+of SSM, EC2, Route53, S3 and DynamoDB operations the settings and backend
+code call. Anything else raises NotImplementedError. Install it behind
+boto3_session() with the fake_aws pytest fixture, or directly:
+
+    aws = FakeAws()
+    set_session_provider(aws.session)
+"""
+
+import itertools
+import os
+import uuid
+
+from botocore.exceptions import ClientError
+
+# SSM's limit for get_parameters_by_path
+PARAMETERS_PAGE_SIZE = 10
+
+
+def client_error(operation, code, message):
+    return ClientError({"Error": {"Code": code, "Message": message}}, operation)
+
+
+def matches_filters(item, filters, fields):
+    """Whether item passes EC2 style Filters, fields mapping names to keys"""
+    for f in filters or []:
+        value = item.get(fields.get(f["Name"], f["Name"]))
+        if isinstance(value, bool):
+            value = str(value).lower()
+        if value not in f["Values"]:
+            return False
+    return True
+
+
+class FakeAws:
+    """State shared by every client and resource of the fake's sessions"""
+
+    def __init__(self, region=None, default_vpc=True):
+        self.region_name = region or os.environ.get("AWS_DEFAULT_REGION") or "us-east-1"
+        self.parameters = {}
+        self.vpcs = {}
+        self.subnets = {}
+        self.hosted_zones = {}
+        self.buckets = {}
+        self.tables = {}
+        self.ids = itertools.count(1)
+        if default_vpc:
+            self.add_default_vpc()
+
+    def session(self):
+        return FakeSession(self)
+
+    def new_id(self, prefix):
+        return f"{prefix}-{next(self.ids):017x}"
+
+    def add_vpc(self, cidr_block="172.31.0.0/16", is_default=False, tags=None):
+        vpc_id = self.new_id("vpc")
+        self.vpcs[vpc_id] = {
+            "VpcId": vpc_id,
+            "CidrBlock": cidr_block,
+            "IsDefault": is_default,
+            "State": "available",
+            "Tags": [{"Key": k, "Value": v} for k, v in (tags or {}).items()],
+        }
+        return vpc_id
+
+    def add_default_vpc(self):
+        """A default VPC with a subnet per availability zone, as accounts have"""
+        vpc_id = self.add_vpc(is_default=True)
+        for i, zone in enumerate("abc"):
+            self.add_subnet(
+                vpc_id, f"172.31.{i * 16}.0/20", f"{self.region_name}{zone}"
+            )
+        return vpc_id
+
+    def add_subnet(self, vpc_id, cidr_block, availability_zone=None, tags=None):
+        subnet_id = self.new_id("subnet")
+        self.subnets[subnet_id] = {
+            "SubnetId": subnet_id,
+            "VpcId": vpc_id,
+            "CidrBlock": cidr_block,
+            "AvailabilityZone": availability_zone or f"{self.region_name}a",
+            "State": "available",
+            "Tags": [{"Key": k, "Value": v} for k, v in (tags or {}).items()],
+        }
+        return subnet_id
+
+    def add_hosted_zone(self, name):
+        zone_id = uuid.uuid4().hex[:14].upper()
+        name = name if name.endswith(".") else f"{name}."
+        self.hosted_zones[zone_id] = {
+            "Id": f"/hostedzone/{zone_id}",
+            "Name": name,
+            "CallerReference": uuid.uuid4().hex,
+            "Config": {"PrivateZone": False},
+            "ResourceRecordSetCount": 2,
+        }
+        return zone_id
+
+
+class FakeSession:
+    """Enough of a boto3.Session for boto3_session() callers"""
+
+    def __init__(self, aws):
+        self.aws = aws
+        self.region_name = aws.region_name
+
+    def client(self, service_name, **kwargs):
+        try:
+            return CLIENTS[service_name](self.aws)
+        except KeyError:
+            raise NotImplementedError(f"FakeAws has no {service_name} client")
+
+    def resource(self, service_name, **kwargs):
+        try:
+            return RESOURCES[service_name](self.aws)
+        except KeyError:
+            raise NotImplementedError(f"FakeAws has no {service_name} resource")
+
+
+class FakeClient:
+    service_name = None
+    paginated = {}
+
+    def __init__(self, aws):
+        self.aws = aws
+
+    def __getattr__(self, name):
+        raise NotImplementedError(
+            f"FakeAws doesn't implement {self.service_name}.{name}"
+        )
+
+    def get_paginator(self, operation):
+        if operation not in self.paginated:
+            raise NotImplementedError(
+                f"FakeAws can't paginate {self.service_name}.{operation}"
+            )
+        return FakePaginator(getattr(self, operation))
+
+
+class FakePaginator:
+    def __init__(self, operation):
+        self.operation = operation
+
+    def paginate(self, **kwargs):
+        token = None
+        while True:
+            page = self.operation(**kwargs, **({"NextToken": token} if token else {}))
+            yield page
+            token = page.get("NextToken")
+            if not token:
+                return
+
+
+class FakeSsm(FakeClient):
+    service_name = "ssm"
+    paginated = {"get_parameters_by_path"}
+
+    def get_parameters_by_path(
+        self, Path, Recursive=False, NextToken=None, MaxResults=None, **kwargs
+    ):
+        prefix = Path if Path.endswith("/") else f"{Path}/"
+        names = sorted(
+            name
+            for name in self.aws.parameters
+            if name.startswith(prefix) and (Recursive or "/" not in name[len(prefix) :])
+        )
+        start = int(NextToken or 0)
+        end = start + (MaxResults or PARAMETERS_PAGE_SIZE)
+        response = {"Parameters": [self.aws.parameters[n] for n in names[start:end]]}
+        if end < len(names):
+            response["NextToken"] = str(end)
+        return response
+
+    def get_parameter(self, Name, **kwargs):
+        if Name not in self.aws.parameters:
+            raise client_error("GetParameter", "ParameterNotFound", Name)
+        return {"Parameter": self.aws.parameters[Name]}
+
+    def put_parameter(self, Name, Value, Type="String", Overwrite=False, **kwargs):
+        existing = self.aws.parameters.get(Name)
+        if existing and not Overwrite:
+            raise client_error(
+                "PutParameter", "ParameterAlreadyExists", f"{Name} already exists"
+            )
+        version = existing["Version"] + 1 if existing else 1
+        self.aws.parameters[Name] = {
+            "Name": Name,
+            "Type": Type,
+            "Value": Value,
+            "Version": version,
+        }
+        return {"Version": version, "Tier": "Standard"}
+
+    def delete_parameters(self, Names):
+        deleted = [name for name in Names if name in self.aws.parameters]
+        for name in deleted:
+            del self.aws.parameters[name]
+        return {
+            "DeletedParameters": deleted,
+            "InvalidParameters": [name for name in Names if name not in deleted],
+        }
+
+
+VPC_FILTERS = {"is-default": "IsDefault", "vpc-id": "VpcId", "cidr": "CidrBlock"}
+SUBNET_FILTERS = {
+    "vpc-id": "VpcId",
+    "subnet-id": "SubnetId",
+    "availability-zone": "AvailabilityZone",
+    "cidr-block": "CidrBlock",
+}
+
+
+class FakeEc2(FakeClient):
+    service_name = "ec2"
+
+    def describe_vpcs(self, VpcIds=None, Filters=None, **kwargs):
+        for vpc_id in VpcIds or []:
+            if vpc_id not in self.aws.vpcs:
+                raise client_error(
+                    "DescribeVpcs",
+                    "InvalidVpcID.NotFound",
+                    f"The vpc ID '{vpc_id}' does not exist",
+                )
+        vpcs = [
+            vpc
+            for vpc in self.aws.vpcs.values()
+            if (not VpcIds or vpc["VpcId"] in VpcIds)
+            and matches_filters(vpc, Filters, VPC_FILTERS)
+        ]
+        return {"Vpcs": vpcs}
+
+    def describe_subnets(self, SubnetIds=None, Filters=None, **kwargs):
+        for subnet_id in SubnetIds or []:
+            if subnet_id not in self.aws.subnets:
+                raise client_error(
+                    "DescribeSubnets",
+                    "InvalidSubnetID.NotFound",
+                    f"The subnet ID '{subnet_id}' does not exist",
+                )
+        subnets = [
+            subnet
+            for subnet in self.aws.subnets.values()
+            if (not SubnetIds or subnet["SubnetId"] in SubnetIds)
+            and matches_filters(subnet, Filters, SUBNET_FILTERS)
+        ]
+        return {"Subnets": subnets}
+
+
+class FakeRoute53(FakeClient):
+    service_name = "route53"
+
+    def get_hosted_zone(self, Id):
+        zone_id = Id.removeprefix("/hostedzone/")
+        if zone_id not in self.aws.hosted_zones:
+            raise client_error(
+                "GetHostedZone", "NoSuchHostedZone", f"No hosted zone found: {Id}"
+            )
+        return {"HostedZone": self.aws.hosted_zones[zone_id]}
+
+    def list_hosted_zones(self, **kwargs):
+        return {"HostedZones": list(self.aws.hosted_zones.values())}
+
+
+class FakeS3(FakeClient):
+    service_name = "s3"
+
+    def list_buckets(self, **kwargs):
+        return {"Buckets": [{"Name": name} for name in self.aws.buckets]}
+
+    def create_bucket(self, Bucket, **kwargs):
+        if Bucket in self.aws.buckets:
+            raise client_error(
+                "CreateBucket", "BucketAlreadyOwnedByYou", f"{Bucket} already exists"
+            )
+        self.aws.buckets[Bucket] = {"Name": Bucket}
+        return {"Location": f"/{Bucket}"}
+
+
+class FakeDynamoDb(FakeClient):
+    service_name = "dynamodb"
+
+    def list_tables(self, **kwargs):
+        return {"TableNames": sorted(self.aws.tables)}
+
+    def create_table(self, TableName, KeySchema, AttributeDefinitions, **kwargs):
+        if TableName in self.aws.tables:
+            raise client_error(
+                "CreateTable", "ResourceInUseException", f"{TableName} already exists"
+            )
+        self.aws.tables[TableName] = {
+            "TableName": TableName,
+            "KeySchema": KeySchema,
+            "AttributeDefinitions": AttributeDefinitions,
+            "TableStatus": "ACTIVE",
+        }
+        return {"TableDescription": self.aws.tables[TableName]}
+
+    def describe_table(self, TableName):
+        if TableName not in self.aws.tables:
+            raise client_error(
+                "DescribeTable",
+                "ResourceNotFoundException",
+                f"Requested resource not found: Table: {TableName} not found",
+            )
+        return {"Table": self.aws.tables[TableName]}
+
+
+CLIENTS = {
+    "ssm": FakeSsm,
+    "ec2": FakeEc2,
+    "route53": FakeRoute53,
+    "s3": FakeS3,
+    "dynamodb": FakeDynamoDb,
+}
+
+
+class FakeModel:
+    """A boto3 resource, reading its attributes from the fake's state
+
+    Attribute names are the snake_case form of the API's keys, as boto3
+    resources have.
+    """
+
+    def __init__(self, aws, id):
+        self.aws = aws
+        self.id = id
+
+    def describe(self):
+        raise NotImplementedError
+
+    def load(self):
+        self.describe()
+
+    def __getattr__(self, name):
+        data = self.describe()
+        key = "".join(part.capitalize() for part in name.split("_"))
+        if key not in data:
+            raise AttributeError(name)
+        return data[key]
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.id == other.id
+
+    def __hash__(self):
+        return hash((type(self), self.id))
+
+
+class FakeCollection:
+    def __init__(self, items):
+        self.items = items
+
+    def all(self):
+        return iter(self.items())
+
+
+class FakeVpc(FakeModel):
+    def describe(self):
+        return FakeEc2(self.aws).describe_vpcs(VpcIds=[self.id])["Vpcs"][0]
+
+    @property
+    def subnets(self):
+        def items():
+            response = FakeEc2(self.aws).describe_subnets(
+                Filters=[{"Name": "vpc-id", "Values": [self.id]}]
+            )
+            return [FakeSubnet(self.aws, s["SubnetId"]) for s in response["Subnets"]]
+
+        return FakeCollection(items)
+
+
+class FakeSubnet(FakeModel):
+    def describe(self):
+        return FakeEc2(self.aws).describe_subnets(SubnetIds=[self.id])["Subnets"][0]
+
+
+class FakeEc2Resource:
+    def __init__(self, aws):
+        self.aws = aws
+
+    def Vpc(self, id):
+        return FakeVpc(self.aws, id)
+
+    def Subnet(self, id):
+        return FakeSubnet(self.aws, id)
+
+
+class FakeBucket(FakeModel):
+    @property
+    def name(self):
+        return self.id
+
+    def describe(self):
+        return self.aws.buckets[self.id]
+
+
+class FakeS3Resource:
+    def __init__(self, aws):
+        self.aws = aws
+        self.buckets = FakeCollection(
+            lambda: [FakeBucket(aws, name) for name in aws.buckets]
+        )
+
+    def create_bucket(self, Bucket, **kwargs):
+        FakeS3(self.aws).create_bucket(Bucket=Bucket, **kwargs)
+        return FakeBucket(self.aws, Bucket)
+
+
+class FakeTable(FakeModel):
+    @property
+    def name(self):
+        return self.id
+
+    def describe(self):
+        return FakeDynamoDb(self.aws).describe_table(TableName=self.id)["Table"]
+
+
+class FakeDynamoDbResource:
+    def __init__(self, aws):
+        self.aws = aws
+        self.tables = FakeCollection(
+            lambda: [FakeTable(aws, name) for name in sorted(aws.tables)]
+        )
+
+    def create_table(self, TableName, **kwargs):
+        FakeDynamoDb(self.aws).create_table(TableName=TableName, **kwargs)
+        return FakeTable(self.aws, TableName)
+
+
+RESOURCES = {
+    "ec2": FakeEc2Resource,
+    "s3": FakeS3Resource,
+    "dynamodb": FakeDynamoDbResource,
+}
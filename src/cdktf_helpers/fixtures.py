@@ -1,64 +1,375 @@
+import hashlib
+import json
+import os
+import shutil
 from contextlib import contextmanager
+from pathlib import Path
+from tempfile import mkdtemp
 
 import pytest
-from moto import mock_aws
+
+# Credentials for a moto server, which unlike mock_aws() doesn't set any
+MOTO_SERVER_ENV = {
+    "AWS_ACCESS_KEY_ID": "testing",
+    "AWS_SECRET_ACCESS_KEY": "testing",
+    "AWS_SECURITY_TOKEN": "testing",
+    "AWS_SESSION_TOKEN": "testing",
+}
+
+
+def worker_name():
+    # Set by pytest-xdist in each of its workers
+    return os.environ.get("PYTEST_XDIST_WORKER", "main")
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("cdktf-helpers")
+    group.addoption(
+        "--cdktf-moto-server",
+        action="store_true",
+        help="Mock AWS for the cdktf_helpers fixtures with a moto server per "
+        "worker, rather than in-process. Requires moto[server]",
+    )
+    group.addoption(
+        "--cdktf-fake-aws",
+        action="store_true",
+        help="Stand in for AWS in the cdktf_helpers fixtures with the in-memory "
+        "fake from cdktf_helpers.fake_aws rather than moto. Quicker, but only "
+        "covers the calls settings and backends make",
+    )
+    group.addoption(
+        "--cdktf-snapshot-update",
+        action="store_true",
+        help="Write the snapshots compared by the snapshot fixture, rather than "
+        "failing when they differ",
+    )
+
+
+def clear_aws_caches():
+    # Imported here to keep loading the plugin quick
+    from .settings.aws.utils import clear_aws_caches
+
+    clear_aws_caches()
+
+
+@contextmanager
+def faked_aws(aws):
+    """Have boto3_session() hand out sessions of an in-memory FakeAws"""
+    from .settings.aws.utils import set_session_provider
+
+    clear_aws_caches()
+    previous = set_session_provider(aws.session)
+    try:
+        yield aws
+    finally:
+        set_session_provider(previous)
+        clear_aws_caches()
+
+
+@pytest.fixture()
+def fake_aws():
+    """In-memory stand in for AWS, see cdktf_helpers.fake_aws
+
+    Starts out with a default VPC and nothing else. Add resources with its
+    add_* methods, or by calling AWS as the code under test does.
+    """
+    from .fake_aws import FakeAws
+
+    with faked_aws(FakeAws()) as aws:
+        yield aws
+
+
+@pytest.fixture(scope="session")
+def cdktf_outdir(tmp_path_factory):
+    """Directory stacks built by the fixtures are synthesized into
+
+    tmp_path_factory gives each pytest-xdist worker its own base directory.
+    """
+    return tmp_path_factory.mktemp(f"cdktf-{worker_name()}")
+
+
+@pytest.fixture(scope="session")
+def seed_settings():
+    """Settings saved to parameter store before any stack is built
+
+    Override this to return (settings model, values) pairs, the values
+    including app and environment.
+    """
+    return []
+
+
+@pytest.fixture(scope="session")
+def mocked_aws(request, seed_settings):
+    """Context manager factory mocking AWS for the fixtures
+
+    By default that's one mock_aws() per worker, seeded once, whose data is
+    kept between entries. A test entering mock_aws() of its own resets moto,
+    so the settings are seeded again if they've gone. With
+    --cdktf-moto-server each worker starts its own moto server, seeded once,
+    and the fixtures point boto3 at it while they run. With --cdktf-fake-aws
+    a FakeAws is seeded once and stands in for AWS instead.
+    """
+
+    def seed():
+        for settings_model, values in seed_settings:
+            settings_model(**values).save()
+
+    def is_seeded():
+        if not seed_settings:
+            return True
+        settings_model, values = seed_settings[0]
+        return bool(settings_model.fetch_settings(values["app"], values["environment"]))
+
+    if request.config.getoption("cdktf_fake_aws"):
+        from .fake_aws import FakeAws
+
+        fake = FakeAws()
+
+        @contextmanager
+        def aws():
+            with faked_aws(fake):
+                yield
+
+        with aws():
+            seed()
+        yield aws
+        return
+
+    if not request.config.getoption("cdktf_moto_server"):
+        from moto import mock_aws
+
+        mock = mock_aws()
+
+        @contextmanager
+        def aws():
+            mock.start(reset=False)
+            try:
+                if not is_seeded():
+                    seed()
+                yield
+            finally:
+                mock.stop(remove_data=False)
+
+        mock.start()
+        try:
+            seed()
+        finally:
+            mock.stop(remove_data=False)
+        yield aws
+        return
+
+    try:
+        from moto.server import ThreadedMotoServer
+    except ImportError as e:
+        raise pytest.UsageError(f"--cdktf-moto-server needs moto[server]: {e}")
+
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    env = {**MOTO_SERVER_ENV, "AWS_ENDPOINT_URL": f"http://{host}:{port}"}
+
+    @contextmanager
+    def aws():
+        with pytest.MonkeyPatch.context() as monkeypatch:
+            for name, value in env.items():
+                monkeypatch.setenv(name, value)
+            yield
+
+    try:
+        with aws():
+            seed()
+        yield aws
+    finally:
+        server.stop()
+
+
+@pytest.fixture(scope="session")
+def default_settings(mocked_aws):
+    """Settings stacks are built with when a test doesn't give any"""
+    from .settings.aws import AwsAppSettings
+
+    with mocked_aws():
+        return AwsAppSettings(app="app", environment="dev")
 
 
 @pytest.fixture(scope="module")
-def stack():
+def stack(mocked_aws, default_settings, cdktf_outdir):
     @contextmanager
     def _stack(stack_class, settings=None):
         from cdktf import LocalBackend, Testing
 
-        from .settings.aws import AwsAppSettings
         from .stacks import AwsS3StateStack
 
         assert issubclass(stack_class, AwsS3StateStack)
 
-        monkeypatch = pytest.MonkeyPatch()
-
-        # Ensure we do not have an active AWS CLI session
-        for name in ("AWS_PROFILE", "AWS_DEFAULT_PROJECT"):
-            monkeypatch.delenv(name, raising=False)
+        with pytest.MonkeyPatch.context() as monkeypatch:
+            # Ensure we do not have an active AWS CLI session
+            for name in ("AWS_PROFILE", "AWS_DEFAULT_PROJECT"):
+                monkeypatch.delenv(name, raising=False)
 
-        # Patch S3Backend to be a LocalBackend to avoid AWS API activity
-        monkeypatch.setattr(
-            stack_class, "register_backend", lambda self: LocalBackend(self)
-        )
+            # Patch S3Backend to be a LocalBackend to avoid AWS API activity
+            monkeypatch.setattr(
+                stack_class, "register_backend", lambda self: LocalBackend(self)
+            )
 
-        # Initialise our stack with the monkey patching in place
-        with mock_aws():
-            settings = settings or AwsAppSettings(app="app", environment="dev")
-            stack = stack_class(Testing.app(), "stack", settings)
-            try:
-                yield stack
-            finally:
-                monkeypatch.undo()
+            # Initialise our stack with the monkey patching in place
+            with mocked_aws():
+                app = Testing.app(outdir=mkdtemp(dir=cdktf_outdir, prefix="app-"))
+                yield stack_class(app, "stack", settings or default_settings)
 
     return _stack
 
 
+def synth_key(kind, stack_class, settings):
+    # Only stored fields and extras, computed ones like Subnet.cidr_block
+    # would call AWS
+    values = {name: getattr(settings, name) for name in type(settings).model_fields}
+    values.update(settings.model_extra or {})
+    values = json.dumps(values, sort_keys=True, default=str)
+    return (kind, stack_class, type(settings), values)
+
+
+def make_read_only(path):
+    # Directories stay writable so terraform can still init in them
+    for file in Path(path).rglob("*"):
+        if file.is_file():
+            file.chmod(file.stat().st_mode & ~0o222)
+
+
+@pytest.fixture(scope="session")
+def synth_cache():
+    """Synth results shared by every test in the session
+
+    Keyed by stack class and settings, so each distinct stack is only
+    synthesized once.
+    """
+    return {}
+
+
 @pytest.fixture(scope="module")
-def synthesized(stack):
+def synthesized(stack, synth_cache, default_settings):
     @contextmanager
-    def _synthesized(stack_class):
+    def _synthesized(stack_class, settings=None, memoize=True):
+        """Pass memoize=False to synthesize afresh, eg. after changing the
+        stack class"""
         from cdktf import Testing
 
-        nonlocal stack
-        with stack(stack_class) as stack:
-            yield Testing.synth(stack)
+        settings = settings or default_settings
+        key = synth_key("synth", stack_class, settings)
+        if not memoize or key not in synth_cache:
+            with stack(stack_class, settings) as built:
+                result = Testing.synth(built)
+            if not memoize:
+                yield result
+                return
+            synth_cache[key] = result
+        yield synth_cache[key]
 
     return _synthesized
 
 
 @pytest.fixture(scope="module")
-def fully_synthesized(stack):
+def fully_synthesized(stack, synth_cache, default_settings, cdktf_outdir):
     @contextmanager
-    def _fully_synthesized(stack_class):
+    def _fully_synthesized(stack_class, settings=None, memoize=True):
+        """Memoized output directories are shared, so their files are made
+        read only. Pass memoize=False to get a directory of your own"""
         from cdktf import Testing
 
-        nonlocal stack
-        with stack(stack_class) as stack:
-            yield Testing.full_synth(stack)
+        settings = settings or default_settings
+        key = synth_key("full_synth", stack_class, settings)
+        if not memoize or key not in synth_cache:
+            with stack(stack_class, settings) as built:
+                # full_synth picks a temporary directory of its own, keep
+                # the output with the rest of this worker's
+                outdir = Path(mkdtemp(dir=cdktf_outdir, prefix="full-")) / "out"
+                result = str(shutil.move(Testing.full_synth(built), outdir))
+            if not memoize:
+                yield result
+                return
+            make_read_only(result)
+            synth_cache[key] = result
+        yield synth_cache[key]
 
     return _fully_synthesized
+
+
+@pytest.fixture(scope="session")
+def valid_terraform():
+    """Whether full synth output directories are valid terraform
+
+    Like Testing.to_be_valid_terraform, but takes several directories to
+    check in one pass. Providers come from the plugin cache shared with
+    cdktf-python, and stacks already checked this session aren't checked
+    again. terraform's output is printed, so it's shown for failing tests.
+    """
+    from .plugin_cache import shared_plugin_cache
+    from .terraform import full_synth_stacks, validate_stacks
+
+    results = {}
+
+    def key(stack_dir):
+        config = (stack_dir / "cdk.tf.json").read_bytes()
+        return (str(stack_dir), hashlib.sha256(config).hexdigest())
+
+    def _valid_terraform(*outdirs):
+        stacks = {d: key(d) for outdir in outdirs for d in full_synth_stacks(outdir)}
+        pending = [d for d, k in stacks.items() if k not in results]
+        if pending:
+            try:
+                with shared_plugin_cache():
+                    codes = validate_stacks(pending)
+            except FileNotFoundError as e:
+                pytest.fail(f"Couldn't run terraform: {e}", pytrace=False)
+            for stack_dir, code in codes.items():
+                results[stacks[stack_dir]] = code == 0
+        return bool(stacks) and all(results[k] for k in stacks.values())
+
+    return _valid_terraform
+
+
+@pytest.fixture()
+def snapshot(request):
+    """Compare synth output with a snapshot stored alongside the test module
+
+    Snapshots are kept in snapshots/<module>/<test>.json. Pass a name for
+    each snapshot after the first in a test. Returns the output as a
+    snapshots.SynthIndex, to make further assertions on without parsing it
+    again.
+    """
+    from .snapshots import compare_snapshot, format_diff, snapshot_path
+
+    directory = request.path.parent / "snapshots" / request.path.stem
+    update = request.config.getoption("cdktf_snapshot_update")
+    names = set()
+
+    def _snapshot(synthesized, name=None):
+        name = name or request.node.name
+        if name in names:
+            raise ValueError(f"Snapshot {name} already taken in this test")
+        names.add(name)
+        path = snapshot_path(directory, name)
+        index, changes = compare_snapshot(synthesized, path, update)
+        if changes is None:
+            pytest.fail(
+                f"No snapshot at {path}, run with --cdktf-snapshot-update to write it",
+                pytrace=False,
+            )
+        if changes:
+            pytest.fail(
+                f"Synth output differs from {path}\n{format_diff(changes)}\n"
+                "Run with --cdktf-snapshot-update to accept the changes",
+                pytrace=False,
+            )
+        return index
+
+    return _snapshot
+
+
+@pytest.fixture()
+def build_profile():
+    """Profile of every stack built during the test, see profiling.BuildProfile"""
+    from .profiling import profiling
+
+    with profiling() as profile:
+        yield profile
@@ -0,0 +1,164 @@
+import codecs
+import json
+import re
+
+# Characters that change nesting or string state, everything else can be
+# skipped over in bulk
+STRUCTURE = re.compile(r'[\[\]{}"]')
+STRING_END = re.compile(r'["\\]')
+SCALAR_END = re.compile(r"[\s,\]}]")
+NON_WHITESPACE = re.compile(r"\S")
+
+decoder = json.JSONDecoder()
+
+
+class JsonStream:
+    """Incremental JSON reader over a binary file-like object
+
+    Only holds the part of the document currently being looked at in
+    memory. Callers walk the document with iter_object() and iter_array()
+    and must consume each value they are handed, either with decode() to
+    load it or skip() to pass over it without building any objects.
+    """
+
+    def __init__(self, fh, chunk_size=65536):
+        self.fh = fh
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.bytes_read = 0
+
+    def fill(self):
+        if self.eof:
+            return False
+        # While a value being decoded grows the buffer, read as much again
+        # each time, so copying what's kept stays linear overall
+        chunk = self.fh.read(max(self.chunk_size, len(self.buffer) - self.pos))
+        if not chunk:
+            self.eof = True
+            self.buffer = self.buffer[self.pos :] + self.decoder.decode(b"", True)
+            self.pos = 0
+            return False
+        self.bytes_read += len(chunk)
+        self.buffer = self.buffer[self.pos :] + self.decoder.decode(chunk)
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            match = NON_WHITESPACE.search(self.buffer, self.pos)
+            if match:
+                self.pos = match.start()
+                return self.buffer[self.pos]
+            self.pos = len(self.buffer)
+            if not self.fill():
+                raise ValueError("Unexpected end of JSON document")
+
+    def expect(self, char):
+        if self.peek() != char:
+            found = self.buffer[self.pos]
+            raise ValueError(f"Expected {char!r} but found {found!r} in JSON document")
+        self.pos += 1
+
+    def decode(self):
+        """Load the next value into Python objects"""
+        self.value_end()
+        value, self.pos = decoder.raw_decode(self.buffer, self.pos)
+        return value
+
+    def skip(self):
+        """Pass over the next value without loading it"""
+        self.pos = self.value_end(keep=False)
+
+    def value_end(self, keep=True):
+        """Read on until the whole of the next value is in the buffer
+
+        Returns where it ends, leaving pos at its start. Without keep, pos
+        is moved along as it goes, so the buffer only holds the end of the
+        value and memory use stays flat however big it is. Scalars end at
+        whatever follows them, as a number may continue in the next chunk
+        even past a prefix that's valid on its own like "12." or "1e".
+        Containers and strings end at their closing character, found
+        skipping over everything else in bulk.
+        """
+        if self.peek() not in '[{"':
+            while True:
+                match = SCALAR_END.search(self.buffer, self.pos)
+                if match:
+                    return match.start()
+                if not keep:
+                    self.pos = len(self.buffer)
+                if not self.fill():
+                    return len(self.buffer)
+        # Scanned up to here, relative to pos as filling moves the buffer
+        scanned = 0
+        depth = 0
+        in_string = False
+        while True:
+            pattern = STRING_END if in_string else STRUCTURE
+            match = pattern.search(self.buffer, self.pos + scanned)
+            if not match:
+                scanned = len(self.buffer) - self.pos
+                if not keep:
+                    self.pos, scanned = len(self.buffer), 0
+                if not self.fill():
+                    raise ValueError("Unexpected end of JSON document")
+                continue
+            char = match.group()
+            scanned = match.end() - self.pos
+            if in_string:
+                if char == "\\":
+                    # Make sure the escaped character is in the buffer
+                    if self.pos + scanned >= len(self.buffer):
+                        if not keep:
+                            self.pos, scanned = len(self.buffer), 0
+                        if not self.fill():
+                            raise ValueError("Unexpected end of JSON document")
+                    scanned += 1
+                    continue
+                in_string = False
+            elif char == '"':
+                in_string = True
+                continue
+            elif char in "[{":
+                depth += 1
+                continue
+            else:
+                depth -= 1
+            if depth == 0:
+                return self.pos + scanned
+
+    def iter_object(self):
+        """Yield each key of the next object, leaving its value to the caller"""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.decode()
+            self.expect(":")
+            yield key
+            if self.peek() == ",":
+                self.pos += 1
+            else:
+                self.expect("}")
+                return
+
+    def iter_array(self):
+        """Yield the index of each element of the next array, leaving the
+        element to the caller"""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        index = 0
+        while True:
+            yield index
+            index += 1
+            if self.peek() == ",":
+                self.pos += 1
+            else:
+                self.expect("]")
+                return
@@ -0,0 +1,309 @@
+import os
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+MB = 1024 * 1024
+
+# The profile phases are being recorded into, or None when not profiling
+active = None
+
+
+def is_memory_profiling():
+    return active is not None
+
+
+def process_rss(pid="self"):
+    """Resident set size of a process in bytes, or None if it can't be read"""
+    try:
+        pages = int(Path(f"/proc/{pid}/statm").read_text().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE")
+
+
+def parent_pids():
+    """Parent process ID of every process, keyed by process ID"""
+    parents = {}
+    for proc in Path("/proc").glob("[0-9]*"):
+        try:
+            stat = (proc / "stat").read_text()
+            # The command name may contain spaces and parentheses
+            parents[int(proc.name)] = int(stat.rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+    return parents
+
+
+def jsii_launchers(parents):
+    """Children of this process running the jsii runtime script"""
+    pids = []
+    for pid, ppid in parents.items():
+        try:
+            if (
+                ppid == os.getpid()
+                and b"jsii" in Path(f"/proc/{pid}/cmdline").read_bytes()
+            ):
+                pids.append(pid)
+        except OSError:
+            continue
+    return pids
+
+
+def descendants(pids, parents):
+    """pids and every process descended from them"""
+    children = {}
+    for pid, ppid in parents.items():
+        children.setdefault(ppid, []).append(pid)
+    tree = list(pids)
+    found = list(pids)
+    while found:
+        below = children.get(found.pop(), [])
+        tree.extend(below)
+        found.extend(below)
+    return tree
+
+
+def child_pids(pid):
+    """Child process IDs of a process, from the lists of its threads'
+    children, or None if the kernel doesn't provide them"""
+    files = list(Path(f"/proc/{pid}/task").glob("*/children"))
+    if not files:
+        return None
+    pids = []
+    for path in files:
+        try:
+            pids.extend(int(child) for child in path.read_text().split())
+        except (OSError, ValueError):
+            continue
+    return pids
+
+
+def process_tree(pids):
+    """As descendants(), but without scanning /proc, or None if the kernel
+    doesn't list children"""
+    tree = list(pids)
+    found = list(pids)
+    while found:
+        below = child_pids(found.pop())
+        if below is None:
+            return None
+        tree.extend(below)
+        found.extend(below)
+    return tree
+
+
+def jsii_processes():
+    """Process IDs of the jsii runtimes started by this process
+
+    Found by scanning /proc for children running the jsii runtime script,
+    so only works on Linux. Returns an empty list elsewhere. The child is
+    only a launcher, the kernel doing the work is a node process it starts,
+    so every descendant of the launcher is included.
+    """
+    parents = parent_pids()
+    return descendants(jsii_launchers(parents), parents)
+
+
+def jsii_rss(pids=None):
+    """Combined RSS of the jsii processes, found afresh unless pids are given"""
+    sizes = [process_rss(pid) for pid in (jsii_processes() if pids is None else pids)]
+    sizes = [size for size in sizes if size is not None]
+    return sum(sizes) if sizes else None
+
+
+class MemoryProfile:
+    """Peak memory use of each phase of a synth
+
+    With allocations, Python allocations are traced and each phase records
+    its allocation growth, otherwise only RSS is sampled.
+    """
+
+    def __init__(self, allocations=True):
+        self.allocations = allocations
+        self.phases = []
+        self.first_snapshot = None
+        self.last_snapshot = None
+        # The jsii processes, found once rather than scanning /proc each time
+        self.jsii_launchers = []
+        self.jsii_pids = []
+        # Peaks seen by the sampler during the current phase
+        self.peak_rss = 0
+        self.peak_jsii_rss = 0
+        self.peak_total = 0
+        self.lock = threading.Lock()
+
+    def find_jsii(self, rescan=False):
+        # Scanning /proc is slow, so once the launcher is found, the kernel
+        # it starts is found from its list of children. Where the kernel
+        # doesn't list children, /proc is scanned again only when asked
+        # to, eg. between phases, or when one of the processes has gone.
+        tree = process_tree(self.jsii_launchers) if self.jsii_launchers else None
+        if tree is not None:
+            self.jsii_pids = tree
+        elif (
+            rescan
+            or not self.jsii_pids
+            or any(process_rss(pid) is None for pid in self.jsii_pids)
+        ):
+            parents = parent_pids()
+            self.jsii_launchers = jsii_launchers(parents)
+            self.jsii_pids = descendants(self.jsii_launchers, parents)
+
+    def sample(self, rescan=False):
+        self.find_jsii(rescan)
+        rss = process_rss() or 0
+        child = jsii_rss(self.jsii_pids) or 0
+        with self.lock:
+            self.peak_rss = max(self.peak_rss, rss)
+            self.peak_jsii_rss = max(self.peak_jsii_rss, child)
+            self.peak_total = max(self.peak_total, rss + child)
+
+    def reset_peaks(self):
+        with self.lock:
+            self.peak_rss = self.peak_jsii_rss = self.peak_total = 0
+        if self.allocations:
+            tracemalloc.reset_peak()
+        self.sample(rescan=True)
+
+    @property
+    def peak(self):
+        """Highest combined RSS of Python and jsii seen in any phase"""
+        return max((phase["peak_total"] for phase in self.phases), default=0)
+
+    def top_sites(self, limit=10):
+        """Allocation sites that grew the most over the whole profile"""
+        if self.first_snapshot is None or self.last_snapshot is None:
+            return []
+        return growth(self.last_snapshot, self.first_snapshot)[:limit]
+
+    def format(self, limit=10):
+        from tabulate import tabulate
+
+        def mb(size):
+            return f"{size / MB:.1f}" if size else "-"
+
+        def growth_mb(size):
+            return "-" if size is None else f"{size / MB:+.1f}"
+
+        phases = tabulate(
+            [
+                [
+                    phase["name"],
+                    mb(phase["python_peak"]),
+                    growth_mb(phase["python_growth"]),
+                    mb(phase["peak_rss"]),
+                    mb(phase["peak_jsii_rss"]),
+                    phase["top_site"] or "",
+                ]
+                for phase in self.phases
+            ],
+            headers=[
+                "Phase",
+                "Python peak MB",
+                "Python growth MB",
+                "RSS peak MB",
+                "jsii RSS peak MB",
+                "Largest allocation site",
+            ],
+        )
+        sites = tabulate(
+            [
+                [format_site(stat), f"{stat.size_diff / MB:+.1f}", stat.count_diff]
+                for stat in self.top_sites(limit)
+            ],
+            headers=["Allocation site", "Growth MB", "Blocks"],
+        )
+        return f"{phases}\n\n{sites}\n\nPeak memory: {self.peak / MB:.1f} MB"
+
+
+def growth(after, before):
+    """Allocation sites by how much they grew between two snapshots"""
+    # Leave out the memory used by the profiling itself. Filtering the
+    # grouped statistics is far quicker than Snapshot.filter_traces()
+    profiling_files = {tracemalloc.__file__, __file__}
+    return [
+        stat
+        for stat in after.compare_to(before, "lineno")
+        if stat.traceback[0].filename not in profiling_files
+    ]
+
+
+def format_site(stat):
+    frame = stat.traceback[0]
+    return f"{frame.filename}:{frame.lineno}"
+
+
+@contextmanager
+def memory_profiling(interval=0.05, frames=1, allocations=True):
+    """Profile memory use of each phase run within the block
+
+    The RSS of this process and of the jsii runtime's Node.js processes are
+    sampled every interval seconds from a background thread. With
+    allocations, Python allocations are also traced with tracemalloc, which
+    slows things down and adds to the RSS itself.
+    """
+    global active
+    profile = MemoryProfile(allocations)
+    started = allocations and not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start(frames)
+    stop = threading.Event()
+
+    def sampler():
+        while not stop.wait(interval):
+            profile.sample()
+
+    thread = threading.Thread(target=sampler, name="memory-sampler", daemon=True)
+    thread.start()
+    previous = active
+    active = profile
+    if allocations:
+        profile.first_snapshot = profile.last_snapshot = tracemalloc.take_snapshot()
+    try:
+        yield profile
+    finally:
+        active = previous
+        stop.set()
+        thread.join()
+        if allocations:
+            profile.last_snapshot = tracemalloc.take_snapshot()
+        if started:
+            tracemalloc.stop()
+
+
+@contextmanager
+def memory_phase(name):
+    """Record peak memory use of the enclosed block, when profiling"""
+    profile = active
+    if profile is None:
+        yield
+        return
+    profile.reset_peaks()
+    try:
+        yield
+    finally:
+        profile.sample()
+        python_peak = python_growth = None
+        sites = []
+        if profile.allocations:
+            # Read the peak before the snapshot adds to it
+            python_peak = tracemalloc.get_traced_memory()[1]
+            # One snapshot per phase boundary, so growth is counted from the
+            # end of the previous phase
+            before = profile.last_snapshot
+            profile.last_snapshot = tracemalloc.take_snapshot()
+            sites = growth(profile.last_snapshot, before)
+            python_growth = sum(stat.size_diff for stat in sites)
+        profile.phases.append(
+            {
+                "name": name,
+                "python_peak": python_peak,
+                "python_growth": python_growth,
+                "peak_rss": profile.peak_rss,
+                "peak_jsii_rss": profile.peak_jsii_rss,
+                "peak_total": profile.peak_total,
+                "top_site": format_site(sites[0]) if sites else None,
+            }
+        )
@@ -0,0 +1,112 @@
+import os
+import shutil
+import uuid
+import zipfile
+from contextlib import contextmanager
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+
+from .utils import cache_dir
+
+
+def plugin_cache_dir():
+    """Shared terraform plugin cache for the installed AWS provider bindings
+
+    Each version of the bindings is generated from one version of the
+    provider, so keying the cache by it keeps the providers it holds few.
+    """
+    try:
+        bindings = version("cdktf-cdktf-provider-aws")
+    except PackageNotFoundError:
+        bindings = "unknown"
+    return cache_dir("terraform-plugins", f"cdktf-provider-aws-{bindings}")
+
+
+def cached_providers(cache):
+    """Providers in a plugin cache, as hostname/namespace/type/version/target"""
+    cache = Path(cache)
+    return {
+        str(path.relative_to(cache))
+        for path in cache.glob("*/*/*/*/*")
+        if path.is_dir()
+    }
+
+
+def extract_provider(archive, dest):
+    # Extract next to the destination first so a half extracted provider is
+    # never picked up by terraform
+    staging = dest.parent / f".{dest.name}.{uuid.uuid4().hex}"
+    with zipfile.ZipFile(archive) as zf:
+        zf.extractall(staging)
+    # Zip files don't keep the executable bit
+    for path in staging.iterdir():
+        if path.name.startswith("terraform-provider-"):
+            path.chmod(0o755)
+    staging.rename(dest)
+
+
+def seed_plugin_cache(cache, mirror):
+    """Copy providers missing from the cache in from a local mirror
+
+    The mirror is laid out as terraform's filesystem mirrors are, either
+    unpacked or packed as `terraform providers mirror` writes them.
+    Returns the number of providers copied.
+    """
+    cache, mirror = Path(cache), Path(mirror)
+    seeded = 0
+    for path in mirror.glob("*/*/*/*/*"):
+        dest = cache / path.relative_to(mirror)
+        if path.is_dir() and not dest.exists():
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copytree(path, dest, symlinks=True)
+            seeded += 1
+    for archive in mirror.glob("*/*/*/terraform-provider-*.zip"):
+        # eg. terraform-provider-aws_5.84.0_linux_amd64.zip
+        _, provider_version, target = archive.stem.split("_", 2)
+        dest = cache / archive.parent.relative_to(mirror) / provider_version / target
+        if not dest.exists():
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            extract_provider(archive, dest)
+            seeded += 1
+    return seeded
+
+
+@contextmanager
+def shared_plugin_cache(echo=print):
+    """Point terraform run by child processes at a shared plugin cache
+
+    A TF_PLUGIN_CACHE_DIR that's already set is used as is. The cache is
+    seeded from the mirror in CDKTF_PYTHON_PROVIDER_MIRROR, if set, and
+    how many providers were reused or downloaded is reported afterwards.
+    """
+    cache = Path(os.environ.get("TF_PLUGIN_CACHE_DIR") or plugin_cache_dir())
+    cache.mkdir(parents=True, exist_ok=True)
+    mirror = os.environ.get("CDKTF_PYTHON_PROVIDER_MIRROR")
+    if mirror and Path(mirror).is_dir():
+        seeded = seed_plugin_cache(cache, mirror)
+        if seeded:
+            echo(f"Copied {seeded} providers into the plugin cache from {mirror}")
+    before = cached_providers(cache)
+
+    env = {
+        "TF_PLUGIN_CACHE_DIR": str(cache),
+        # cdktf doesn't write lock files for stacks by default, without one
+        # terraform downloads providers again rather than trust the cache
+        "TF_PLUGIN_CACHE_MAY_BREAK_DEPENDENCY_LOCK_FILE": "true",
+    }
+    saved = {key: os.environ.get(key) for key in env}
+    for key, value in env.items():
+        os.environ.setdefault(key, value)
+    try:
+        yield cache
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        downloaded = cached_providers(cache) - before
+        echo(
+            f"Provider plugin cache: {len(before)} cached providers available, "
+            f"{len(downloaded)} downloaded"
+        )
@@ -0,0 +1,141 @@
+import json
+import time
+from contextlib import contextmanager
+
+# The profile constructs are being counted into, or None when not profiling
+active = None
+
+
+def is_profiling():
+    return active is not None
+
+
+class BuildProfile:
+    """Constructs created while building stacks, and what they synthesize to"""
+
+    def __init__(self):
+        # (module, type) -> count and seconds spent in the jsii constructor
+        self.constructs = {}
+        # Terraform resource or data source type -> count and JSON bytes
+        self.resources = {}
+        # Only constructs created by build() itself are counted
+        self.building = 0
+
+    def record_construct(self, cls, seconds):
+        entry = self.constructs.setdefault(
+            (cls.__module__, cls.__qualname__), {"count": 0, "seconds": 0.0}
+        )
+        entry["count"] += 1
+        entry["seconds"] += seconds
+
+    def record_stack(self, stack):
+        config = stack.to_terraform()
+        blocks = [("", config.get("resource", {})), ("data.", config.get("data", {}))]
+        for prefix, types in blocks:
+            for type_name, resources in types.items():
+                entry = self.resources.setdefault(
+                    prefix + type_name, {"count": 0, "bytes": 0}
+                )
+                entry["count"] += len(resources)
+                entry["bytes"] += len(json.dumps(resources, default=str))
+
+    def count(self, type_name):
+        """Number of constructs created of the named type, from any module"""
+        return sum(
+            entry["count"]
+            for (_, name), entry in self.constructs.items()
+            if name == type_name
+        )
+
+    def by_type(self):
+        return sorted(
+            self.constructs.items(), key=lambda item: item[1]["seconds"], reverse=True
+        )
+
+    def by_module(self):
+        modules = {}
+        for (module, _), entry in self.constructs.items():
+            totals = modules.setdefault(module, {"count": 0, "seconds": 0.0})
+            totals["count"] += entry["count"]
+            totals["seconds"] += entry["seconds"]
+        return sorted(
+            modules.items(), key=lambda item: item[1]["seconds"], reverse=True
+        )
+
+    def format(self, top=20):
+        from tabulate import tabulate
+
+        sections = [
+            tabulate(
+                [
+                    [name, module, e["count"], f"{e['seconds']:.3f}"]
+                    for (module, name), e in self.by_type()[:top]
+                ],
+                headers=["Construct", "Module", "Count", "Seconds"],
+            ),
+            tabulate(
+                [
+                    [module, e["count"], f"{e['seconds']:.3f}"]
+                    for module, e in self.by_module()[:top]
+                ],
+                headers=["Module", "Count", "Seconds"],
+            ),
+            tabulate(
+                [
+                    [type_name, e["count"], e["bytes"]]
+                    for type_name, e in sorted(
+                        self.resources.items(),
+                        key=lambda item: item[1]["bytes"],
+                        reverse=True,
+                    )[:top]
+                ],
+                headers=["Resource type", "Count", "JSON bytes"],
+            ),
+        ]
+        return "\n\n".join(sections)
+
+
+@contextmanager
+def profiling():
+    """Profile every stack built within the block, yielding the profile
+
+    Construct creation is timed by wrapping jsii.create, which every
+    construct's constructor calls once to create its JavaScript side.
+    """
+    import jsii
+    from constructs import Construct
+
+    global active
+    previous = active
+    active = profile = BuildProfile()
+    create = jsii.create
+
+    def timed_create(cls, obj, args, *rest, **kwargs):
+        start = time.perf_counter()
+        try:
+            return create(cls, obj, args, *rest, **kwargs)
+        finally:
+            if profile.building and isinstance(obj, Construct):
+                profile.record_construct(cls, time.perf_counter() - start)
+
+    jsii.create = timed_create
+    try:
+        yield profile
+    finally:
+        jsii.create = create
+        active = previous
+
+
+@contextmanager
+def profile_build(stack):
+    """Profile the constructs created by a stack's build(), if profiling"""
+    profile = active
+    if profile is None:
+        yield
+        return
+    profile.building += 1
+    try:
+        yield
+    finally:
+        profile.building -= 1
+    profile.record_stack(stack)
@@ -1,3 +1,31 @@
-from .fixtures import fully_synthesized, stack, synthesized
+from .fixtures import (
+    build_profile,
+    cdktf_outdir,
+    default_settings,
+    fake_aws,
+    fully_synthesized,
+    mocked_aws,
+    pytest_addoption,
+    seed_settings,
+    snapshot,
+    stack,
+    synth_cache,
+    synthesized,
+    valid_terraform,
+)
 
-__all__ = [stack, synthesized, fully_synthesized]
+__all__ = [
+    stack,
+    synthesized,
+    fully_synthesized,
+    build_profile,
+    snapshot,
+    synth_cache,
+    cdktf_outdir,
+    seed_settings,
+    mocked_aws,
+    default_settings,
+    fake_aws,
+    valid_terraform,
+    pytest_addoption,
+]
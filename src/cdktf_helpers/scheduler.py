@@ -0,0 +1,150 @@
+import json
+import re
+import subprocess
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from .timing import span
+
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+def stack_dependencies(manifest_path, names=None):
+    """Map each stack to the stacks it depends on, from a cdktf manifest
+
+    Dependencies on stacks outside of names are dropped, those are assumed
+    to already be in place.
+    """
+    with open(manifest_path) as fh:
+        stacks = json.load(fh)["stacks"]
+    names = set(stacks) if names is None else set(names)
+    return {
+        name: set(stacks.get(name, {}).get("dependencies", [])) & names
+        for name in names
+    }
+
+
+def reverse_dependencies(dependencies):
+    """Flip a dependency graph, eg. so dependents are destroyed first"""
+    reversed_dependencies = {name: set() for name in dependencies}
+    for name, depends_on in dependencies.items():
+        for dependency in depends_on:
+            reversed_dependencies.setdefault(dependency, set()).add(name)
+    return reversed_dependencies
+
+
+def stack_state_locations(outdir, names):
+    """The S3 bucket and key each synthesized stack keeps its state in
+
+    Stacks with another backend map to None.
+    """
+    locations = {}
+    for name in names:
+        with open(Path(outdir) / "stacks" / name / "cdk.tf.json") as fh:
+            backend = json.load(fh).get("terraform", {}).get("backend", {})
+        s3 = backend.get("s3")
+        locations[name] = (s3["bucket"], s3["key"]) if s3 else None
+    return locations
+
+
+def run_graph(dependencies, run, parallelism=1, exclusive=None):
+    """Run every node of a dependency graph, independent nodes concurrently
+
+    run(node) is called once all of the node's dependencies have succeeded
+    and returns an exit code. Nodes depending on one that failed are skipped.
+    Nodes mapped to the same value in exclusive, other than None, are never
+    run at the same time, eg. stacks sharing a state and its lock. Returns
+    the status of each node.
+    """
+    exclusive = exclusive or {}
+    status = {}
+    pending = set(dependencies)
+    running = {}
+
+    def available(node):
+        group = exclusive.get(node)
+        return group is None or all(
+            exclusive.get(other) != group for other in running.values()
+        )
+
+    with ThreadPoolExecutor(max_workers=parallelism) as executor:
+        while pending or running:
+            changed = True
+            while changed:
+                changed = False
+                for node in sorted(pending):
+                    depends_on = dependencies[node]
+                    if any(status.get(d) in (FAILED, SKIPPED) for d in depends_on):
+                        status[node] = SKIPPED
+                    elif (
+                        len(running) < parallelism
+                        and available(node)
+                        and all(status.get(d) == SUCCEEDED for d in depends_on)
+                    ):
+                        running[executor.submit(run, node)] = node
+                    else:
+                        continue
+                    pending.discard(node)
+                    changed = True
+            if not running:
+                if pending:
+                    raise ValueError(
+                        f"Dependency cycle between stacks: {', '.join(sorted(pending))}"
+                    )
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                node = running.pop(future)
+                try:
+                    status[node] = SUCCEEDED if future.result() == 0 else FAILED
+                except Exception:
+                    status[node] = FAILED
+    return status
+
+
+output_lock = threading.Lock()
+
+
+def run_prefixed(args, prefix, echo=print, **kwargs):
+    """Run a command, passing each line of its output to echo with a prefix"""
+    with span(f"{' '.join(args[:2])} {prefix}"):
+        process = subprocess.Popen(
+            args,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            stdin=subprocess.DEVNULL,
+            text=True,
+            bufsize=1,
+            **kwargs,
+        )
+        for line in process.stdout:
+            with output_lock:
+                echo(f"{prefix} | {line.rstrip()}")
+        return process.wait()
+
+
+PLAN_SUMMARY = re.compile(
+    r"Plan: (?:\d+ to import, )?(\d+) to add, (\d+) to change, (\d+) to destroy"
+)
+
+# Colour codes terraform adds to its output, even when it's piped
+ANSI_ESCAPE = re.compile(r"\x1b\[[0-9;]*m")
+
+
+def parse_plan_summary(lines):
+    """Counts of resources a plan adds, changes and destroys, from its output
+
+    Returns None if the output doesn't include a plan summary.
+    """
+    for line in lines:
+        line = ANSI_ESCAPE.sub("", line)
+        match = PLAN_SUMMARY.search(line)
+        if match:
+            add, change, destroy = (int(count) for count in match.groups())
+            return {"add": add, "change": change, "destroy": destroy}
+        if "No changes." in line:
+            return {"add": 0, "change": 0, "destroy": 0}
+    return None
@@ -0,0 +1,185 @@
+import hashlib
+import io
+import json
+import os
+import socket
+import socketserver
+import sys
+import traceback
+from contextlib import contextmanager, redirect_stderr, redirect_stdout
+from pathlib import Path
+
+from .utils import is_relative_to
+
+# Only these environment variables are passed from a client through to the
+# server for the duration of a request
+FORWARDED_ENV_PREFIX = "CDKTF_"
+
+# AWS credentials, profile and region are always the server's own, as its
+# session is created once. Requests from clients where these differ are
+# refused rather than served from another account or region.
+AWS_ENV_PREFIX = "AWS_"
+
+
+def socket_path():
+    return Path(os.environ.get("CDKTF_PYTHON_SOCKET", ".cdktf-python.sock"))
+
+
+class LineWriter(io.TextIOBase):
+    """File-like object passing each complete line written to send()"""
+
+    def __init__(self, send):
+        self.send = send
+        self.buffer = ""
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        self.buffer += text
+        *lines, self.buffer = self.buffer.split("\n")
+        for line in lines:
+            self.send({"output": line})
+        return len(text)
+
+    def flush(self):
+        if self.buffer:
+            self.send({"output": self.buffer})
+            self.buffer = ""
+
+
+def aws_identity(env=None):
+    """Digest of the AWS_ environment variables, to compare without sending them"""
+    env = os.environ if env is None else env
+    aws_env = sorted((k, v) for k, v in env.items() if k.startswith(AWS_ENV_PREFIX))
+    return hashlib.sha256(json.dumps(aws_env).encode()).hexdigest()
+
+
+@contextmanager
+def forwarded_env(env):
+    saved = {k: v for k, v in os.environ.items() if k.startswith(FORWARDED_ENV_PREFIX)}
+    for key in saved:
+        del os.environ[key]
+    os.environ.update(
+        {k: v for k, v in env.items() if k.startswith(FORWARDED_ENV_PREFIX)}
+    )
+    try:
+        yield
+    finally:
+        for key in [k for k in os.environ if k.startswith(FORWARDED_ENV_PREFIX)]:
+            del os.environ[key]
+        os.environ.update(saved)
+
+
+def forget_project_modules(root=None):
+    """Drop modules loaded from the project so the next import rereads them
+
+    Everything installed, including the cdktf and provider bindings that are
+    slow to load, and this package itself stay imported.
+    """
+    root = Path(root or os.getcwd()).resolve()
+    for name, module in list(sys.modules.items()):
+        path = getattr(module, "__file__", None)
+        if not path or name == "__main__" or name.split(".")[0] == __package__:
+            continue
+        path = Path(path).resolve()
+        if is_relative_to(path, root) and not (
+            {"site-packages", "dist-packages"} & set(path.parts)
+        ):
+            del sys.modules[name]
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        request = json.loads(self.rfile.readline())
+
+        def send(message):
+            self.wfile.write((json.dumps(message) + "\n").encode())
+            self.wfile.flush()
+
+        if request.get("cwd") != os.getcwd():
+            send({"refused": f"Server is running in {os.getcwd()}"})
+            return
+        if request.get("aws") != aws_identity():
+            send({"refused": "Server's AWS_ environment variables differ"})
+            return
+
+        writer = LineWriter(send)
+        code = 0
+        env = forwarded_env(request.get("env", {}))
+        with env, redirect_stdout(writer), redirect_stderr(writer):
+            try:
+                self.server.run(request)
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else int(e.code is not None)
+            except Exception:
+                traceback.print_exc()
+                code = 1
+        writer.flush()
+        send({"exit_code": code})
+
+
+class Server(socketserver.UnixStreamServer):
+    """Handles one request at a time, jsii isn't thread safe"""
+
+    def __init__(self, path, run):
+        self.run = run
+        super().__init__(str(path), RequestHandler)
+
+
+def is_running(path):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(str(path))
+        except (FileNotFoundError, ConnectionRefusedError):
+            return False
+    return True
+
+
+def serve(path, run):
+    """Serve requests on a UNIX socket, calling run(request) for each"""
+    path = Path(path)
+    if is_running(path):
+        raise RuntimeError(f"A server is already listening on {path}")
+    # Left behind by a server that didn't shut down cleanly
+    path.unlink(missing_ok=True)
+    server = Server(path, run)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        path.unlink(missing_ok=True)
+
+
+def forward(path, request, echo=print):
+    """Send a request to a running server, echoing its output
+
+    Returns the exit code, or None if no server is running here.
+    """
+    request = {
+        **request,
+        "cwd": os.getcwd(),
+        "aws": aws_identity(),
+        "env": {
+            k: v for k, v in os.environ.items() if k.startswith(FORWARDED_ENV_PREFIX)
+        },
+    }
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(str(path))
+    except (FileNotFoundError, ConnectionRefusedError):
+        sock.close()
+        return None
+    with sock, sock.makefile("rwb") as fh:
+        fh.write((json.dumps(request) + "\n").encode())
+        fh.flush()
+        for line in fh:
+            message = json.loads(line)
+            if "output" in message:
+                echo(message["output"])
+            elif "exit_code" in message:
+                return message["exit_code"]
+            elif "refused" in message:
+                echo(f"Not using the synth server: {message['refused']}")
+                return None
+    return 1
@@ -8,8 +8,11 @@ from .defaults import (
     default_vpc,
     default_vpc_id,
 )
+from .deferred import DeferredSettings
 from .fields import (
+    EagerField,
     HostedZoneField,
+    LiteralEnvField,
     PrivateSubnetsField,
     PublicSubnetsField,
     SubnetsField,
@@ -47,9 +50,11 @@ exported_fields = [
     SubnetsField,
     VpcField,
     HostedZoneField,
+    LiteralEnvField,
+    EagerField,
 ]
 
-exported_settings = [AwsAppSettings, AwsAppSettingsType]
+exported_settings = [AwsAppSettings, AwsAppSettingsType, DeferredSettings]
 
 exported_types = [
     AwsResource,
@@ -0,0 +1,225 @@
+import json
+from collections import UserList
+from typing import get_args, get_origin
+
+from pydantic import TypeAdapter, ValidationError
+
+from ...timing import span
+from .types import AwsResources
+
+
+def value_type(meta):
+    """The type of a field's values, unwrapping Optional
+
+    None when that isn't a single class, eg. for a union of several types.
+    """
+    if meta.origin is not None:
+        return meta.origin
+    annotation = meta.field.return_type if meta.computed else meta.field.annotation
+    args = [arg for arg in get_args(annotation) if arg is not type(None)]
+    if len(args) != 1:
+        return None
+    origin = get_origin(args[0]) or args[0]
+    return origin if isinstance(origin, type) else None
+
+
+def is_deferrable(meta):
+    """Whether terraform can read a field's value in place of synth
+
+    Not for fields marked EagerField, bools and resource lists, which
+    stacks tend to branch on and loop over, or fields whose defaults are
+    worked out in Python. Computed fields are worked out at synth too.
+    """
+    return (
+        meta.kind in ("plain", "resource")
+        and value_type(meta) is not bool
+        and not meta.eager
+        and not meta.hidden
+        and meta.default_strategy != "factory"
+    )
+
+
+def validate_field(meta, value):
+    # Only the field's own type is checked, not validators of the model
+    if meta.kind == "resource":
+        return meta.resource_class(id=value) if isinstance(value, str) else value
+    if meta.kind == "resource_list":
+        return AwsResources([meta.resource_class(id=id) for id in value])
+    return TypeAdapter(meta.field.annotation).validate_python(value)
+
+
+def token_for(meta, expression):
+    from cdktf import Token
+
+    if meta.kind == "resource":
+        return meta.resource_class.model_construct(id=Token.as_string(expression))
+    origin = value_type(meta)
+    if origin is str:
+        return Token.as_string(expression)
+    if origin in (int, float):
+        return Token.as_number(expression)
+    if origin and issubclass(origin, (list, UserList)):
+        return Token.as_list(expression)
+    raise TypeError(
+        f"Can't defer {meta.name} of type {meta.field.annotation}, only strings, "
+        "numbers, lists and resources can be. Mark it with EagerField"
+    )
+
+
+class DeferredSettings:
+    """Settings for AwsS3StateStack to leave terraform to read
+
+    Pass in place of settings. The stack then reads every parameter under
+    the settings' namespace with one aws_ssm_parameters_by_path data
+    source, and its settings are tokens reading from it, resolved at plan
+    time. Fields is_deferrable() rules out, and computed fields, are
+    resolved in Python as usual, with a single fetch from parameter store,
+    and the rest of synth needs no AWS access.
+    """
+
+    def __init__(self, settings_model, app, environment):
+        self.settings_model = settings_model
+        self.app = app
+        self.environment = environment
+        self._eager_values = None
+        self._computed_values = None
+
+    @property
+    def namespace(self):
+        return self.settings_model.format_namespace(self.app, self.environment)
+
+    def eager_fields(self):
+        return {
+            name: meta
+            for name, meta in self.settings_model.field_metadata().items()
+            if not is_deferrable(meta)
+        }
+
+    def computed_fields(self):
+        return {
+            name: meta
+            for name, meta in self.settings_model.field_metadata(
+                include_computed=True
+            ).items()
+            if meta.computed
+        }
+
+    def resolve(self):
+        """Values of the fields resolved at synth, with a single fetch
+
+        Computed fields would otherwise be worked out from tokens, so they
+        are worked out from the stored values of every field.
+        """
+        eager = self.eager_fields()
+        computed = self.computed_fields()
+        params = {}
+        if eager or computed:
+            with span("fetch eager settings", prefix=self.namespace):
+                params = self.settings_model.fetch_settings(self.app, self.environment)
+        eager_values = {}
+        errors = []
+        for name, meta in eager.items():
+            if name in params:
+                value = params[name]
+            elif meta.required:
+                errors.append({"type": "missing", "loc": (name,), "input": None})
+                continue
+            else:
+                value = meta.default()
+            try:
+                eager_values[name] = (
+                    None if value is None else validate_field(meta, value)
+                )
+            except ValidationError as e:
+                errors.extend(
+                    {**error, "loc": (name, *error["loc"])} for error in e.errors()
+                )
+        if errors:
+            # Reported like the settings models' own validation errors
+            raise ValidationError.from_exception_data(
+                self.settings_model.__name__, errors
+            )
+        self._eager_values = eager_values
+        self._computed_values = {}
+        if computed:
+            values = {}
+            for name, meta in self.settings_model.field_metadata().items():
+                value = params[name] if name in params else meta.default()
+                values[name] = None if value is None else validate_field(meta, value)
+            resolved = self.settings_model.model_construct(
+                app=self.app, environment=self.environment, **values
+            )
+            self._computed_values = {name: getattr(resolved, name) for name in computed}
+
+    def eager_values(self):
+        """Values of the fields resolved at synth, fetched once"""
+        if self._eager_values is None:
+            self.resolve()
+        return self._eager_values
+
+    def computed_values(self):
+        """Values of the computed fields, worked out at synth"""
+        if self._eager_values is None:
+            self.resolve()
+        return self._computed_values
+
+    def as_dict(self):
+        # What determines the synthesized output, eg. for the synth cache
+        return {
+            "app": self.app,
+            "environment": self.environment,
+            "deferred": True,
+            **self.eager_values(),
+            **self.computed_values(),
+        }
+
+    def build(self, stack):
+        """Settings with deferred fields read by a data source in stack"""
+        from cdktf import Fn, Token
+        from cdktf_cdktf_provider_aws.data_aws_ssm_parameters_by_path import (
+            DataAwsSsmParametersByPath,
+        )
+
+        parameters = DataAwsSsmParametersByPath(
+            stack,
+            "settings",
+            path=self.namespace,
+            recursive=True,
+            with_decryption=True,
+        )
+        by_name = Fn.zipmap(parameters.names, parameters.values)
+        values = dict(self.eager_values())
+        for name, meta in self.settings_model.field_metadata().items():
+            if not is_deferrable(meta):
+                continue
+            key = f"{self.namespace}{name}"
+            if meta.default_strategy == "value":
+                # Parameters are stored JSON encoded, defaults need to match.
+                # Terraform encodes it, as cdktf doesn't escape the quotes in
+                # string literals
+                default = json.loads(json.dumps(meta.default(), default=str))
+                # cdktf drops a null argument, but its encoding needs no quotes
+                encoded = "null" if default is None else Fn.jsonencode(default)
+                stored = Fn.lookup(by_name, key, encoded)
+            else:
+                stored = Fn.lookup(by_name, key)
+            values[name] = token_for(meta, Fn.jsondecode(Token.as_string(stored)))
+        settings_class = self.settings_model
+        computed = self.computed_values()
+        if computed:
+            # Computed fields give the values worked out at synth, rather than
+            # working them out again from tokens
+            settings_class = type(
+                settings_class.__name__,
+                (settings_class,),
+                {
+                    "__module__": settings_class.__module__,
+                    **{
+                        name: property(lambda self, value=value: value)
+                        for name, value in computed.items()
+                    },
+                },
+            )
+        return settings_class.model_construct(
+            app=self.app, environment=self.environment, **values
+        )
@@ -1,5 +1,6 @@
 from pydantic import Field
 
+from ..metadata import EAGER, LITERAL_ENV
 from .defaults import (
     default_private_subnet_ids,
     default_public_subnet_ids,
@@ -30,3 +31,21 @@ def PublicSubnetsField(description="Subnet IDs", **kwargs):
 
 def HostedZoneField(description="Hosted Zone", **kwargs):
     return Field(description=description, **kwargs)
+
+
+def LiteralEnvField(*args, json_schema_extra=None, **kwargs):
+    """A field as_env() always gives the value of, rather than leaving to a
+    reference from as_secrets()"""
+    return Field(
+        *args,
+        json_schema_extra={**(json_schema_extra or {}), LITERAL_ENV: True},
+        **kwargs,
+    )
+
+
+def EagerField(*args, json_schema_extra=None, **kwargs):
+    """A field DeferredSettings resolve at synth, eg. because it decides
+    which constructs a stack adds"""
+    return Field(
+        *args, json_schema_extra={**(json_schema_extra or {}), EAGER: True}, **kwargs
+    )
@@ -1,11 +1,12 @@
 import json
-from typing import Tuple, Type, TypeVar, get_origin
+from typing import Tuple, Type, TypeVar
 
 from pydantic_settings import (
     BaseSettings,
     PydanticBaseSettingsSource,
 )
 
+from ...timing import span
 from ..base import AppSettings
 from .types import AwsResource, AwsResources, NestedResourceMixin
 from .utils import boto3_session
@@ -38,13 +39,14 @@ class ParameterStoreSettingsSource(PydanticBaseSettingsSource):
         prefix = self.settings_cls.format_namespace(app, environment)
         ssm = boto3_session().client("ssm")
         paginator = ssm.get_paginator("get_parameters_by_path")
-        pages = paginator.paginate(Path=prefix, Recursive=True)
         params = {}
-        for page in pages:
-            for param in page.get("Parameters", []):
-                field_name = param["Name"][len(prefix) :]
-                value = param["Value"]
-                params[field_name] = json.loads(value)
+        with span("fetch SSM parameters", prefix=prefix):
+            pages = paginator.paginate(Path=prefix, Recursive=True)
+            for page in pages:
+                for param in page.get("Parameters", []):
+                    field_name = param["Name"][len(prefix) :]
+                    value = param["Value"]
+                    params[field_name] = json.loads(value)
         self._params = params
         return self._params
 
@@ -60,9 +62,7 @@ class ParameterStoreSettingsSource(PydanticBaseSettingsSource):
     def __call__(self):
         params = self.fetch_params()
         settings = {}
-        for field_name, _ in self.settings_cls.get_model_fields(
-            include_computed=True
-        ).items():
+        for field_name in self.settings_cls.field_metadata(include_computed=True):
             if field_name in params:
                 settings[field_name] = params[field_name]
         return settings
@@ -95,38 +95,76 @@ class AwsAppSettings(NestedResourceMixin, AppSettings):
 
     def serialize_value(self, field_name):
         value = getattr(self, field_name)
-        if field_name in self.model_fields:
-            field = self.model_fields[field_name]
-            origin = get_origin(field.annotation) or field.annotation
-            if issubclass(origin, AwsResources):
-                if not isinstance(value, AwsResources):
-                    raise TypeError(
-                        f"{field} name should be an AwsResources collection "
-                        f"object, not {type(value).__name__}"
-                    )
-                value = value.ids
-            elif issubclass(origin, AwsResource):
-                if not isinstance(value, AwsResource):
-                    raise TypeError(
-                        f"{field} name should be an AwsResource object, "
-                        f"not {type(value).__name__}"
-                    )
-                value = str(value)
+        meta = self.field_metadata(include_hidden=True).get(field_name)
+        kind = meta.kind if meta else None
+        if kind == "resource_list":
+            if not isinstance(value, AwsResources):
+                raise TypeError(
+                    f"{meta.field} name should be an AwsResources collection "
+                    f"object, not {type(value).__name__}"
+                )
+            value = value.ids
+        elif kind == "resource":
+            if not isinstance(value, AwsResource):
+                raise TypeError(
+                    f"{meta.field} name should be an AwsResource object, "
+                    f"not {type(value).__name__}"
+                )
+            value = str(value)
         return json.dumps(value)
 
+    def referenced_fields(self, prefix="", strings=False):
+        """Fields as_secrets() gives references to
+
+        That's all but LiteralEnvFields and, unless strings, str and
+        resource fields. Parameters are stored JSON encoded and containers
+        get them as they are, so a string, or a resource's id, arrives in
+        quotes.
+        """
+        from .deferred import value_type
+
+        return [
+            name
+            for name, meta in self.field_metadata(include_computed=True).items()
+            if name.startswith(prefix)
+            and not meta.literal_env
+            and (strings or (meta.kind != "resource" and value_type(meta) is not str))
+        ]
+
+    def as_env(self, prefix="", exclude=(), secrets=False, strings=False):
+        """Environment variables with the values of fields, for a container
+
+        With secrets, the fields as_secrets() gives references to are left
+        out, given the same strings.
+        """
+        if secrets:
+            exclude = {*exclude, *self.referenced_fields(prefix, strings)}
+        return super().as_env(prefix, exclude)
+
+    def as_secrets(self, prefix="", strings=False):
+        """References to the parameters backing fields, for the secrets of an
+        ECS container definition
+
+        ECS reads the parameters as tasks start, so changing a value doesn't
+        change the synthesized output. They are referenced by name, which
+        ECS accepts for parameters in the task's region. Values are still
+        fetched at synth unless the settings are DeferredSettings' tokens.
+        Values arrive JSON encoded, which is why str and resource fields are
+        only referenced with strings, for containers that decode them. Pair
+        with as_env(secrets=True).
+        """
+        return [
+            {"name": name.upper(), "valueFrom": f"{self.namespace}{name}"}
+            for name in self.referenced_fields(prefix, strings)
+        ]
+
     def save(self, dry_run=False):
         ssm = boto3_session().client("ssm")
         saved = []
-        for key, field in self.get_model_fields(include_computed=True).items():
+        for key, meta in self.field_metadata(include_computed=True).items():
             full_key = f"{self.namespace}{key}"
             value = self.serialize_value(key)
-            description = field.description
-            if not description:
-                description = (
-                    field.json_schema_extra.get("description", "")
-                    if field.json_schema_extra
-                    else ""
-                )
+            description = meta.description
             if not dry_run:
                 ssm.put_parameter(
                     Type="String",
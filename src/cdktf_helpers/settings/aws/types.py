@@ -17,7 +17,8 @@ from pydantic import (
 from pydantic_core import core_schema
 
 from cdktf_helpers.settings import computed_field
-from cdktf_helpers.utils import extract_default
+from cdktf_helpers.settings.metadata import model_field_metadata
+from cdktf_helpers.timing import span
 
 from .utils import boto3_session
 
@@ -27,6 +28,26 @@ HostedZoneId = Annotated[str, StringConstraints(pattern=r"^[A-Z0-9]+$")]
 
 
 class NestedResourceMixin:
+    @classmethod
+    def field_kind(cls, annotation):
+        """Kind of a field for settings.metadata, and its AwsResource class"""
+        origin = get_origin(annotation) or annotation
+        if not isinstance(origin, type):
+            return "plain", None
+        if issubclass(origin, AwsResource):
+            return "resource", origin
+        if issubclass(origin, AwsResources):
+            resource_class = next(
+                (
+                    arg
+                    for arg in get_args(annotation)
+                    if isinstance(arg, type) and issubclass(arg, AwsResource)
+                ),
+                None,
+            )
+            return "resource_list", resource_class
+        return "plain", None
+
     @model_validator(mode="wrap")
     @classmethod
     def nested_resource(
@@ -34,26 +55,21 @@ class NestedResourceMixin:
     ) -> Self:
         return_data = deepcopy(data)
         if isinstance(data, dict):
-            for field_name, field in cls.model_fields.items():
-                origin = get_origin(field.annotation) or field.annotation
-                is_class = isinstance(origin, type)
-                is_resource = is_class and issubclass(origin, AwsResource)
-                is_resource_list = is_class and issubclass(origin, AwsResources)
+            for field_name, meta in model_field_metadata(cls).items():
                 value = data.get(field_name, None)
                 if not value:
-                    value = extract_default(field)
+                    value = meta.default()
                 if value is not None:
-                    if is_resource and isinstance(value, str):
-                        value = origin(id=value)
-                    elif is_resource_list and isinstance(value, list):
-                        type_args = get_args(field.annotation)
-                        resource_cls = next(
-                            arg for arg in type_args if issubclass(arg, AwsResource)
+                    if meta.kind == "resource" and isinstance(value, str):
+                        value = meta.resource_class(id=value)
+                    elif (
+                        meta.kind == "resource_list"
+                        and meta.resource_class
+                        and isinstance(value, list)
+                    ):
+                        value = AwsResources(
+                            [meta.resource_class(id=id) for id in value]
                         )
-                        if resource_cls:
-                            value = AwsResources([resource_cls(id=id) for id in value])
-                    else:
-                        pass
                 return_data[field_name] = value
         return handler(return_data)
 
@@ -117,7 +133,8 @@ class Vpc(AwsResource):
     @cached_property
     def resource(self):
         resource = boto3_session().resource("ec2").Vpc(self.id)
-        resource.load()
+        with span("look up Vpc", id=self.id):
+            resource.load()
         return resource
 
 
@@ -127,7 +144,8 @@ class Subnet(AwsResource):
     @cached_property
     def resource(self):
         resource = boto3_session().resource("ec2").Subnet(self.id)
-        resource.load()
+        with span("look up Subnet", id=self.id):
+            resource.load()
         return resource
 
     @computed_field("Subnet CIDR block")
@@ -146,7 +164,8 @@ class HostedZone(AwsResource):
     @cached_property
     def resource(self):
         route53 = boto3_session().client("route53")
-        response = route53.get_hosted_zone(Id=self.id)
+        with span("look up HostedZone", id=self.id):
+            response = route53.get_hosted_zone(Id=self.id)
         return response["HostedZone"]
 
     @computed_field
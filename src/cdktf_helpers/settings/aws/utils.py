@@ -1,12 +1,41 @@
 import json
-from functools import cache
+import threading
 
 import boto3
 
+sessions = threading.local()
+
+# Called for each session when set, eg. to stand in an in-memory fake for AWS
+session_provider = None
+
+
+def set_session_provider(provider):
+    """Have boto3_session() return provider(), or boto3 sessions when None
+
+    Returns the provider that was set before, to restore afterwards.
+    """
+    global session_provider
+    previous, session_provider = session_provider, provider
+    return previous
+
 
-@cache
 def boto3_session():
-    return boto3.Session()
+    if session_provider is not None:
+        return session_provider()
+    # Sessions aren't thread safe, so settings resolved concurrently each
+    # get one per thread
+    session = getattr(sessions, "session", None)
+    if session is None:
+        session = sessions.session = boto3.Session()
+    return session
+
+
+def clear_aws_caches():
+    """Forget AWS lookups made once per process, the default VPC and subnets"""
+    from .defaults import default_subnets, default_vpc
+
+    default_vpc.cache_clear()
+    default_subnets.cache_clear()
 
 
 def ensure_backend_resources(s3_bucket_name, dynamodb_table_name):
@@ -9,7 +9,7 @@ from pydantic_settings import (
     SettingsConfigDict,
 )
 
-from cdktf_helpers.utils import extract_default
+from .metadata import model_field_infos, model_field_metadata
 
 
 def computed_field(arg, description="x", json_schema_extra={}, **kwargs):
@@ -57,23 +57,23 @@ class AppSettings(BaseSettings):
             {"app": app, "environment": environment}
         )
         settings = {}
-        for field_name, field in cls.get_model_fields(
+        for field_name, meta in cls.field_metadata(
             include_hidden=True, include_computed=True
         ).items():
             value = source_data.get(field_name, None)
             if value is None:
-                value = extract_default(field)
+                value = meta.default()
             settings[field_name] = value
         return settings
 
+    @classmethod
+    def field_metadata(cls, include_hidden=False, include_computed=False):
+        """Field names mapped to their metadata.FieldMeta, cached per class"""
+        return model_field_metadata(cls, include_hidden, include_computed)
+
     @classmethod
     def get_model_fields(cls, include_hidden=False, include_computed=False):
-        hidden_fields = [] if include_hidden else cls.get_hidden_fields()
-        model_fields = {
-            **cls.model_fields,
-            **(cls.model_computed_fields if include_computed else {}),
-        }
-        return {k: v for k, v in model_fields.items() if k not in hidden_fields}
+        return dict(model_field_infos(cls, include_hidden, include_computed))
 
     @classmethod
     def format_namespace(cls, app: str, environment: str) -> str:
@@ -83,25 +83,25 @@ class AppSettings(BaseSettings):
         return getattr(self, field_name)
 
     def get_description(self, key):
-        return self.model_fields[key].description or ""
+        return self.field_metadata(include_hidden=True)[key].description
 
     def save(self, dry_run=False):
         pass
 
-    def as_dict(self, prefix=""):
+    def as_dict(self, prefix="", exclude=()):
         return {
             k: getattr(self, k)
-            for k in self.get_model_fields(include_computed=True)
-            if k.startswith(prefix)
+            for k in self.field_metadata(include_computed=True)
+            if k.startswith(prefix) and k not in exclude
         }
 
-    def as_env(self, prefix=""):
+    def as_env(self, prefix="", exclude=()):
         def value(v):
             return str(v).lower() if isinstance(v, bool) else v
 
         return [
             {"name": k.upper(), "value": value(v)}
-            for k, v in self.as_dict(prefix).items()
+            for k, v in self.as_dict(prefix, exclude).items()
         ]
 
 
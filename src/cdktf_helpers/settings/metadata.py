@@ -0,0 +1,130 @@
+from collections import UserList
+from types import MappingProxyType
+from typing import get_origin
+from weakref import WeakKeyDictionary
+
+from pydantic.fields import ComputedFieldInfo
+from pydantic_core import PydanticUndefined
+
+from cdktf_helpers.utils import extract_default
+
+# Field metadata of each model class, see model_field_metadata()
+cache = WeakKeyDictionary()
+
+# json_schema_extra keys marking fields as_env() always gives the value of,
+# and fields DeferredSettings always resolve at synth
+LITERAL_ENV = "literal_env"
+EAGER = "eager"
+
+
+class FieldMeta:
+    """What settings code needs to know about a field, worked out once
+
+    kind is "computed", "plain", or whatever the model's field_kind() says,
+    which for AWS settings may be "resource" or "resource_list".
+    resource_class is the AwsResource class of those fields.
+    default_strategy is "value", "factory" or None when the field is
+    required or computed.
+    """
+
+    def __init__(self, name, field, hidden=False, field_kind=None):
+        self.name = name
+        self.field = field
+        self.hidden = hidden
+        self.computed = isinstance(field, ComputedFieldInfo)
+        annotation = field.return_type if self.computed else field.annotation
+        origin = get_origin(annotation) or annotation
+        self.origin = origin if isinstance(origin, type) else None
+        self.resource_class = None
+        if self.computed:
+            self.kind = "computed"
+        elif field_kind:
+            self.kind, self.resource_class = field_kind(annotation)
+        else:
+            self.kind = "plain"
+        self.is_list = bool(self.origin and issubclass(self.origin, (list, UserList)))
+        self.excluded = bool(getattr(field, "exclude", False))
+        self.required = not self.computed and field.is_required()
+        if self.computed or self.required:
+            self.default_strategy = None
+        elif field.default is not PydanticUndefined:
+            self.default_strategy = "value"
+        else:
+            self.default_strategy = "factory"
+        extra = field.json_schema_extra
+        extra = extra if isinstance(extra, dict) else {}
+        self.description = field.description or extra.get("description", "")
+        self.literal_env = bool(extra.get(LITERAL_ENV))
+        self.eager = bool(extra.get(EAGER))
+
+    def __repr__(self):
+        return f"FieldMeta({self.name!r}, kind={self.kind!r})"
+
+    def default(self):
+        """The field's default, calling its default factory for a new one"""
+        if self.default_strategy is None:
+            return None
+        return extract_default(self.field)
+
+
+class ModelFieldMetadata:
+    def __init__(self, model_cls):
+        get_hidden_fields = getattr(model_cls, "get_hidden_fields", None)
+        hidden_fields = set(get_hidden_fields() if get_hidden_fields else ())
+        field_kind = getattr(model_cls, "field_kind", None)
+        self.model_fields = model_cls.model_fields
+        self.computed_fields = model_cls.model_computed_fields
+        fields = {
+            name: FieldMeta(name, field, name in hidden_fields, field_kind)
+            for name, field in {**self.model_fields, **self.computed_fields}.items()
+        }
+        # The four selections get_model_fields() and friends ask for
+        self.selections = {
+            (include_hidden, include_computed): MappingProxyType(
+                {
+                    name: meta
+                    for name, meta in fields.items()
+                    if (include_hidden or not meta.hidden)
+                    and (include_computed or not meta.computed)
+                }
+            )
+            for include_hidden in (False, True)
+            for include_computed in (False, True)
+        }
+        self.field_infos = {
+            key: MappingProxyType(
+                {name: meta.field for name, meta in selection.items()}
+            )
+            for key, selection in self.selections.items()
+        }
+
+    def is_current(self, model_cls):
+        # model_rebuild() and defining fields later replace these
+        return (
+            self.model_fields is model_cls.model_fields
+            and self.computed_fields is model_cls.model_computed_fields
+        )
+
+
+def get_metadata(model_cls):
+    metadata = cache.get(model_cls)
+    if metadata is None or not metadata.is_current(model_cls):
+        metadata = cache[model_cls] = ModelFieldMetadata(model_cls)
+    return metadata
+
+
+def model_field_metadata(model_cls, include_hidden=True, include_computed=False):
+    """Read only mapping of field names to FieldMeta for a pydantic model
+
+    Worked out once per class, and again only if its fields are rebuilt.
+    Subclasses each get their own, as their fields and hidden fields (from
+    get_hidden_fields(), if the model has it) may differ. Models with a
+    field_kind(annotation) classmethod returning (kind, resource class)
+    decide the kind of their non-computed fields.
+    """
+    return get_metadata(model_cls).selections[(include_hidden, include_computed)]
+
+
+def model_field_infos(model_cls, include_hidden=True, include_computed=False):
+    """As model_field_metadata(), but mapping to pydantic's FieldInfo"""
+    return get_metadata(model_cls).field_infos[(include_hidden, include_computed)]
@@ -0,0 +1,162 @@
+"""Snapshots of synthesized stacks, compared block by block
+
+Synth output is parsed once and indexed by block, eg.
+resource.aws_instance.compute, so comparing it against a stored snapshot
+only walks blocks that are in both, and reports the paths that changed.
+"""
+
+import json
+import os
+from pathlib import Path
+
+# Top level blocks keyed by type and then name. The rest are keyed by name,
+# other than terraform and locals which are single blocks.
+TYPED_BLOCKS = {"resource", "data"}
+SINGLE_BLOCKS = {"terraform", "locals"}
+
+# Keys cdktf adds for its own metadata
+METADATA_KEY = "//"
+
+
+def normalize(value, cwd=None):
+    """Synth output without cdktf's metadata or paths to the working directory
+
+    The fixtures' local backend keeps state in the working directory, which
+    differs between machines.
+    """
+    cwd = cwd or os.getcwd()
+    if isinstance(value, dict):
+        return {
+            k: normalize(v, cwd) for k, v in sorted(value.items()) if k != METADATA_KEY
+        }
+    if isinstance(value, list):
+        return [normalize(v, cwd) for v in value]
+    if isinstance(value, str):
+        return value.replace(f"{cwd}{os.sep}", "")
+    return value
+
+
+class SynthIndex:
+    """Synth output indexed by block, parsed and normalized once"""
+
+    def __init__(self, synthesized):
+        if isinstance(synthesized, str):
+            synthesized = json.loads(synthesized)
+        self.config = normalize(synthesized)
+        self.blocks = {}
+        for kind, blocks in self.config.items():
+            if kind in SINGLE_BLOCKS or not isinstance(blocks, dict):
+                self.blocks[kind] = blocks
+            elif kind in TYPED_BLOCKS:
+                for type_name, named in blocks.items():
+                    for name, body in named.items():
+                        self.blocks[f"{kind}.{type_name}.{name}"] = body
+            else:
+                for name, body in blocks.items():
+                    self.blocks[f"{kind}.{name}"] = body
+
+    def resources(self, type_name):
+        """Resources of a type by name"""
+        return self.config.get("resource", {}).get(type_name, {})
+
+    def has_resource_with_properties(self, type_name, properties):
+        """Like Testing.to_have_resource_with_properties, without re-parsing"""
+        return any(
+            is_subset(properties, body) for body in self.resources(type_name).values()
+        )
+
+    def dumps(self):
+        return json.dumps(self.config, indent=2, sort_keys=True) + "\n"
+
+
+def is_subset(expected, actual):
+    if isinstance(expected, dict):
+        return isinstance(actual, dict) and all(
+            k in actual and is_subset(v, actual[k]) for k, v in expected.items()
+        )
+    if isinstance(expected, list):
+        return (
+            isinstance(actual, list)
+            and len(expected) == len(actual)
+            and all(is_subset(e, a) for e, a in zip(expected, actual))
+        )
+    return expected == actual
+
+
+def diff_values(path, expected, actual):
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        for key in sorted(expected.keys() | actual.keys()):
+            yield from diff_values(
+                f"{path}.{key}", expected.get(key, MISSING), actual.get(key, MISSING)
+            )
+    elif (
+        isinstance(expected, list)
+        and isinstance(actual, list)
+        and len(expected) == len(actual)
+    ):
+        for i, (e, a) in enumerate(zip(expected, actual)):
+            yield from diff_values(f"{path}[{i}]", e, a)
+    elif expected != actual:
+        yield (path, expected, actual)
+
+
+class Missing:
+    def __repr__(self):
+        return "<missing>"
+
+
+MISSING = Missing()
+
+
+def diff(expected, actual):
+    """Paths that differ between two SynthIndexes, as (path, expected, actual)
+
+    A block only in one of them is reported once, at the block's path.
+    """
+    changes = []
+    for key in sorted(expected.blocks.keys() | actual.blocks.keys()):
+        changes.extend(
+            diff_values(
+                key,
+                expected.blocks.get(key, MISSING),
+                actual.blocks.get(key, MISSING),
+            )
+        )
+    return changes
+
+
+def format_diff(changes):
+    lines = []
+    for path, expected, actual in changes:
+        if expected is MISSING:
+            lines.append(f"+ {path}: {json.dumps(actual)}")
+        elif actual is MISSING:
+            lines.append(f"- {path}: {json.dumps(expected)}")
+        else:
+            lines.append(f"~ {path}: {json.dumps(expected)} -> {json.dumps(actual)}")
+    return "\n".join(lines)
+
+
+def snapshot_path(directory, name):
+    safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in name)
+    return Path(directory) / f"{safe}.json"
+
+
+def compare_snapshot(synthesized, path, update=False):
+    """Compare synth output against the snapshot at path
+
+    Returns the SynthIndex of the output and the changes, which are empty
+    when they match. With update the snapshot is (re)written instead, and
+    there are never changes. A missing snapshot is reported as None.
+    """
+    index = SynthIndex(synthesized)
+    path = Path(path)
+    if update:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if not path.exists() or path.read_text() != index.dumps():
+            path.write_text(index.dumps())
+        return index, []
+    if not path.exists():
+        return index, None
+    expected = SynthIndex(json.loads(path.read_text()))
+    return index, diff(expected, index)
@@ -1,15 +1,16 @@
-import re
 from typing import Generic, get_args, get_origin
 
-import boto3
-from cdktf import TerraformStack
+from cdktf import DataTerraformRemoteStateS3, TerraformStack
 from cdktf_cdktf_provider_aws.provider import AwsProvider
 from constructs import Construct
 
 from .backends import AutoS3Backend
-from .settings.aws import AwsAppSettings, AwsAppSettingsType
+from .profiling import profile_build
+from .settings.aws import AwsAppSettings, AwsAppSettingsType, DeferredSettings
+from .settings.aws.utils import boto3_session
 from .settings.base import AppSettingsType
-from .utils import unique_name
+from .timing import span
+from .utils import format_dynamodb_table_name, format_s3_bucket_name
 
 
 class AwsStack(TerraformStack, Generic[AppSettingsType]):
@@ -22,6 +23,13 @@ class AwsStack(TerraformStack, Generic[AppSettingsType]):
 
 
 class AwsS3StateStack(AwsStack[AwsAppSettings], Generic[AwsAppSettingsType]):
+    # Read other stacks' outputs from S3 at synth time rather than through
+    # terraform_remote_state data sources
+    inline_remote_outputs = False
+    # Pass cdktf-python synth's stacks DeferredSettings, so terraform reads
+    # settings from parameter store at plan time rather than synth
+    deferred_settings = False
+
     def __init__(
         self,
         scope: Construct,
@@ -32,18 +40,29 @@ class AwsS3StateStack(AwsStack[AwsAppSettings], Generic[AwsAppSettingsType]):
         create_state_resources=False,
     ):
         super().__init__(scope, id, settings)
+        if isinstance(settings, DeferredSettings):
+            with span("defer settings"):
+                self.settings = settings.build(self)
         self._s3_bucket_name = s3_bucket_name
         self._dynamodb_table_name = dynamodb_table_name
         self._create_state_resources = create_state_resources
+        self._remote_states = {}
+        # Ids of producing stacks not yet added to the app when their outputs
+        # were asked for, see remote_outputs()
+        self._pending_producers = set()
 
         # Initialise the provider and the backend, which may create
         # resources to store TF state
-        self.boto3_session = boto3.Session()
-        self.register_provider()
-        self.register_backend()
+        self.boto3_session = boto3_session()
+        with span("provider"):
+            self.register_provider()
+        with span("backend"):
+            self.register_backend()
 
         # Call build, which is stacks should add their resources
-        self.build()
+        with span("build"), profile_build(self):
+            self.build()
+        self.add_pending_dependencies()
 
     @classmethod
     def get_settings_model(cls):
@@ -54,15 +73,19 @@ class AwsS3StateStack(AwsStack[AwsAppSettings], Generic[AwsAppSettingsType]):
 
     @classmethod
     def format_s3_bucket_name(cls, app):
-        name = unique_name(app)
-        return "{}-tfstate".format(re.sub(r"[\s_-]+", "-", name))
+        return format_s3_bucket_name(app)
 
     @classmethod
     def format_dynamodb_table_name(cls, app):
-        name = unique_name(app)
-        return "{}Tfstate".format(
-            re.sub(r"[\s_-]+", " ", name).title().replace(" ", "")
-        )
+        return format_dynamodb_table_name(app)
+
+    @classmethod
+    def format_s3_key(cls, environment):
+        return environment
+
+    @classmethod
+    def format_state_key(cls, environment):
+        return f"{cls.format_s3_key(environment)}.tfstate"
 
     @property
     def s3_bucket_name(self):
@@ -84,7 +107,7 @@ class AwsS3StateStack(AwsStack[AwsAppSettings], Generic[AwsAppSettingsType]):
 
     @property
     def s3_key(self):
-        return self.settings.environment
+        return self.format_s3_key(self.settings.environment)
 
     def build(self):
         pass
@@ -102,3 +125,61 @@ class AwsS3StateStack(AwsStack[AwsAppSettings], Generic[AwsAppSettingsType]):
             region=self.boto3_session.region_name,
             create_state_resources=self._create_state_resources,
         )
+
+    def remote_outputs(self, stack_class, inline=None):
+        """Outputs of another stack in the same app and environment
+
+        By default this is a terraform_remote_state data source, created once
+        per producing stack, whose get() returns tokens resolved at plan time.
+        In inline mode the producer's state is read from S3 during synth,
+        once per run for all consumers, and a dict of plain values is
+        returned instead. Inlined values end up in the synthesized JSON,
+        including any marked sensitive.
+
+        The producer has to keep its state apart from this stack's, which
+        with the default format_s3_key it doesn't.
+        """
+        from .state import cached_state_outputs
+
+        inline = self.inline_remote_outputs if inline is None else inline
+        bucket_name = stack_class.format_s3_bucket_name(self.settings.app)
+        key = stack_class.format_state_key(self.settings.environment)
+        if (bucket_name, key) == (self.s3_bucket_name, f"{self.s3_key}.tfstate"):
+            raise ValueError(
+                f"{stack_class.__name__} and {type(self).__name__} share the "
+                f"state s3://{bucket_name}/{key}, override format_s3_key to give "
+                "each stack its own"
+            )
+        if inline:
+            outputs = cached_state_outputs(bucket_name, key)
+            if outputs is None:
+                raise ValueError(
+                    f"No state for {stack_class.__name__} found at "
+                    f"s3://{bucket_name}/{key}"
+                )
+            return {name: output["value"] for name, output in outputs.items()}
+        if stack_class not in self._remote_states:
+            # Record the dependency when the producer is in the same app, so
+            # it's deployed first. One added to the app later records it then.
+            producer = self.node.scope.node.try_find_child(stack_class.__name__)
+            if producer is not None:
+                self.add_dependency(producer)
+            else:
+                self._pending_producers.add(stack_class.__name__)
+            self._remote_states[stack_class] = DataTerraformRemoteStateS3(
+                self,
+                f"remote_state_{stack_class.__name__}",
+                bucket=bucket_name,
+                key=key,
+                region=self.boto3_session.region_name,
+            )
+        return self._remote_states[stack_class]
+
+    def add_pending_dependencies(self):
+        """Make stacks already in the app that read this one's outputs
+        depend on it"""
+        for sibling in self.node.scope.node.children:
+            pending = getattr(sibling, "_pending_producers", ())
+            if sibling is not self and self.node.id in pending:
+                sibling.add_dependency(self)
+                pending.discard(self.node.id)
@@ -0,0 +1,399 @@
+import json
+import os
+import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from functools import cache
+
+from botocore.exceptions import ClientError
+
+from .jsonstream import JsonStream
+from .settings.aws.utils import boto3_session
+from .utils import cache_dir
+
+# Terraform stores an MD5 of each state file in the lock table next to
+# the locks themselves, keyed by the state path with this suffix
+DIGEST_SUFFIX = "-md5"
+
+
+def parse_timestamp(value):
+    # Terraform writes nanosecond precision timestamps, which are more
+    # digits than datetime.fromisoformat() will accept
+    match = re.match(
+        r"^(?P<base>[\d-]+T[\d:]+)(?:\.(?P<fraction>\d+))?(?P<tz>Z|[+-][\d:]+)?$",
+        value or "",
+    )
+    if not match:
+        return None
+    fraction = (match.group("fraction") or "0")[:6].ljust(6, "0")
+    tz = match.group("tz") or "Z"
+    tz = "+00:00" if tz == "Z" else tz
+    return datetime.fromisoformat(f"{match.group('base')}.{fraction}{tz}")
+
+
+def scan_table(table_name, segments=4):
+    """Parallel scan of every item in a DynamoDB table, keyed by LockID"""
+    client = boto3_session().client("dynamodb")
+
+    def scan_segment(segment):
+        paginator = client.get_paginator("scan")
+        pages = paginator.paginate(
+            TableName=table_name, Segment=segment, TotalSegments=segments
+        )
+        return [item for page in pages for item in page.get("Items", [])]
+
+    items = {}
+    with ThreadPoolExecutor(max_workers=segments) as executor:
+        for segment_items in executor.map(scan_segment, range(segments)):
+            for item in segment_items:
+                items[item["LockID"]["S"]] = item
+    return items
+
+
+def parse_lock(item, now=None):
+    """Decode a lock table item into a dict, or None if it isn't a lock"""
+    if "Info" not in item:
+        return None
+    now = now or datetime.now(timezone.utc)
+    raw_info = item["Info"]["S"]
+    try:
+        info = json.loads(raw_info)
+    except json.JSONDecodeError:
+        info = {}
+    created = parse_timestamp(info.get("Created"))
+    return {
+        "lock_id": item["LockID"]["S"],
+        "path": info.get("Path") or item["LockID"]["S"],
+        "id": info.get("ID", ""),
+        "who": info.get("Who", ""),
+        "operation": info.get("Operation", ""),
+        "version": info.get("Version", ""),
+        "created": created,
+        "age": (now - created).total_seconds() if created else None,
+        "info": raw_info,
+    }
+
+
+def fetch_locks(table_name, segments=4, now=None):
+    locks = []
+    for item in scan_table(table_name, segments=segments).values():
+        lock = parse_lock(item, now=now)
+        if lock:
+            locks.append(lock)
+    return sorted(locks, key=lambda lock: lock["path"])
+
+
+def break_lock(table_name, lock):
+    """Delete a lock, but only if it is still the same lock we inspected"""
+    client = boto3_session().client("dynamodb")
+    try:
+        client.delete_item(
+            TableName=table_name,
+            Key={"LockID": {"S": lock["lock_id"]}},
+            ConditionExpression="Info = :info",
+            ExpressionAttributeValues={":info": {"S": lock["info"]}},
+        )
+    except client.exceptions.ConditionalCheckFailedException:
+        return False
+    return True
+
+
+def lock_contention(samples):
+    """Summarise repeated lock scans into per state path contention metrics
+
+    Each sample is a list of locks as returned by fetch_locks(). A path that
+    is locked in many samples, or by many different lock IDs or users, is
+    being fought over.
+    """
+    metrics = {}
+    for locks in samples:
+        for lock in locks:
+            path_metrics = metrics.setdefault(
+                lock["path"],
+                {"locked_samples": 0, "lock_ids": set(), "who": set(), "max_age": 0},
+            )
+            path_metrics["locked_samples"] += 1
+            path_metrics["lock_ids"].add(lock["id"])
+            path_metrics["who"].add(lock["who"])
+            path_metrics["max_age"] = max(path_metrics["max_age"], lock["age"] or 0)
+    return {
+        path: {
+            "locked_ratio": m["locked_samples"] / len(samples),
+            "distinct_locks": len(m["lock_ids"]),
+            "distinct_holders": len(m["who"]),
+            "max_age": m["max_age"],
+        }
+        for path, m in sorted(metrics.items())
+    }
+
+
+def list_states(bucket_name, suffix=".tfstate"):
+    """List the state objects stored in a backend bucket"""
+    s3 = boto3_session().client("s3")
+    paginator = s3.get_paginator("list_objects_v2")
+    states = []
+    for page in paginator.paginate(Bucket=bucket_name):
+        for obj in page.get("Contents", []):
+            if obj["Key"].endswith(suffix):
+                states.append(obj)
+    return states
+
+
+def state_stats(fh):
+    """Count resources in a state file streamed from a binary file handle
+
+    The state is never loaded whole, resource instances are skipped over
+    and only counted, so memory use doesn't grow with the state size.
+    """
+    stream = JsonStream(fh)
+    stats = {
+        "resources": 0,
+        "instances": 0,
+        "types": Counter(),
+        "modules": Counter(),
+    }
+    for key in stream.iter_object():
+        if key != "resources":
+            stream.skip()
+            continue
+        for _ in stream.iter_array():
+            resource = {}
+            instances = 0
+            for field in stream.iter_object():
+                if field == "instances":
+                    for _ in stream.iter_array():
+                        stream.skip()
+                        instances += 1
+                elif field in ("module", "mode", "type"):
+                    resource[field] = stream.decode()
+                else:
+                    stream.skip()
+            resource_type = resource.get("type", "unknown")
+            if resource.get("mode") == "data":
+                resource_type = f"data.{resource_type}"
+            stats["resources"] += 1
+            stats["instances"] += instances
+            stats["types"][resource_type] += 1
+            stats["modules"][resource.get("module", "root")] += 1
+    return stats
+
+
+def fetch_state_stats(bucket_name, workers=4):
+    """Stream every state in a bucket through state_stats() concurrently"""
+    s3 = boto3_session().client("s3")
+
+    def stats(obj):
+        body = s3.get_object(Bucket=bucket_name, Key=obj["Key"])["Body"]
+        try:
+            return {"key": obj["Key"], "size": obj["Size"], **state_stats(body)}
+        finally:
+            body.close()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(stats, list_states(bucket_name)))
+
+
+def read_outputs(fh):
+    """Read the outputs from a streamed state file
+
+    Terraform writes outputs ahead of resources, so reading stops as soon as
+    they have been seen and the rest of the state is never downloaded.
+    """
+    stream = JsonStream(fh)
+    for key in stream.iter_object():
+        if key == "outputs":
+            return stream.decode()
+        stream.skip()
+    return {}
+
+
+def outputs_cache_file(bucket_name, key):
+    return cache_dir("outputs", bucket_name) / f"{key.replace('/', '%2F')}.json"
+
+
+def write_private(path, data):
+    # Outputs may be sensitive, so keep cached copies readable only by us
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as fh:
+        json.dump(data, fh)
+
+
+def fetch_state_outputs(bucket_name, key, cache=True):
+    """Fetch the outputs stored in a state object, or None if there is no state
+
+    A local copy is kept alongside the object's ETag, and reused for as long
+    as S3 says the object hasn't been modified.
+    """
+    s3 = boto3_session().client("s3")
+    cache_file = outputs_cache_file(bucket_name, key)
+    cached = None
+    if cache and cache_file.exists():
+        try:
+            cached = json.loads(cache_file.read_text())
+        except json.JSONDecodeError:
+            cached = None
+    kwargs = {"IfNoneMatch": cached["etag"]} if cached else {}
+    try:
+        response = s3.get_object(Bucket=bucket_name, Key=key, **kwargs)
+    except ClientError as e:
+        code = e.response["Error"]["Code"]
+        if code in ("304", "NotModified"):
+            return cached["outputs"]
+        if code in ("404", "NoSuchKey"):
+            # Don't serve a deleted state's outputs should an object with
+            # the same ETag turn up again
+            cache_file.unlink(missing_ok=True)
+            return None
+        raise
+    body = response["Body"]
+    try:
+        outputs = read_outputs(body)
+    finally:
+        body.close()
+    if cache:
+        write_private(cache_file, {"etag": response["ETag"], "outputs": outputs})
+    return outputs
+
+
+@cache
+def cached_state_outputs(bucket_name, key):
+    """Outputs of a state object, fetched at most once per process"""
+    return fetch_state_outputs(bucket_name, key)
+
+
+def state_reads():
+    """How many times state outputs have been asked for during synth
+
+    Synth output that depends on state can't be cached, as the state may
+    change without anything the cache key covers changing.
+    """
+    info = cached_state_outputs.cache_info()
+    return info.hits + info.misses
+
+
+def fetch_outputs(bucket_name, keys, cache=True, workers=4):
+    """Fetch outputs of several state objects concurrently, keyed by key"""
+    keys = list(dict.fromkeys(keys))
+
+    def fetch(key):
+        return fetch_state_outputs(bucket_name, key, cache=cache)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return dict(zip(keys, executor.map(fetch, keys)))
+
+
+def state_path(bucket_name, key):
+    return f"{bucket_name}/{key}"
+
+
+def get_digest(table_name, bucket_name, key):
+    client = boto3_session().client("dynamodb")
+    response = client.get_item(
+        TableName=table_name,
+        Key={"LockID": {"S": state_path(bucket_name, key) + DIGEST_SUFFIX}},
+    )
+    item = response.get("Item")
+    return item["Digest"]["S"] if item else None
+
+
+def is_locked(table_name, bucket_name, key):
+    client = boto3_session().client("dynamodb")
+    response = client.get_item(
+        TableName=table_name,
+        Key={"LockID": {"S": state_path(bucket_name, key)}},
+    )
+    return "Item" in response
+
+
+def plan_migration(source_bucket, dest_bucket, key_map=None):
+    """Work out which state objects move where
+
+    With no key_map every state in the source bucket keeps its key, otherwise
+    only the mapped keys are moved.
+    """
+    s3 = boto3_session().client("s3")
+    sources = {obj["Key"]: obj for obj in list_states(source_bucket)}
+    key_map = key_map or {key: key for key in sources}
+    plan = []
+    for source_key, dest_key in key_map.items():
+        if source_key not in sources:
+            raise ValueError(f"No state at s3://{source_bucket}/{source_key}")
+        if (source_bucket, source_key) == (dest_bucket, dest_key):
+            continue
+        try:
+            s3.head_object(Bucket=dest_bucket, Key=dest_key)
+            exists = True
+        except ClientError as e:
+            if e.response["Error"]["Code"] not in ("404", "NoSuchKey", "NoSuchBucket"):
+                raise
+            exists = False
+        plan.append(
+            {
+                "source_key": source_key,
+                "dest_key": dest_key,
+                "size": sources[source_key]["Size"],
+                "etag": sources[source_key]["ETag"],
+                "dest_exists": exists,
+            }
+        )
+    return plan
+
+
+def migrate_state(source_bucket, source_table, dest_bucket, dest_table, entry):
+    """Server side copy of one state object and its digest, then verify it"""
+    s3 = boto3_session().client("s3")
+    dynamodb = boto3_session().client("dynamodb")
+    source_key = entry["source_key"]
+    dest_key = entry["dest_key"]
+
+    if is_locked(source_table, source_bucket, source_key):
+        return {**entry, "status": "locked"}
+
+    try:
+        s3.copy_object(
+            Bucket=dest_bucket,
+            Key=dest_key,
+            CopySource={"Bucket": source_bucket, "Key": source_key},
+            CopySourceIfMatch=entry["etag"],
+        )
+    except ClientError as e:
+        code = e.response["Error"]["Code"]
+        # The source was written to since the migration was planned
+        if code in ("412", "PreconditionFailed"):
+            return {**entry, "status": "changed"}
+        return {**entry, "status": "error", "error": code}
+
+    digest = get_digest(source_table, source_bucket, source_key)
+    if digest:
+        dynamodb.put_item(
+            TableName=dest_table,
+            Item={
+                "LockID": {"S": state_path(dest_bucket, dest_key) + DIGEST_SUFFIX},
+                "Digest": {"S": digest},
+            },
+        )
+
+    # A single part copy always ends up with the content MD5 as its ETag,
+    # which is what Terraform records as the digest. Multipart sources have
+    # a different style of ETag so can only be compared via the digest.
+    copied = s3.head_object(Bucket=dest_bucket, Key=dest_key)
+    dest_md5 = copied["ETag"].strip('"')
+    source_etag = entry["etag"].strip('"')
+    expected = digest or (None if "-" in source_etag else source_etag)
+    verified = copied["ContentLength"] == entry["size"] and (
+        expected is None or dest_md5 == expected
+    )
+    return {**entry, "status": "copied" if verified else "mismatch"}
+
+
+def migrate_states(
+    source_bucket, source_table, dest_bucket, dest_table, plan, workers=4
+):
+    def migrate(entry):
+        return migrate_state(
+            source_bucket, source_table, dest_bucket, dest_table, entry
+        )
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(migrate, plan))
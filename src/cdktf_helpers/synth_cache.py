@@ -0,0 +1,137 @@
+import hashlib
+import json
+import shutil
+import sys
+import time
+import uuid
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+
+from .utils import cache_dir, is_relative_to
+
+# Installed packages whose version changes what gets synthesized. Anything
+# installed is covered by these rather than by hashing its source.
+LIBRARIES = ("cdktf", "cdktf-cdktf-provider-aws", "constructs", "jsii", "cdktf-helpers")
+
+
+def library_versions():
+    versions = {}
+    for name in LIBRARIES:
+        try:
+            versions[name] = version(name)
+        except PackageNotFoundError:
+            versions[name] = None
+    return versions
+
+
+def is_project_file(path):
+    path = Path(path).resolve()
+    if {"site-packages", "dist-packages"} & set(path.parts):
+        return False
+    prefixes = {Path(sys.prefix).resolve(), Path(sys.base_prefix).resolve()}
+    return not any(is_relative_to(path, prefix) for prefix in prefixes)
+
+
+def source_files(*classes):
+    """Source files the given classes and the current project are built from
+
+    That's the modules defining each class and its bases, plus every loaded
+    module from outside of the Python installation, which catches helpers
+    the stacks import from elsewhere in the project.
+    """
+    modules = [sys.modules.get(base.__module__) for c in classes for base in c.__mro__]
+    modules += list(sys.modules.values())
+    files = set()
+    for module in modules:
+        path = getattr(module, "__file__", None)
+        if path and path.endswith(".py") and is_project_file(path):
+            files.add(str(Path(path).resolve()))
+    return sorted(files)
+
+
+def synth_cache_key(app_name, environment, stacks, region=None):
+    """Hash everything that determines the synthesized output of an app
+
+    stacks is a list of (stack class, settings) pairs, in the order they are
+    added to the app.
+    """
+    digest = hashlib.sha256()
+
+    def add(value):
+        digest.update(json.dumps(value, sort_keys=True, default=str).encode())
+
+    add(
+        {
+            "app": app_name,
+            "environment": environment,
+            "region": region,
+            "python": sys.version,
+            "versions": library_versions(),
+        }
+    )
+    for stack_class, settings in stacks:
+        add([stack_class.__module__, stack_class.__qualname__, settings.as_dict()])
+    # DeferredSettings stand in for settings of their settings_model
+    classes = [
+        c
+        for stack_class, settings in stacks
+        for c in (stack_class, getattr(settings, "settings_model", type(settings)))
+    ]
+    for path in source_files(*classes):
+        digest.update(path.encode())
+        digest.update(Path(path).read_bytes())
+    return digest.hexdigest()
+
+
+def synth_outputs(names):
+    return ["manifest.json", *(Path("stacks") / name for name in names)]
+
+
+def restore_synth(key, outdir, names):
+    """Copy a previously cached synth into outdir, returning whether it was"""
+    entry = cache_dir("synth") / key
+    if not (entry / "manifest.json").exists():
+        return False
+    outdir = Path(outdir)
+    for path in synth_outputs(names):
+        source = entry / path
+        if source.is_dir():
+            shutil.copytree(source, outdir / path, dirs_exist_ok=True)
+        elif source.exists():
+            (outdir / path).parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(source, outdir / path)
+    # Recently used entries survive pruning by age
+    entry.touch()
+    return True
+
+
+def store_synth(key, outdir, names):
+    root = cache_dir("synth")
+    entry = root / key
+    # Write to a temporary location first so a half written entry is
+    # never picked up
+    staging = root / f".{key}.{uuid.uuid4().hex}"
+    staging.mkdir()
+    for path in synth_outputs(names):
+        source = Path(outdir) / path
+        if source.is_dir():
+            # Leave out providers and modules installed by terraform init
+            shutil.copytree(
+                source, staging / path, ignore=shutil.ignore_patterns(".terraform")
+            )
+        elif source.exists():
+            (staging / path).parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(source, staging / path)
+    shutil.rmtree(entry, ignore_errors=True)
+    staging.rename(entry)
+
+
+def prune_synth_cache(older_than=None):
+    """Remove cached synths not used for older_than seconds, or all of them"""
+    root = cache_dir("synth")
+    removed = 0
+    for entry in root.iterdir():
+        if older_than is None or time.time() - entry.stat().st_mtime > older_than:
+            shutil.rmtree(entry, ignore_errors=True)
+            removed += 1
+    return removed
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from .scheduler import run_prefixed
+
+# Arguments for each action run against a synthesized stack. Output is
+# captured rather than attached to a terminal, so nothing may prompt, and
+# terraform colours it regardless, which would hide the plan summary.
+ACTIONS = {
+    "plan": ["plan", "-input=false", "-no-color"],
+    "apply": ["apply", "-input=false", "-auto-approve", "-no-color"],
+    "destroy": ["destroy", "-input=false", "-auto-approve", "-no-color"],
+    "output": ["output", "-no-color"],
+}
+
+# Written inside .terraform once init succeeds, to tell when it's needed again
+INIT_MARKER = "cdktf-python-init"
+
+
+# terraform's plugin cache isn't safe for concurrent writes, so stacks run
+# concurrently still init one at a time
+init_lock = threading.Lock()
+
+
+def terraform_binary():
+    # The same variable the cdktf CLI reads
+    return os.environ.get("TERRAFORM_BINARY_NAME", "terraform")
+
+
+def terraform_env():
+    return {**os.environ, "TF_IN_AUTOMATION": "1"}
+
+
+def stack_dir(outdir, name):
+    return Path(outdir) / "stacks" / name
+
+
+@contextmanager
+def plugin_cache_lock():
+    """Hold init_lock, and a lock on the plugin cache shared with other
+    processes, eg. pytest-xdist workers"""
+    cache = os.environ.get("TF_PLUGIN_CACHE_DIR")
+    with init_lock:
+        if not cache or fcntl is None:
+            yield
+            return
+        Path(cache).mkdir(parents=True, exist_ok=True)
+        with open(Path(cache) / ".lock", "a") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def init_fingerprint(working_dir, backend=True):
+    """Hash of the parts of a stack's configuration terraform init acts on
+
+    That's the terraform block, with the backend and required providers,
+    and the modules the stack uses.
+    """
+    with open(Path(working_dir) / "cdk.tf.json") as fh:
+        config = json.load(fh)
+    relevant = {
+        "terraform": config.get("terraform", {}),
+        "module": {
+            name: module.get("source")
+            for name, module in config.get("module", {}).items()
+        },
+    }
+    if not backend:
+        relevant["backend"] = False
+    return hashlib.sha256(json.dumps(relevant, sort_keys=True).encode()).hexdigest()
+
+
+def needs_init(working_dir, backend=True):
+    marker = Path(working_dir) / ".terraform" / INIT_MARKER
+    return not marker.exists() or marker.read_text() != init_fingerprint(
+        working_dir, backend
+    )
+
+
+def ensure_init(working_dir, prefix, echo=print, backend=True):
+    """Run terraform init unless the stack's .terraform is already up to date
+
+    Without backend, the backend is left uninitialised, which is all
+    validating needs.
+    """
+    if not needs_init(working_dir, backend):
+        return 0
+    working_dir = Path(working_dir)
+    args = [terraform_binary(), "init", "-input=false"]
+    if not backend:
+        args.append("-backend=false")
+    # State is remote, so a changed backend only needs pointing at, never
+    # migrating
+    elif (working_dir / ".terraform").exists():
+        args.append("-reconfigure")
+    with plugin_cache_lock():
+        code = run_prefixed(
+            args, prefix, echo=echo, cwd=working_dir, env=terraform_env()
+        )
+    if code == 0:
+        (working_dir / ".terraform").mkdir(exist_ok=True)
+        (working_dir / ".terraform" / INIT_MARKER).write_text(
+            init_fingerprint(working_dir, backend)
+        )
+    return code
+
+
+def run_terraform(action, working_dir, prefix, echo=print):
+    """Init if needed, then run an action in a stack's output directory"""
+    code = ensure_init(working_dir, prefix, echo=echo)
+    if code:
+        return code
+    args = [terraform_binary(), *ACTIONS[action]]
+    return run_prefixed(args, prefix, echo=echo, cwd=working_dir, env=terraform_env())
+
+
+def full_synth_stacks(outdir):
+    """Output directories of each stack in a full synth's output"""
+    return sorted(path.parent for path in Path(outdir).glob("stacks/*/cdk.tf.json"))
+
+
+def validate_stack(working_dir, prefix, echo=print):
+    code = ensure_init(working_dir, prefix, echo=echo, backend=False)
+    if code:
+        return code
+    args = [terraform_binary(), "validate", "-no-color"]
+    return run_prefixed(args, prefix, echo=echo, cwd=working_dir, env=terraform_env())
+
+
+def validate_stacks(working_dirs, echo=print, parallelism=4):
+    """Init and validate several stacks in one pass
+
+    Inits run one at a time, so with a plugin cache only the first
+    downloads providers, while validation runs concurrently. Returns exit
+    codes by working directory.
+    """
+    working_dirs = [Path(d) for d in working_dirs]
+    with ThreadPoolExecutor(max_workers=parallelism) as pool:
+        futures = {
+            d: pool.submit(validate_stack, d, d.name, echo) for d in working_dirs
+        }
+    return {d: future.result() for d, future in futures.items()}
@@ -0,0 +1,148 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Spans finished during the current recording, or None when not recording.
+# Appending to a list is thread safe, so spans can be recorded from worker
+# threads without a lock.
+recorded = None
+
+
+def is_recording():
+    return recorded is not None
+
+
+@contextmanager
+def span(name, **args):
+    """Time the enclosed block as a named phase, when recording"""
+    spans = recorded
+    if spans is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans.append(
+            {
+                "name": name,
+                "start": start,
+                "end": time.perf_counter(),
+                "thread": threading.get_ident(),
+                "thread_name": threading.current_thread().name,
+                "args": args,
+            }
+        )
+
+
+@contextmanager
+def recording():
+    """Record spans for the duration of the block, yielding the list of them"""
+    global recorded
+    previous = recorded
+    recorded = spans = []
+    try:
+        yield spans
+    finally:
+        recorded = previous
+
+
+def nest(spans):
+    """Pair each span with the names of the spans enclosing it, outermost first
+
+    A span's parent is the innermost span enclosing it on the same thread.
+    Spans on a pool's worker threads, with no parent of their own, go under
+    the innermost main thread span enclosing them, the phase that started
+    the work.
+    """
+    main_thread = threading.main_thread().ident
+    spans = sorted(spans, key=lambda s: (s["start"], -s["end"]))
+    paths = {}
+    nested = []
+    for i, s in enumerate(spans):
+        enclosing = [
+            other
+            for other in reversed(spans[:i])
+            if other["end"] >= s["end"]
+            and other["thread"] in (s["thread"], main_thread)
+        ]
+        same_thread = [o for o in enclosing if o["thread"] == s["thread"]]
+        parent = (same_thread or enclosing or [None])[0]
+        path = (*paths[id(parent)], s["name"]) if parent else (s["name"],)
+        paths[id(s)] = path
+        nested.append((s, path))
+    return nested
+
+
+def summarise(spans):
+    """Total time and call count of each phase, in the order phases started
+
+    Spans with the same name under the same parents are combined.
+    """
+    phases = {}
+    for s, path in nest(spans):
+        phase = phases.setdefault(path, {"path": path, "calls": 0, "seconds": 0.0})
+        phase["calls"] += 1
+        phase["seconds"] += s["end"] - s["start"]
+    return list(phases.values())
+
+
+def format_timings(spans):
+    from tabulate import tabulate
+
+    phases = summarise(spans)
+    total = sum(p["seconds"] for p in phases if len(p["path"]) == 1) or 1
+    table_data = [
+        [
+            # tabulate strips leading spaces, so mark nesting visibly
+            "· " * (len(p["path"]) - 1) + p["path"][-1],
+            p["calls"],
+            f"{p['seconds']:.3f}",
+            f"{p['seconds'] / total:.0%}",
+        ]
+        for p in phases
+    ]
+    return tabulate(table_data, headers=["Phase", "Calls", "Seconds", "Share"])
+
+
+def trace_events(spans):
+    """Spans as Chrome trace events, viewable in Perfetto or chrome://tracing"""
+    if not spans:
+        return []
+    origin = min(s["start"] for s in spans)
+    pid = os.getpid()
+    threads = {}
+    events = []
+    for s in sorted(spans, key=lambda s: s["start"]):
+        tid = threads.setdefault(s["thread"], len(threads) + 1)
+        events.append(
+            {
+                "name": s["name"],
+                "cat": "cdktf-python",
+                "ph": "X",
+                "ts": round((s["start"] - origin) * 1e6),
+                "dur": round((s["end"] - s["start"]) * 1e6),
+                "pid": pid,
+                "tid": tid,
+                "args": {k: str(v) for k, v in s["args"].items()},
+            }
+        )
+    names = {s["thread"]: s["thread_name"] for s in spans}
+    for thread, tid in threads.items():
+        events.append(
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": pid,
+                "tid": tid,
+                "args": {"name": names[thread]},
+            }
+        )
+    return events
+
+
+def write_trace(spans, path):
+    with open(path, "w") as fh:
+        json.dump({"traceEvents": trace_events(spans), "displayTimeUnit": "ms"}, fh)
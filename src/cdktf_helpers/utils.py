@@ -1,5 +1,8 @@
 import base64
 import hashlib
+import os
+import re
+from pathlib import Path
 
 from pydantic_core import PydanticUndefined
 
@@ -9,6 +12,16 @@ def unique_name(input_string: str) -> str:
     return f"{input_string}-" + base64.urlsafe_b64encode(digest).decode()[:8].lower()
 
 
+def format_s3_bucket_name(app):
+    name = unique_name(app)
+    return "{}-tfstate".format(re.sub(r"[\s_-]+", "-", name))
+
+
+def format_dynamodb_table_name(app):
+    name = unique_name(app)
+    return "{}Tfstate".format(re.sub(r"[\s_-]+", " ", name).title().replace(" ", ""))
+
+
 def extract_default(field):
     default = getattr(field, "default", PydanticUndefined)
     if default is not PydanticUndefined:
@@ -16,3 +29,22 @@ def extract_default(field):
     default_factory = getattr(field, "default_factory", None)
     if default_factory:
         return default_factory()
+
+
+def cache_dir(*parts):
+    root = os.environ.get("CDKTF_PYTHON_CACHE_DIR")
+    if not root:
+        xdg_cache = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+        root = Path(xdg_cache) / "cdktf-python"
+    path = Path(root, *parts)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def is_relative_to(path, other):
+    # Path.is_relative_to() is only in Python 3.9 and later
+    try:
+        Path(path).relative_to(other)
+    except ValueError:
+        return False
+    return True
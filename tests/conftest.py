@@ -17,3 +17,9 @@ if is_debugging():
     @pytest.hookimpl(tryfirst=True)
     def pytest_internalerror(excinfo):
         raise excinfo.value
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    # Keep the output, state and synth caches out of the user's home
+    monkeypatch.setenv("CDKTF_PYTHON_CACHE_DIR", str(tmp_path / "cache"))
@@ -0,0 +1,28 @@
+from benchmarks import suite  # noqa: F401, registers the benchmarks
+from benchmarks.harness import compare, read_results, run_benchmarks, write_results
+from cdktf_helpers.fixtures import clear_aws_caches
+from cdktf_helpers.settings.aws.utils import set_session_provider
+
+
+def result(median):
+    return {"min": median, "median": median, "mean": median, "stdev": 0, "runs": 1}
+
+
+def test_compare():
+    baseline = {"a": result(1.0), "b": result(1.0), "c": result(1.0)}
+    results = {"a": result(1.1), "b": result(2.0), "c": result(0.5), "d": result(1)}
+    statuses = {row[0]: row[4] for row in compare(results, baseline, threshold=1.25)}
+    assert statuses == {"a": "", "b": "slower", "c": "faster", "d": "new"}
+
+
+def test_run_benchmarks(tmp_path):
+    try:
+        results = run_benchmarks("settings_", repeat=2, quick=True, echo=str)
+    finally:
+        set_session_provider(None)
+        clear_aws_caches()
+    assert set(results) == {"settings_validation[10]", "settings_dict[10]"}
+    assert all(r["runs"] == 2 and r["min"] <= r["median"] for r in results.values())
+
+    write_results(results, tmp_path / "results.json")
+    assert read_results(tmp_path / "results.json") == results
@@ -10,11 +10,13 @@ from io import StringIO
 from pathlib import Path
 from typing import List
 
+import boto3
 import pytest
 from moto import mock_aws
 from typer.testing import CliRunner
 
 from cdktf_helpers.cli import main
+from cdktf_helpers.utils import format_s3_bucket_name
 
 
 @pytest.fixture()
@@ -46,8 +48,8 @@ def workdir(tmp_path):
 arguments = ("--environment", "dev")
 
 
-def get_runner():
-    runner = CliRunner()
+def get_runner(**kwargs):
+    runner = CliRunner(**kwargs)
     invoke = partial(runner.invoke, main, catch_exceptions=False)
     return invoke
 
@@ -127,3 +129,632 @@ def parse_show_output(output):
             pass
         data[key] = {"value": value, "origin": origin}
     return data
+
+
+def test_backend_locks(workdir):
+    with workdir(create_settings=False):
+        from cdktf_helpers.stacks import AwsS3StateStack
+        from cdktf_helpers.state import fetch_locks
+
+        invoke = get_runner()
+        invoke(["backend", "create"])
+        table_name = AwsS3StateStack.format_dynamodb_table_name("testapp")
+        boto3.client("dynamodb").put_item(
+            TableName=table_name,
+            Item={
+                "LockID": {"S": "bucket/dev.tfstate"},
+                "Info": {
+                    "S": json.dumps(
+                        {
+                            "ID": "1234",
+                            "Who": "andy@laptop",
+                            "Operation": "OperationTypeApply",
+                            "Created": "2020-01-01T00:00:00.000000000Z",
+                            "Path": "bucket/dev.tfstate",
+                        }
+                    )
+                },
+            },
+        )
+
+        result = invoke(["backend", "locks"])
+        assert "andy@laptop" in result.stdout
+
+        result = invoke(["backend", "locks", "--break-older-than", "60"])
+        assert "Broke lock on bucket/dev.tfstate" in result.stdout
+        assert fetch_locks(table_name) == []
+
+
+def test_backend_stats(workdir):
+    with workdir(create_settings=False):
+        from cdktf_helpers.stacks import AwsS3StateStack
+
+        invoke = get_runner()
+        invoke(["backend", "create"])
+        state = {"resources": [{"type": "aws_instance", "instances": [{}]}]}
+        boto3.client("s3").put_object(
+            Bucket=AwsS3StateStack.format_s3_bucket_name("testapp"),
+            Key="dev.tfstate",
+            Body=json.dumps(state).encode(),
+        )
+
+        result = invoke(["backend", "stats", "--split-threshold", "0"])
+        assert "dev.tfstate" in result.stdout
+        assert "aws_instance (1)" in result.stdout
+        assert "split" in result.stdout
+
+
+def test_output(workdir):
+    with workdir(create_settings=False):
+        from cdktf_helpers.stacks import AwsS3StateStack
+
+        invoke = get_runner()
+        invoke(["backend", "create"])
+        state = {
+            "outputs": {
+                "url": {"value": "http://example.com", "type": "string"},
+                "password": {"value": "hunter2", "type": "string", "sensitive": True},
+            },
+            "resources": [],
+        }
+        boto3.client("s3").put_object(
+            Bucket=AwsS3StateStack.format_s3_bucket_name("testapp"),
+            Key="dev.tfstate",
+            Body=json.dumps(state).encode(),
+        )
+
+        result = invoke(["output", *arguments])
+        assert "http://example.com" in result.stdout
+        assert "hunter2" not in result.stdout
+
+        # Synth's progress goes to stderr, leaving stdout to the JSON
+        invoke = get_runner(mix_stderr=False)
+        result = invoke(["output", "--json", *arguments])
+        assert json.loads(result.stdout) == {
+            "Stack": {"url": "http://example.com", "password": "hunter2"}
+        }
+
+
+OUTPUT_STACKS = """
+from cli import Settings
+from cdktf_helpers.stacks import AwsS3StateStack
+
+
+class Custom(AwsS3StateStack[Settings]):
+    @classmethod
+    def format_s3_bucket_name(cls, app):
+        return f"{app}-custom-state"
+
+
+class Keyed(AwsS3StateStack[Settings]):
+    @property
+    def s3_key(self):
+        return f"keyed/{self.settings.environment}"
+"""
+
+
+def test_output_custom_location(workdir):
+    with workdir(create_settings=False) as (tmp_path, _, _):
+        from cdktf_helpers.settings.aws import ensure_backend_resources
+
+        (tmp_path / "located.py").write_text(OUTPUT_STACKS)
+        invoke = get_runner()
+        invoke(["backend", "create"])
+        ensure_backend_resources("testapp-custom-state", "testapp-custom-state-lock")
+        s3 = boto3.client("s3")
+        for bucket, key, url in [
+            ("testapp-custom-state", "dev.tfstate", "custom"),
+            (format_s3_bucket_name("testapp"), "keyed/dev.tfstate", "keyed"),
+        ]:
+            state = {"outputs": {"url": {"value": url}}}
+            s3.put_object(Bucket=bucket, Key=key, Body=json.dumps(state).encode())
+
+        stacks = ["--stacks", "located.Custom", "--stacks", "located.Keyed"]
+        invoke = get_runner(mix_stderr=False)
+        result = invoke(["output", "--json", "--no-cache", *stacks, *arguments])
+        assert json.loads(result.stdout) == {
+            "Custom": {"url": "custom"},
+            "Keyed": {"url": "keyed"},
+        }
+
+
+def test_backend_migrate(workdir):
+    with workdir(create_settings=False):
+        from cdktf_helpers.stacks import AwsS3StateStack
+
+        invoke = get_runner()
+        invoke(["backend", "create"])
+        s3 = boto3.client("s3")
+        source_bucket = AwsS3StateStack.format_s3_bucket_name("testapp")
+        dest_bucket = AwsS3StateStack.format_s3_bucket_name("renamedapp")
+        s3.put_object(Bucket=source_bucket, Key="dev.tfstate", Body=b"{}")
+
+        arguments = ["backend", "migrate", "--app", "renamedapp"]
+        result = invoke([*arguments, "--from-app", "testapp", "--dry-run"])
+        assert "Dry-run mode" in result.stdout
+
+        result = invoke([*arguments, "--from-app", "testapp"])
+        assert result.exit_code == 0
+        assert "Migrated and verified 1 states" in result.stdout
+        assert (
+            s3.get_object(Bucket=dest_bucket, Key="dev.tfstate")["Body"].read() == b"{}"
+        )
+
+        result = invoke([*arguments, "--from-app", "testapp"])
+        assert result.exit_code == 1
+        assert "--overwrite" in result.stdout
+
+
+FAKE_CDKTF = """#!{python}
+import json
+import os
+import sys
+import time
+
+command, name = sys.argv[1:3]
+# Like cdktf, refuse to deploy a stack without its dependencies, or destroy
+# one without its dependants
+with open("cdktf.out/manifest.json") as fh:
+    stacks = json.load(fh)["stacks"]
+if command == "deploy":
+    related = stacks[name]["dependencies"]
+elif command == "destroy":
+    related = [other for other in stacks if name in stacks[other]["dependencies"]]
+else:
+    related = []
+if related and "--ignore-missing-stack-dependencies" not in sys.argv:
+    print(f"{{name}} needs {{', '.join(related)}} included in this command")
+    sys.exit(1)
+with open(os.environ["FAKE_CDKTF_LOG"], "a") as fh:
+    fh.write(f"start {{name}}\\n")
+print(f"{{command}} {{name}} {{' '.join(sys.argv[3:])}}")
+if command == "diff":
+    if name in os.environ.get("FAKE_CDKTF_CHANGES", "").split(","):
+        print("\x1b[1mPlan:\x1b[0m 2 to add, 1 to change, 0 to destroy.")
+    elif name in os.environ.get("FAKE_CDKTF_SILENT", "").split(","):
+        pass
+    else:
+        print("No changes. Your infrastructure matches the configuration.")
+time.sleep(0.2)
+with open(os.environ["FAKE_CDKTF_LOG"], "a") as fh:
+    fh.write(f"end {{name}}\\n")
+sys.exit(1 if name == os.environ.get("FAKE_CDKTF_FAIL") else 0)
+"""
+
+DAG_STACKS = """
+from cli import Settings
+from cdktf_helpers.stacks import AwsS3StateStack
+
+
+class StackState(AwsS3StateStack[Settings]):
+    # A state, and lock, for each stack
+    @classmethod
+    def format_s3_key(cls, environment):
+        return f"{cls.__name__}/{environment}"
+
+
+class Network(StackState):
+    pass
+
+
+class Web(StackState):
+    def build(self):
+        self.remote_outputs(Network)
+
+
+class Worker(StackState):
+    pass
+"""
+
+SHARED_STATE_STACKS = """
+from cli import Settings
+from cdktf_helpers.stacks import AwsS3StateStack
+
+
+class Network(AwsS3StateStack[Settings]):
+    pass
+
+
+class Worker(AwsS3StateStack[Settings]):
+    pass
+"""
+
+
+@pytest.fixture()
+def fake_cdktf(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    script = bin_dir / "cdktf"
+    script.write_text(FAKE_CDKTF.format(python=sys.executable))
+    script.chmod(0o755)
+    log = tmp_path / "cdktf.log"
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("FAKE_CDKTF_LOG", str(log))
+
+    def events():
+        return log.read_text().splitlines()
+
+    return events
+
+
+@pytest.mark.parametrize("command", ["deploy", "destroy"])
+def test_scheduled_deploy(workdir, fake_cdktf, fake_terraform, command):
+    with workdir() as (tmp_path, _, _):
+        (tmp_path / "dag.py").write_text(DAG_STACKS)
+        stacks = ["--stacks", "dag.Network", "--stacks", "dag.Web"]
+        stacks += ["--stacks", "dag.Worker"]
+        invoke = get_runner()
+        result = invoke(
+            [command, *arguments, *stacks, "--parallelism", "3", "--auto-approve"]
+        )
+        assert result.exit_code == 0
+        assert f"Web | {command} Web --skip-synth --auto-approve" in result.stdout
+        assert "included in this command" not in result.stdout
+
+        events = fake_cdktf()
+        first, second = (
+            ("Network", "Web") if command == "deploy" else ("Web", "Network")
+        )
+        assert events.index(f"end {first}") < events.index(f"start {second}")
+        # Worker is independent, so runs alongside the first stack
+        assert events.index("start Worker") < events.index(f"end {first}")
+        # Each stack was initialised beforehand, one at a time
+        inits = [event.split()[0] for event in fake_terraform()]
+        assert inits == ["start", "end"] * 3
+
+
+def test_deploy_inits_first(workdir, fake_cdktf, fake_terraform, capfd):
+    with workdir() as (tmp_path, _, _):
+        (tmp_path / "dag.py").write_text(DAG_STACKS)
+        stacks = ["--stacks", "dag.Network", "--stacks", "dag.Web"]
+        invoke = get_runner()
+        result = invoke(["deploy", *arguments, *stacks, "--auto-approve"])
+        assert result.exit_code == 0
+        # One cdktf command for every stack, run against the synth already done
+        out = capfd.readouterr().out
+        assert "deploy Network Web --skip-synth --auto-approve" in out
+        # Its inits find each stack initialised, one at a time, beforehand
+        inits = [event.split()[0] for event in fake_terraform()]
+        assert inits == ["start", "end"] * 2
+
+
+def test_scheduled_deploy_shared_state(workdir, fake_cdktf, fake_terraform):
+    with workdir() as (tmp_path, _, _):
+        (tmp_path / "shared.py").write_text(SHARED_STATE_STACKS)
+        # Independent, but both keep their state in dev.tfstate
+        stacks = ["--stacks", "shared.Network", "--stacks", "shared.Worker"]
+        invoke = get_runner()
+        result = invoke(
+            ["deploy", *arguments, *stacks, "--parallelism", "2", "--auto-approve"]
+        )
+        assert result.exit_code == 0
+        events = fake_cdktf()
+        assert events.index("end Network") < events.index("start Worker")
+
+
+def test_scheduled_deploy_failure(workdir, fake_cdktf, fake_terraform, monkeypatch):
+    monkeypatch.setenv("FAKE_CDKTF_FAIL", "Network")
+    with workdir() as (tmp_path, _, _):
+        (tmp_path / "dag.py").write_text(DAG_STACKS)
+        stacks = ["--stacks", "dag.Network", "--stacks", "dag.Web"]
+        stacks += ["--stacks", "dag.Worker"]
+        invoke = get_runner()
+        result = invoke(
+            ["deploy", *arguments, *stacks, "--parallelism", "2", "--auto-approve"]
+        )
+        assert result.exit_code == 1
+        assert "start Web" not in fake_cdktf()
+        assert re.search(r"Web\s+skipped", result.stdout)
+        assert re.search(r"Worker\s+succeeded", result.stdout)
+
+
+def test_scheduled_deploy_needs_auto_approve(workdir):
+    with workdir(create_settings=False):
+        result = get_runner()(["deploy", *arguments, "--parallelism", "2"])
+        assert result.exit_code == 1
+
+
+FAKE_TERRAFORM = """#!{python}
+import os
+import sys
+import time
+
+command = sys.argv[1]
+name = os.path.basename(os.getcwd())
+with open(os.environ["FAKE_TERRAFORM_LOG"], "a") as fh:
+    fh.write(f"start {{command}} {{name}}\\n")
+print(f"{{command}} {{' '.join(sys.argv[2:])}}")
+if command == "init":
+    os.makedirs(".terraform", exist_ok=True)
+    provider = "registry.terraform.io/hashicorp/aws/5.0.0/linux_amd64"
+    cache_dir = os.environ["TF_PLUGIN_CACHE_DIR"]
+    os.makedirs(os.path.join(cache_dir, provider), exist_ok=True)
+elif command == "plan":
+    # Like terraform, colour output even when it's piped
+    if "-no-color" in sys.argv:
+        print("Plan: 1 to add, 0 to change, 0 to destroy.")
+    else:
+        print("\x1b[1mPlan:\x1b[0m 1 to add, 0 to change, 0 to destroy.")
+else:
+    time.sleep(0.2)
+with open(os.environ["FAKE_TERRAFORM_LOG"], "a") as fh:
+    fh.write(f"end {{command}} {{name}}\\n")
+"""
+
+
+@pytest.fixture()
+def fake_terraform(tmp_path, monkeypatch):
+    script = tmp_path / "fake-terraform"
+    script.write_text(FAKE_TERRAFORM.format(python=sys.executable))
+    script.chmod(0o755)
+    log = tmp_path / "terraform.log"
+    log.touch()
+    monkeypatch.setenv("TERRAFORM_BINARY_NAME", str(script))
+    monkeypatch.setenv("FAKE_TERRAFORM_LOG", str(log))
+
+    def events():
+        return log.read_text().splitlines()
+
+    return events
+
+
+def test_run(workdir, fake_terraform):
+    with workdir() as (tmp_path, _, _):
+        (tmp_path / "dag.py").write_text(DAG_STACKS)
+        stacks = ["--stacks", "dag.Network", "--stacks", "dag.Web"]
+        stacks += ["--stacks", "dag.Worker"]
+        invoke = get_runner()
+
+        result = invoke(["run", "apply", *arguments, *stacks, "--auto-approve"])
+        assert result.exit_code == 0
+        assert "Web | apply -input=false -auto-approve -no-color" in result.stdout
+        events = fake_terraform()
+        assert events.index("end apply Network") < events.index("start apply Web")
+        assert events.index("start apply Worker") < events.index("end apply Network")
+        stack_dir = tmp_path / "cdktf.out" / "stacks" / "Web"
+        assert (stack_dir / ".terraform").is_dir()
+        assert "0 cached providers available, 1 downloaded" in result.stdout
+
+        # .terraform directories are reused while their configuration is
+        # unchanged
+        result = invoke(["run", "plan", *arguments, *stacks])
+        assert result.exit_code == 0
+        assert re.search(r"Web\s+1\s+0\s+0\s+succeeded", result.stdout)
+        assert "1 cached providers available, 0 downloaded" in result.stdout
+        events = fake_terraform()
+        assert sum(event.startswith("start init") for event in events) == 3
+
+        result = invoke(["run", "destroy", *arguments, *stacks])
+        assert result.exit_code == 1
+
+
+def test_valid_terraform(tmp_path, fake_terraform, valid_terraform):
+    outdir = tmp_path / "out"
+    for name in ("Network", "Web"):
+        stack_dir = outdir / "stacks" / name
+        stack_dir.mkdir(parents=True)
+        (stack_dir / "cdk.tf.json").write_text(json.dumps({"terraform": {}}))
+
+    assert valid_terraform(outdir)
+    events = fake_terraform()
+    assert sorted(e for e in events if e.startswith("start")) == [
+        "start init Network",
+        "start init Web",
+        "start validate Network",
+        "start validate Web",
+    ]
+    marker = outdir / "stacks" / "Web" / ".terraform" / "cdktf-python-init"
+    assert marker.exists()
+
+    # Stacks are only validated again once their configuration changes
+    assert valid_terraform(outdir)
+    assert fake_terraform() == events
+    (outdir / "stacks" / "Web" / "cdk.tf.json").write_text(
+        json.dumps({"terraform": {}, "output": {}})
+    )
+    assert valid_terraform(outdir)
+    assert fake_terraform()[len(events) :] == [
+        "start validate Web",
+        "end validate Web",
+    ]
+
+
+def test_synth_environments(workdir):
+    with workdir() as (tmp_path, settings_model, _):
+        settings_model(app="testapp", environment="test", colour="blue").save()
+
+        invoke = get_runner()
+        environments = ["--environment", "dev", "--environment", "test"]
+        result = invoke(["synth", *environments])
+        assert result.exit_code == 0
+
+        for environment in ("dev", "test"):
+            stack_file = tmp_path / "cdktf.out" / environment / "stacks"
+            stack_file = stack_file / "Stack" / "cdk.tf.json"
+            synthesized = json.loads(stack_file.read_text())
+            backend = synthesized["terraform"]["backend"]["s3"]
+            assert backend["key"] == f"{environment}.tfstate"
+
+
+def test_synth_cache(workdir):
+    with workdir() as (tmp_path, settings_model, _):
+        invoke = get_runner()
+
+        result = invoke(["synth", *arguments])
+        assert "Added Stack to testapp/dev" in result.stdout
+
+        stack_file = tmp_path / "cdktf.out" / "stacks" / "Stack" / "cdk.tf.json"
+        stack_file.unlink()
+        result = invoke(["synth", *arguments])
+        assert "Reused cached synth of testapp/dev" in result.stdout
+        assert stack_file.exists()
+
+        result = invoke(["synth", *arguments, "--no-cache"])
+        assert "Added Stack" in result.stdout
+
+        # Changed settings invalidate the cache
+        settings_model(app="testapp", environment="dev", colour="blue").save()
+        result = invoke(["synth", *arguments])
+        assert "Added Stack" in result.stdout
+
+        result = invoke(["cache", "prune"])
+        assert "Removed 0 cached synths" in result.stdout
+        result = invoke(["cache", "prune", "--all"])
+        assert "Removed 2 cached synths" in result.stdout
+
+
+def test_synth_cache_inlined_outputs(workdir):
+    from cdktf_helpers.state import cached_state_outputs
+
+    with workdir() as (tmp_path, _, _):
+        (tmp_path / "consumer.py").write_text(
+            "from cdktf import TerraformOutput\n\n"
+            "from cli import Stack\n\n\n"
+            "class Consumer(Stack):\n"
+            "    @classmethod\n"
+            "    def format_s3_key(cls, environment):\n"
+            '        return f"consumer/{environment}"\n\n'
+            "    def build(self):\n"
+            "        outputs = self.remote_outputs(Stack, inline=True)\n"
+            '        TerraformOutput(self, "url", value=outputs["url"])\n'
+        )
+        invoke = get_runner()
+        invoke(["backend", "create"])
+        stacks = ["--stacks", "consumer.Consumer"]
+        stack_file = tmp_path / "cdktf.out" / "stacks" / "Consumer" / "cdk.tf.json"
+
+        def synth_with_url(url):
+            state = {"outputs": {"url": {"value": url}}}
+            boto3.client("s3").put_object(
+                Bucket=format_s3_bucket_name("testapp"),
+                Key="dev.tfstate",
+                Body=json.dumps(state).encode(),
+            )
+            # Each run of the CLI is a new process, which this one isn't
+            cached_state_outputs.cache_clear()
+            result = invoke(["synth", *arguments, *stacks])
+            assert "Reused cached synth" not in result.stdout
+            return json.loads(stack_file.read_text())["output"]["url"]["value"]
+
+        assert synth_with_url("http://one.example.com") == "http://one.example.com"
+        assert synth_with_url("http://two.example.com") == "http://two.example.com"
+
+
+def test_synth_deferred_settings(workdir):
+    with workdir() as (tmp_path, settings_model, _):
+        (tmp_path / "deferred.py").write_text(
+            "from cli import Stack\n\n\n"
+            "class Deferred(Stack):\n"
+            "    deferred_settings = True\n"
+        )
+        invoke = get_runner()
+        stacks = ["--stacks", "deferred.Deferred"]
+        result = invoke(["synth", *arguments, *stacks])
+        assert "Added Deferred to testapp/dev" in result.stdout
+
+        stack_file = tmp_path / "cdktf.out" / "stacks" / "Deferred" / "cdk.tf.json"
+        synthesized = json.loads(stack_file.read_text())
+        data = synthesized["data"]["aws_ssm_parameters_by_path"]["settings"]
+        assert data["path"] == "/testapp/dev/"
+
+        # Deferred values don't change the output, so it's still cached
+        settings_model(app="testapp", environment="dev", colour="blue").save()
+        result = invoke(["synth", *arguments, *stacks])
+        assert "Reused cached synth of testapp/dev" in result.stdout
+
+
+def test_synth_deferred_settings_missing(workdir):
+    with workdir() as (tmp_path, _, _):
+        (tmp_path / "eager.py").write_text(
+            "from cli import Settings\n"
+            "from cdktf_helpers.settings.aws import EagerField\n"
+            "from cdktf_helpers.stacks import AwsS3StateStack\n\n\n"
+            "class EagerSettings(Settings):\n"
+            "    instances: int = EagerField()\n\n\n"
+            "class Deferred(AwsS3StateStack[EagerSettings]):\n"
+            "    deferred_settings = True\n"
+        )
+        result = get_runner()(["synth", *arguments, "--stacks", "eager.Deferred"])
+        assert result.exit_code == 1
+        assert "Settings failed validation" in result.stdout
+        assert "- instances: Field required" in result.stdout
+
+
+def test_synth_timings(workdir):
+    with workdir() as (tmp_path, _, _):
+        invoke = get_runner()
+        trace_file = tmp_path / "trace.json"
+        result = invoke(
+            ["--timings", "--trace", "trace.json", "synth", *arguments, "--no-cache"]
+        )
+        assert result.exit_code == 0
+
+        for phase in ("resolve settings", "· validate Settings", "· · build"):
+            assert phase in result.stdout
+
+        events = json.loads(trace_file.read_text())["traceEvents"]
+        names = {event["name"] for event in events if event["ph"] == "X"}
+        assert {"cdktf-python synth", "validate Settings", "add Stack"} <= names
+
+
+def test_synth_profile_build(workdir):
+    with workdir() as (_, _, _):
+        invoke = get_runner()
+        invoke(["synth", *arguments])
+        # Profiling skips the synth cache, the stacks have to be built
+        result = invoke(["--profile-build", "synth", *arguments])
+        assert result.exit_code == 0
+        assert "Added Stack" in result.stdout
+        assert "Resource type" in result.stdout
+
+
+def test_synth_memory_profile(workdir):
+    with workdir() as (_, _, _):
+        invoke = get_runner()
+        # A budget implies --memory-profile
+        result = invoke(["synth", *arguments, "--memory-budget", "1"])
+        assert "app.synth (dev)" in result.stdout
+        assert "Peak memory" in result.stdout
+        assert result.exit_code == 1
+        assert "over the budget of 1 MB" in result.stdout
+
+
+def test_diff(workdir, fake_cdktf, fake_terraform, monkeypatch):
+    with workdir() as (tmp_path, _, _):
+        (tmp_path / "dag.py").write_text(DAG_STACKS)
+        stacks = ["--stack", "dag.Network", "--stack", "dag.Web"]
+        invoke = get_runner()
+
+        result = invoke(["diff", *arguments, *stacks, "--detailed-exitcode"])
+        assert result.exit_code == 0
+        assert re.search(r"Network\s+0\s+0\s+0\s+no changes", result.stdout)
+
+        monkeypatch.setenv("FAKE_CDKTF_CHANGES", "Web")
+        result = invoke(["diff", *arguments, *stacks])
+        assert result.exit_code == 0
+        assert re.search(r"Web\s+2\s+1\s+0\s+changes", result.stdout)
+
+        result = invoke(["diff", *arguments, *stacks, "--detailed-exitcode"])
+        assert result.exit_code == 2
+
+        # A plan that doesn't summarise its changes isn't a failure
+        monkeypatch.setenv("FAKE_CDKTF_CHANGES", "")
+        monkeypatch.setenv("FAKE_CDKTF_SILENT", "Web")
+        result = invoke(["diff", *arguments, *stacks])
+        assert result.exit_code == 0
+        assert re.search(r"Web\s+no summary", result.stdout)
+        # Though it can't be counted as having no changes
+        result = invoke(["diff", *arguments, *stacks, "--detailed-exitcode"])
+        assert result.exit_code == 1
+
+        monkeypatch.setenv("FAKE_CDKTF_FAIL", "Network")
+        result = invoke(["diff", *arguments, *stacks, "--detailed-exitcode"])
+        assert result.exit_code == 1
+        assert re.search(r"Network.+error", result.stdout)
+
+
+def test_diff_all(workdir, fake_cdktf, fake_terraform):
+    with workdir():
+        result = get_runner()(["diff", *arguments, "--all"])
+        assert result.exit_code == 0
+        assert "start Stack" in fake_cdktf()
@@ -0,0 +1,108 @@
+import pytest
+from botocore.exceptions import ClientError
+
+from cdktf_helpers.settings.aws import (
+    AwsAppSettings,
+    AwsResources,
+    HostedZone,
+    HostedZoneField,
+    Subnet,
+    SubnetsField,
+    Vpc,
+    VpcField,
+)
+from cdktf_helpers.settings.aws.utils import boto3_session, ensure_backend_resources
+
+
+def test_settings_roundtrip(fake_aws):
+    class Settings(AwsAppSettings):
+        # More parameters than fit on one page of get_parameters_by_path
+        values: dict = {}
+        a: str = "a"
+        b: str = "b"
+        c: str = "c"
+        d: str = "d"
+        e: str = "e"
+        f: str = "f"
+        g: str = "g"
+        h: str = "h"
+        i: str = "i"
+        j: str = "j"
+
+    Settings(app="myapp", environment="dev", j="saved", values={"k": 1}).save()
+    assert len(fake_aws.parameters) > 10
+
+    settings = Settings(app="myapp", environment="dev")
+    assert settings.j == "saved"
+    assert settings.values == {"k": 1}
+    assert Settings.fetch_settings("myapp", "dev")["a"] == "a"
+
+
+def test_parameters(fake_aws):
+    ssm = boto3_session().client("ssm")
+    ssm.put_parameter(Name="/app/dev/foo", Value='"x"', Type="String")
+    with pytest.raises(ClientError) as e:
+        ssm.put_parameter(Name="/app/dev/foo", Value='"y"', Type="String")
+    assert e.value.response["Error"]["Code"] == "ParameterAlreadyExists"
+    ssm.put_parameter(Name="/app/dev/foo", Value='"y"', Overwrite=True)
+    assert ssm.get_parameter(Name="/app/dev/foo")["Parameter"]["Version"] == 2
+
+    ssm.put_parameter(Name="/app/dev/nested/bar", Value='"z"')
+    shallow = ssm.get_parameters_by_path(Path="/app/dev")["Parameters"]
+    assert [p["Name"] for p in shallow] == ["/app/dev/foo"]
+
+    response = ssm.delete_parameters(Names=["/app/dev/foo", "/app/dev/missing"])
+    assert response["DeletedParameters"] == ["/app/dev/foo"]
+    assert response["InvalidParameters"] == ["/app/dev/missing"]
+
+
+def test_default_vpc(fake_aws):
+    class Settings(AwsAppSettings):
+        vpc: Vpc = VpcField()
+        subnets: AwsResources[Subnet] = SubnetsField()
+
+    settings = Settings(app="testapp", environment="dev")
+    assert fake_aws.vpcs[settings.vpc.id]["IsDefault"]
+    assert len(settings.subnets) == 3
+    assert settings.subnets[0].cidr_block == "172.31.0.0/20"
+
+
+def test_tagged_subnets(fake_aws):
+    vpc_id = fake_aws.add_vpc("10.0.0.0/16")
+    subnet_id = fake_aws.add_subnet(vpc_id, "10.0.1.0/24", tags={"Name": "private"})
+
+    vpc = boto3_session().resource("ec2").Vpc(vpc_id)
+    [subnet] = vpc.subnets.all()
+    assert subnet.id == subnet_id
+    assert subnet.tags == [{"Key": "Name", "Value": "private"}]
+
+    with pytest.raises(ClientError):
+        boto3_session().resource("ec2").Subnet("subnet-missing").load()
+
+
+def test_hosted_zone(fake_aws):
+    zone_id = fake_aws.add_hosted_zone("example.com")
+
+    class Settings(AwsAppSettings):
+        zone: HostedZone = HostedZoneField()
+
+    settings = Settings(app="testapp", environment="dev", zone=zone_id)
+    assert settings.zone.name == "example.com."
+    assert settings.zone.long_id == f"/hostedzone/{zone_id}"
+
+
+def test_ensure_backend_resources(fake_aws):
+    created, existing = ensure_backend_resources("bucket", "table")
+    assert [r.name for r in created] == ["bucket", "table"]
+    assert not existing
+    created, existing = ensure_backend_resources("bucket", "table")
+    assert not created
+    assert [r.name for r in existing] == ["bucket", "table"]
+
+
+def test_not_implemented(fake_aws):
+    session = boto3_session()
+    with pytest.raises(NotImplementedError, match="ssm.get_parameters"):
+        session.client("ssm").get_parameters(Names=["x"])
+    with pytest.raises(NotImplementedError):
+        session.client("lambda")
@@ -0,0 +1,128 @@
+import moto  # noqa: F401
+import pytest
+
+# moto is imported here rather than first by the fixtures in a pytester run,
+# which would unload it again afterwards. Sessions already made would keep
+# the unloaded copy's hooks and go on to reach AWS.
+pytest_plugins = ["pytester"]
+
+CONFTEST = """
+import pytest
+
+from cdktf_helpers.settings.aws import AwsAppSettings
+from cdktf_helpers.stacks import AwsS3StateStack
+
+
+class Settings(AwsAppSettings):
+    colour: str = "red"
+
+
+class Stack(AwsS3StateStack[Settings]):
+    pass
+
+
+@pytest.fixture(scope="session")
+def seed_settings():
+    return [(Settings, {"app": "app", "environment": "dev", "colour": "blue"})]
+"""
+
+TESTS = """
+from conftest import Settings, Stack
+
+
+def test_seeded(mocked_aws):
+    with mocked_aws():
+        assert Settings(app="app", environment="dev").colour == "blue"
+
+
+def test_outdir(stack, cdktf_outdir, worker):
+    with stack(Stack) as built:
+        assert built.node.scope.outdir.startswith(str(cdktf_outdir))
+    assert cdktf_outdir.name.startswith(f"cdktf-{worker}")
+"""
+
+
+@pytest.mark.parametrize("worker", ["main", "gw1"])
+def test_worker_fixtures(pytester, monkeypatch, worker):
+    if worker != "main":
+        monkeypatch.setenv("PYTEST_XDIST_WORKER", worker)
+    pytester.makeconftest(CONFTEST)
+    pytester.makepyfile(
+        TESTS
+        + f"""
+
+import pytest
+
+
+@pytest.fixture
+def worker():
+    return "{worker}"
+"""
+    )
+    result = pytester.runpytest_inprocess()
+    result.assert_outcomes(passed=2)
+
+
+def test_moto_server_option(pytester):
+    pytest.importorskip("flask")
+    pytester.makeconftest(CONFTEST)
+    pytester.makepyfile(TESTS.split("\n\n\ndef test_outdir")[0])
+    result = pytester.runpytest_inprocess("--cdktf-moto-server")
+    result.assert_outcomes(passed=1)
+
+
+def test_fake_aws_option(pytester):
+    pytester.makeconftest(CONFTEST)
+    pytester.makepyfile(
+        TESTS
+        + """
+
+import pytest
+
+
+@pytest.fixture
+def worker():
+    return "main"
+"""
+    )
+    result = pytester.runpytest_inprocess("--cdktf-fake-aws")
+    result.assert_outcomes(passed=2)
+
+
+def test_seeded_once(pytester):
+    pytester.makeconftest(CONFTEST)
+    pytester.makepyfile(
+        """
+from moto import mock_aws
+
+from conftest import Settings
+
+
+def test_kept_between_entries(mocked_aws):
+    with mocked_aws():
+        Settings(app="app", environment="dev", colour="green").save()
+    with mocked_aws():
+        assert Settings(app="app", environment="dev").colour == "green"
+
+
+def test_seeded_again_after_reset(mocked_aws):
+    with mock_aws():
+        pass
+    with mocked_aws():
+        assert Settings(app="app", environment="dev").colour == "blue"
+"""
+    )
+    result = pytester.runpytest_inprocess()
+    result.assert_outcomes(passed=2)
+
+
+def test_synth_key_extras():
+    from cdktf_helpers.fixtures import synth_key
+    from cdktf_helpers.settings import AppSettings
+
+    def key(**extra):
+        settings = AppSettings(app="app", environment="dev", **extra)
+        return synth_key("synth", object, settings)
+
+    assert key(colour="red") == key(colour="red")
+    assert key(colour="red") != key(colour="blue")
@@ -0,0 +1,79 @@
+import io
+import json
+
+import pytest
+
+from cdktf_helpers.jsonstream import JsonStream
+
+DOCUMENT = {
+    "version": 4,
+    "serial": 12345,
+    "outputs": {
+        "url": {"value": 'http://example.com/"quoted"\\path', "type": "string"}
+    },
+    "resources": [
+        {"type": "aws_instance", "instances": [{"a": [1, {"b": "}]"}]}, {}]},
+        {"type": "aws_s3_bucket", "instances": []},
+    ],
+    "empty": {},
+    "unicode": "ünïcødé ✓",
+    "flag": True,
+}
+
+
+def stream(document, chunk_size=3):
+    return JsonStream(io.BytesIO(json.dumps(document).encode()), chunk_size)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 65536])
+def test_decode_each_value(chunk_size):
+    reader = stream(DOCUMENT, chunk_size)
+    assert {key: reader.decode() for key in reader.iter_object()} == DOCUMENT
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 65536])
+def test_skip_values(chunk_size):
+    reader = stream(DOCUMENT, chunk_size)
+    seen = {}
+    for key in reader.iter_object():
+        if key in ("serial", "flag"):
+            seen[key] = reader.decode()
+        else:
+            reader.skip()
+    assert seen == {"serial": 12345, "flag": True}
+
+
+@pytest.mark.parametrize("text", ["12.5", "-1e-5", "1.5E+10", "-0", "true", "null"])
+def test_decode_scalar(text):
+    reader = JsonStream(io.BytesIO(text.encode()), 1)
+    assert reader.decode() == json.loads(text)
+    reader = JsonStream(io.BytesIO(f"[{text}, {text}]".encode()), 1)
+    assert [reader.decode() for _ in reader.iter_array()] == [json.loads(text)] * 2
+
+
+def test_iter_array():
+    reader = stream([{"x": 1}, "two", [3], 4.5, None])
+    values = []
+    for index in reader.iter_array():
+        if index % 2:
+            reader.skip()
+        else:
+            values.append(reader.decode())
+    assert values == [{"x": 1}, [3], None]
+
+
+def test_truncated_document():
+    reader = JsonStream(io.BytesIO(b'{"resources": [{"type": "x"'), 4)
+    with pytest.raises(ValueError):
+        for key in reader.iter_object():
+            reader.skip()
+
+
+def test_malformed_value():
+    # Found to be malformed once its end is read, not at the end of the file
+    text = b'[{"a": 1], ' + b'"padding", ' * 1000 + b"0]"
+    reader = JsonStream(io.BytesIO(text), 4)
+    with pytest.raises(ValueError):
+        for _ in reader.iter_array():
+            reader.decode()
+    assert reader.bytes_read < 20
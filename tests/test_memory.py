@@ -0,0 +1,90 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+from cdktf_helpers.memory import (
+    MB,
+    is_memory_profiling,
+    jsii_processes,
+    jsii_rss,
+    memory_phase,
+    memory_profiling,
+    process_rss,
+)
+
+
+def allocate():
+    return [bytes(1024) for _ in range(10 * 1024)]
+
+
+def test_memory_phase_not_profiling():
+    assert not is_memory_profiling()
+    with memory_phase("ignored"):
+        pass
+
+
+def test_memory_profiling():
+    with memory_profiling() as profile:
+        with memory_phase("small"):
+            pass
+        with memory_phase("large"):
+            data = allocate()
+
+    small, large = profile.phases
+    assert large["name"] == "large"
+    assert large["python_growth"] >= 10 * MB
+    assert large["python_peak"] >= 10 * MB
+    assert small["python_growth"] < MB
+    assert large["top_site"].startswith(__file__)
+    assert profile.top_sites()[0].traceback[0].filename == __file__
+    assert "Peak memory" in profile.format()
+    del data
+
+
+def test_memory_profiling_rss_only():
+    import tracemalloc
+
+    with memory_profiling(allocations=False) as profile:
+        assert not tracemalloc.is_tracing()
+        with memory_phase("phase"):
+            pass
+
+    (phase,) = profile.phases
+    assert phase["python_growth"] is None and phase["top_site"] is None
+    assert phase["peak_rss"] > 0
+    assert "Peak memory" in profile.format()
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="reads /proc")
+def test_jsii_found_once(monkeypatch):
+    from cdktf_helpers import memory
+
+    scans = []
+
+    def parent_pids():
+        scans.append(True)
+        return {}
+
+    monkeypatch.setattr(memory, "parent_pids", parent_pids)
+    # This process stands in for the launcher
+    monkeypatch.setattr(memory, "jsii_launchers", lambda parents: [os.getpid()])
+    profile = memory.MemoryProfile(allocations=False)
+    for _ in range(5):
+        profile.sample()
+    assert len(scans) == 1
+    assert profile.jsii_pids[0] == os.getpid()
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="reads /proc")
+def test_rss():
+    import cdktf  # noqa: F401 starts the jsii runtime
+
+    assert process_rss() > 0
+    assert jsii_rss() > 0
+    # The kernel is started by the jsii launcher, rather than by this process
+    pids = jsii_processes()
+    assert any(
+        b"program.js" in Path(f"/proc/{pid}/cmdline").read_bytes() for pid in pids
+    )
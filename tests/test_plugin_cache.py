@@ -0,0 +1,63 @@
+import os
+import zipfile
+
+from cdktf_helpers.plugin_cache import (
+    cached_providers,
+    plugin_cache_dir,
+    seed_plugin_cache,
+    shared_plugin_cache,
+)
+
+AWS = "registry.terraform.io/hashicorp/aws"
+
+
+def test_plugin_cache_dir():
+    assert plugin_cache_dir().name.startswith("cdktf-provider-aws-")
+    assert plugin_cache_dir().is_dir()
+
+
+def test_seed_plugin_cache(tmp_path):
+    mirror = tmp_path / "mirror"
+    unpacked = mirror / AWS / "5.0.0" / "linux_amd64"
+    unpacked.mkdir(parents=True)
+    (unpacked / "terraform-provider-aws_v5.0.0").write_text("binary")
+    with zipfile.ZipFile(
+        mirror / AWS / "terraform-provider-aws_5.1.0_linux_amd64.zip", "w"
+    ) as zf:
+        zf.writestr("terraform-provider-aws_v5.1.0", "binary")
+
+    cache = tmp_path / "cache"
+    assert seed_plugin_cache(cache, mirror) == 2
+    assert cached_providers(cache) == {
+        f"{AWS}/5.0.0/linux_amd64",
+        f"{AWS}/5.1.0/linux_amd64",
+    }
+    binary = cache / AWS / "5.1.0" / "linux_amd64" / "terraform-provider-aws_v5.1.0"
+    assert os.access(binary, os.X_OK)
+
+    # Providers already in the cache aren't copied again
+    assert seed_plugin_cache(cache, mirror) == 0
+
+
+def test_shared_plugin_cache(tmp_path, monkeypatch):
+    monkeypatch.delenv("TF_PLUGIN_CACHE_DIR", raising=False)
+    mirror = tmp_path / "mirror"
+    (mirror / AWS / "5.0.0" / "linux_amd64").mkdir(parents=True)
+    monkeypatch.setenv("CDKTF_PYTHON_PROVIDER_MIRROR", str(mirror))
+
+    messages = []
+    with shared_plugin_cache(echo=messages.append) as cache:
+        assert os.environ["TF_PLUGIN_CACHE_DIR"] == str(cache)
+        (cache / AWS / "5.1.0" / "linux_amd64").mkdir(parents=True)
+    assert "TF_PLUGIN_CACHE_DIR" not in os.environ
+    assert messages == [
+        f"Copied 1 providers into the plugin cache from {mirror}",
+        "Provider plugin cache: 1 cached providers available, 1 downloaded",
+    ]
+
+
+def test_shared_plugin_cache_configured(tmp_path, monkeypatch):
+    monkeypatch.setenv("TF_PLUGIN_CACHE_DIR", str(tmp_path / "plugins"))
+    with shared_plugin_cache(echo=lambda message: None) as cache:
+        assert cache == tmp_path / "plugins"
+    assert os.environ["TF_PLUGIN_CACHE_DIR"] == str(tmp_path / "plugins")
@@ -0,0 +1,151 @@
+import json
+import sys
+import threading
+import time
+
+import pytest
+
+from cdktf_helpers.scheduler import (
+    FAILED,
+    SKIPPED,
+    SUCCEEDED,
+    parse_plan_summary,
+    reverse_dependencies,
+    run_graph,
+    run_prefixed,
+    stack_dependencies,
+)
+
+GRAPH = {
+    "network": set(),
+    "database": {"network"},
+    "web": {"network", "database"},
+    "worker": {"database"},
+    "monitoring": set(),
+}
+
+
+def recorder(fail=(), delay=0.05):
+    events = []
+    lock = threading.Lock()
+
+    def run(node):
+        with lock:
+            events.append(("start", node))
+        time.sleep(delay)
+        with lock:
+            events.append(("end", node))
+        return 1 if node in fail else 0
+
+    return events, run
+
+
+def test_run_graph_order():
+    events, run = recorder()
+    status = run_graph(GRAPH, run, parallelism=3)
+    assert set(status.values()) == {SUCCEEDED}
+    for node, depends_on in GRAPH.items():
+        for dependency in depends_on:
+            assert events.index(("end", dependency)) < events.index(("start", node))
+
+
+def test_run_graph_parallelism():
+    running = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def run(node):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.05)
+        with lock:
+            running -= 1
+        return 0
+
+    run_graph({str(i): set() for i in range(6)}, run, parallelism=2)
+    assert peak == 2
+
+
+def test_run_graph_exclusive():
+    events, run = recorder()
+    exclusive = {"a": "dev.tfstate", "b": "dev.tfstate", "c": None, "d": None}
+    status = run_graph(
+        {node: set() for node in exclusive}, run, parallelism=4, exclusive=exclusive
+    )
+    assert set(status.values()) == {SUCCEEDED}
+    first, second = sorted(["a", "b"], key=lambda node: events.index(("start", node)))
+    assert events.index(("end", first)) < events.index(("start", second))
+    # Nodes outside of a group still run alongside them
+    assert events.index(("start", "c")) < events.index(("end", first))
+
+
+def test_run_graph_failure_skips_dependents():
+    events, run = recorder(fail={"database"})
+    status = run_graph(GRAPH, run, parallelism=2)
+    assert status == {
+        "network": SUCCEEDED,
+        "database": FAILED,
+        "web": SKIPPED,
+        "worker": SKIPPED,
+        "monitoring": SUCCEEDED,
+    }
+    assert ("start", "web") not in events
+
+
+def test_run_graph_cycle():
+    with pytest.raises(ValueError):
+        run_graph({"a": {"b"}, "b": {"a"}}, lambda node: 0)
+
+
+def test_reverse_dependencies():
+    reversed_graph = reverse_dependencies(GRAPH)
+    assert reversed_graph["network"] == {"database", "web"}
+    assert reversed_graph["database"] == {"web", "worker"}
+    assert reversed_graph["web"] == set()
+
+
+def test_stack_dependencies(tmp_path):
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text(
+        json.dumps(
+            {
+                "stacks": {
+                    "Network": {"dependencies": []},
+                    "Web": {"dependencies": ["Network", "Shared"]},
+                    "Shared": {"dependencies": []},
+                }
+            }
+        )
+    )
+    assert stack_dependencies(manifest, ["Network", "Web"]) == {
+        "Network": set(),
+        "Web": {"Network"},
+    }
+
+
+def test_run_prefixed():
+    lines = []
+    code = run_prefixed(
+        [sys.executable, "-c", "print('one'); print('two'); raise SystemExit(3)"],
+        "stack",
+        echo=lines.append,
+    )
+    assert code == 3
+    assert lines == ["stack | one", "stack | two"]
+
+
+def test_parse_plan_summary():
+    assert parse_plan_summary(
+        ["Stack | Plan: 1 to import, 3 to add, 2 to change, 1 to destroy."]
+    ) == {"add": 3, "change": 2, "destroy": 1}
+    assert parse_plan_summary(["No changes. Nothing to do."]) == {
+        "add": 0,
+        "change": 0,
+        "destroy": 0,
+    }
+    assert parse_plan_summary(["Error: something broke"]) is None
+    assert parse_plan_summary(
+        ["Stack | \x1b[1mPlan:\x1b[0m 1 to add, 0 to change, 0 to destroy."]
+    ) == {"add": 1, "change": 0, "destroy": 0}
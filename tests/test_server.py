@@ -0,0 +1,148 @@
+import json
+import os
+import socket
+import sys
+import threading
+from contextlib import contextmanager
+
+from cdktf_helpers.server import (
+    LineWriter,
+    Server,
+    aws_identity,
+    forget_project_modules,
+    forward,
+    forwarded_env,
+)
+
+
+@contextmanager
+def running_server(path, run):
+    server = Server(path, run)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+def test_forward(tmp_path, monkeypatch):
+    requests = []
+
+    def run(request):
+        requests.append(request)
+        print("synthesizing", os.environ.get("CDKTF_OUTDIR"))
+        print("partial line", end="")
+        sys.exit(3)
+
+    monkeypatch.setenv("CDKTF_OUTDIR", "client-outdir")
+    path = tmp_path / "test.sock"
+    output = []
+    with running_server(path, run):
+        assert forward(path, {"stacks": ["main.Stack"]}, echo=output.append) == 3
+
+    assert output == ["synthesizing client-outdir", "partial line"]
+    assert requests[0]["stacks"] == ["main.Stack"]
+
+
+def test_forward_no_server(tmp_path):
+    assert forward(tmp_path / "missing.sock", {}) is None
+
+
+def first_reply(path, request):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(str(path))
+        with sock.makefile("rwb") as fh:
+            fh.write(json.dumps(request).encode() + b"\n")
+            fh.flush()
+            return json.loads(fh.readline())
+
+
+def test_refused_in_other_directory(tmp_path):
+    path = tmp_path / "test.sock"
+    with running_server(path, lambda request: None):
+        assert "refused" in first_reply(path, {"cwd": "/elsewhere"})
+
+
+def test_refused_with_other_aws_env(tmp_path):
+    requests = []
+    path = tmp_path / "test.sock"
+    request = {"cwd": os.getcwd(), "aws": aws_identity({"AWS_PROFILE": "other"})}
+    with running_server(path, requests.append):
+        assert "refused" in first_reply(path, request)
+    assert requests == []
+
+
+def test_serve_synth_clears_caches(fake_aws, monkeypatch):
+    from cdktf_helpers import cli, server, state
+    from cdktf_helpers.settings.aws.defaults import default_vpc
+    from cdktf_helpers.state import cached_state_outputs
+
+    executors = []
+    monkeypatch.setattr(
+        cli, "run_synth_request", lambda request, executor: executors.append(executor)
+    )
+    monkeypatch.setattr(server, "forget_project_modules", lambda: None)
+    monkeypatch.setattr(state, "fetch_state_outputs", lambda bucket, key: {})
+    default_vpc()
+    cached_state_outputs("bucket", "dev.tfstate")
+    executor = object()
+    cli.serve_synth({}, executor=executor)
+    assert default_vpc.cache_info().currsize == 0
+    assert cached_state_outputs.cache_info().currsize == 0
+    # The server's threads, and their sessions, are used for each request
+    assert executors == [executor]
+
+
+def test_forwarded_env(monkeypatch):
+    monkeypatch.setenv("CDKTF_SERVER_ONLY", "server")
+    monkeypatch.setenv("OTHER", "server")
+    with forwarded_env({"CDKTF_OUTDIR": "client", "OTHER": "client"}):
+        assert os.environ["CDKTF_OUTDIR"] == "client"
+        assert "CDKTF_SERVER_ONLY" not in os.environ
+        assert os.environ["OTHER"] == "server"
+    assert "CDKTF_OUTDIR" not in os.environ
+    assert os.environ["CDKTF_SERVER_ONLY"] == "server"
+
+
+def test_line_writer():
+    sent = []
+    writer = LineWriter(sent.append)
+    writer.write("one\ntw")
+    writer.write("o\n")
+    writer.write("three")
+    writer.flush()
+    assert [m["output"] for m in sent] == ["one", "two", "three"]
+
+
+def test_forget_project_modules(tmp_path, monkeypatch):
+    (tmp_path / "project_stacks.py").write_text("VALUE = 1\n")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    import project_stacks
+
+    assert project_stacks.VALUE == 1
+    forget_project_modules()
+    assert "project_stacks" not in sys.modules
+    assert "pytest" in sys.modules
+
+
+def test_synth_uses_server(tmp_path, monkeypatch):
+    from typer.testing import CliRunner
+
+    from cdktf_helpers.cli import main
+
+    requests = []
+    path = tmp_path / "synth.sock"
+    monkeypatch.setenv("CDKTF_PYTHON_SOCKET", str(path))
+    monkeypatch.chdir(tmp_path)
+    arguments = ["synth", "--app", "testapp", "--environment", "dev"]
+    arguments += ["--stacks", "main.Stack", "--server"]
+    with running_server(path, requests.append):
+        result = CliRunner().invoke(main, arguments)
+    assert result.exit_code == 0
+    assert requests[0]["app"] == "testapp"
+    assert requests[0]["environments"] == ["dev"]
+    assert requests[0]["stacks"] == ["main.Stack"]
@@ -1,14 +1,16 @@
 import json
-from typing import List
+from typing import List, Optional
 
 import boto3
 import pytest
 from moto import mock_aws
 from pydantic import BaseModel, Field
 
+from cdktf_helpers.settings import AppSettings
 from cdktf_helpers.settings.aws import (
     AwsAppSettings,
     AwsResources,
+    LiteralEnvField,
     Subnet,
     SubnetsField,
     Vpc,
@@ -99,6 +101,38 @@ def test_as_env(settings):
     ]
 
 
+def test_as_secrets(ssm):
+    with mock_aws():
+
+        class Settings(AwsAppSettings):
+            password: str = "secret"
+            user: Optional[str] = "admin"
+            port: int = 8080
+            debug: bool = LiteralEnvField(False, description="Debug mode")
+            vpc: Vpc = VpcField()
+
+        settings = Settings(app="myapp", environment="dev")
+        assert settings.as_secrets() == [
+            {"name": "PORT", "valueFrom": "/myapp/dev/port"}
+        ]
+        # Strings, and resources' ids, would arrive JSON encoded, so stay
+        # inline unless asked for
+        assert settings.as_env(secrets=True) == [
+            {"name": "PASSWORD", "value": "secret"},
+            {"name": "USER", "value": "admin"},
+            {"name": "DEBUG", "value": "false"},
+            {"name": "VPC", "value": settings.vpc},
+        ]
+        assert settings.as_secrets(strings=True)[0] == {
+            "name": "PASSWORD",
+            "valueFrom": "/myapp/dev/password",
+        }
+        assert settings.as_env(secrets=True, strings=True) == [
+            {"name": "DEBUG", "value": "false"}
+        ]
+        assert len(settings.as_env()) == 5
+
+
 def test_save_settings(ssm):
     with mock_aws():
 
@@ -142,3 +176,50 @@ def test_subnets_setting():
 
         settings = Settings(app="testapp", environment="dev")
         assert all(value.id.startswith("subnet-") for value in settings.subnets)
+
+
+def test_field_metadata():
+    with mock_aws():
+
+        class Settings(AwsAppSettings):
+            vpc: Vpc = VpcField()
+            subnets: AwsResources[Subnet] = SubnetsField()
+            name: str = Field("x", description="A name")
+            required: int
+
+        class SubSettings(Settings):
+            extra: List[str] = []
+
+        fields = Settings.field_metadata(include_computed=True)
+        assert {name: meta.kind for name, meta in fields.items()} == {
+            "vpc": "resource",
+            "subnets": "resource_list",
+            "name": "plain",
+            "required": "plain",
+        }
+        assert fields["subnets"].resource_class is Subnet
+        assert fields["name"].description == "A name"
+        assert fields["name"].default_strategy == "value"
+        assert fields["vpc"].default_strategy == "factory"
+        assert fields["required"].required and fields["required"].default() is None
+
+        hidden = Settings.field_metadata(include_hidden=True, include_computed=True)
+        assert hidden["namespace"].kind == "computed" and hidden["namespace"].hidden
+        assert hidden["app"].hidden
+
+        # Worked out once per class, subclasses getting their own
+        assert Settings.field_metadata() is Settings.field_metadata()
+        assert "extra" not in Settings.field_metadata()
+        assert SubSettings.field_metadata()["extra"].is_list
+        assert list(SubSettings.get_model_fields()) == [*fields, "extra"]
+
+        # get_model_fields() hands out a copy callers are free to change
+        model_fields = SubSettings.get_model_fields()
+        del model_fields["extra"]
+        assert "extra" in SubSettings.get_model_fields()
+
+        # Only AWS settings tell resources apart
+        class PlainSettings(AppSettings):
+            vpc: Vpc
+
+        assert PlainSettings.field_metadata()["vpc"].kind == "plain"
@@ -0,0 +1,90 @@
+import json
+import os
+
+from cdktf_helpers.snapshots import (
+    MISSING,
+    SynthIndex,
+    compare_snapshot,
+    diff,
+    format_diff,
+)
+
+CONFIG = {
+    "//": {"metadata": {"version": "0.20.11"}},
+    "provider": {"aws": [{"region": "ap-southeast-2"}]},
+    "resource": {
+        "aws_instance": {
+            "web": {"ami": "ami-1", "instance_type": "t2.micro", "tags": {"a": "b"}},
+            "worker": {"ami": "ami-1", "instance_type": "t2.small"},
+        }
+    },
+    "output": {"ip": {"value": "${aws_instance.web.public_ip}"}},
+    "terraform": {"backend": {"local": {"path": f"{os.getcwd()}/state.tfstate"}}},
+}
+
+
+def changed(**resources):
+    config = json.loads(json.dumps(CONFIG))
+    config["resource"]["aws_instance"].update(resources)
+    config["resource"]["aws_instance"] = {
+        k: v for k, v in config["resource"]["aws_instance"].items() if v is not None
+    }
+    return config
+
+
+def test_index():
+    index = SynthIndex(json.dumps(CONFIG))
+    assert set(index.blocks) == {
+        "provider.aws",
+        "resource.aws_instance.web",
+        "resource.aws_instance.worker",
+        "output.ip",
+        "terraform",
+    }
+    assert index.blocks["terraform"]["backend"]["local"]["path"] == "state.tfstate"
+    assert index.has_resource_with_properties("aws_instance", {"tags": {"a": "b"}})
+    assert not index.has_resource_with_properties("aws_instance", {"ami": "ami-2"})
+
+
+def test_diff():
+    expected = SynthIndex(CONFIG)
+    assert diff(expected, SynthIndex(CONFIG)) == []
+
+    actual = SynthIndex(
+        changed(
+            web={"ami": "ami-2", "instance_type": "t2.micro"},
+            worker=None,
+            extra={"ami": "ami-1"},
+        )
+    )
+    changes = diff(expected, actual)
+    assert changes == [
+        ("resource.aws_instance.extra", MISSING, {"ami": "ami-1"}),
+        ("resource.aws_instance.web.ami", "ami-1", "ami-2"),
+        ("resource.aws_instance.web.tags", {"a": "b"}, MISSING),
+        (
+            "resource.aws_instance.worker",
+            {"ami": "ami-1", "instance_type": "t2.small"},
+            MISSING,
+        ),
+    ]
+    assert format_diff(changes).splitlines()[:2] == [
+        '+ resource.aws_instance.extra: {"ami": "ami-1"}',
+        '~ resource.aws_instance.web.ami: "ami-1" -> "ami-2"',
+    ]
+
+
+def test_compare_snapshot(tmp_path):
+    path = tmp_path / "snapshots" / "stack.json"
+    assert compare_snapshot(CONFIG, path)[1] is None
+
+    compare_snapshot(CONFIG, path, update=True)
+    assert "//" not in json.loads(path.read_text())
+    assert compare_snapshot(CONFIG, path)[1] == []
+
+    other = changed(worker=None)
+    assert [c[0] for c in compare_snapshot(other, path)[1]] == [
+        "resource.aws_instance.worker"
+    ]
+    compare_snapshot(other, path, update=True)
+    assert compare_snapshot(other, path)[1] == []
@@ -36,8 +36,287 @@ def test_should_contain_correct_instance(synthesized):
         )
 
 
-def test_check_validity(fully_synthesized):
+def test_snapshot(synthesized, snapshot):
+    from cdktf_cdktf_provider_aws.instance import Instance
+    from cdktf_cdktf_provider_aws.provider import AwsProvider
+
+    from .main import MyStack
+
+    class SnapshotStack(MyStack):
+        # The default region differs between machines
+        def register_provider(self):
+            AwsProvider(self, "AWS", region="ap-southeast-2")
+
+    with synthesized(SnapshotStack) as synthesized:
+        index = snapshot(synthesized)
+    assert index.has_resource_with_properties(
+        Instance.TF_RESOURCE_TYPE, {"instance_type": "t2.micro"}
+    )
+    assert "resource.aws_instance.compute" in index.blocks
+
+
+def test_build_profile(stack, build_profile):
+    from .main import MyStack
+
+    with stack(MyStack):
+        pass
+
+    # The provider is created outside of build()
+    assert build_profile.count("AwsProvider") == 0
+    assert build_profile.count("Instance") == 1
+    assert build_profile.count("TerraformOutput") == 1
+    modules = dict(build_profile.by_module())
+    assert modules["cdktf_cdktf_provider_aws.instance"]["count"] == 1
+    assert build_profile.resources["aws_instance"]["count"] == 1
+    assert build_profile.resources["aws_instance"]["bytes"] > 0
+    assert "aws_instance" in build_profile.format()
+
+
+def test_synthesized_memoized(synthesized, fully_synthesized):
+    import os
+
+    from moto import mock_aws
+
+    from cdktf_helpers.settings.aws import AwsAppSettings
+    from cdktf_helpers.stacks import AwsS3StateStack
+
+    builds = []
+
+    class CountingStack(AwsS3StateStack[AwsAppSettings]):
+        def build(self):
+            builds.append(self.settings.environment)
+
+    with synthesized(CountingStack) as first, synthesized(CountingStack) as second:
+        assert first is second
+    assert builds == ["dev"]
+
+    with mock_aws():
+        test_settings = AwsAppSettings(app="app", environment="test")
+    with synthesized(CountingStack, test_settings):
+        pass
+    with synthesized(CountingStack, memoize=False):
+        pass
+    assert builds == ["dev", "test", "dev"]
+
+    with fully_synthesized(CountingStack) as outdir:
+        manifest = os.path.join(outdir, "manifest.json")
+        assert not os.stat(manifest).st_mode & 0o222
+
+
+def test_check_validity(fully_synthesized, valid_terraform):
     from .main import MyStack
 
     with fully_synthesized(MyStack) as fully_synthesized:
-        assert Testing.to_be_valid_terraform(fully_synthesized)
+        assert valid_terraform(fully_synthesized)
+
+
+def test_remote_outputs(monkeypatch):
+    import json
+
+    import boto3
+    from cdktf import LocalBackend, TerraformOutput
+    from moto import mock_aws
+
+    from cdktf_helpers.settings.aws import AwsAppSettings, ensure_backend_resources
+    from cdktf_helpers.stacks import AwsS3StateStack
+    from cdktf_helpers.state import cached_state_outputs
+
+    class Producer(AwsS3StateStack[AwsAppSettings]):
+        pass
+
+    class Consumer(AwsS3StateStack[AwsAppSettings]):
+        @classmethod
+        def format_s3_key(cls, environment):
+            return f"consumer/{environment}"
+
+        def build(self):
+            by_token = self.remote_outputs(Producer)
+            assert self.remote_outputs(Producer) is by_token
+            TerraformOutput(self, "token", value=by_token.get_string("url"))
+
+            inlined = self.remote_outputs(Producer, inline=True)
+            TerraformOutput(self, "inlined", value=inlined["url"])
+
+    monkeypatch.setattr(
+        AwsS3StateStack, "register_backend", lambda self: LocalBackend(self)
+    )
+    cached_state_outputs.cache_clear()
+    with mock_aws():
+        bucket = AwsS3StateStack.format_s3_bucket_name("app")
+        ensure_backend_resources(bucket, "table")
+        state = {"outputs": {"url": {"value": "http://example.com"}}}
+        boto3.client("s3").put_object(
+            Bucket=bucket, Key="dev.tfstate", Body=json.dumps(state).encode()
+        )
+        settings = AwsAppSettings(app="app", environment="dev")
+        synthesized = json.loads(
+            Testing.synth(Consumer(Testing.app(), "consumer", settings))
+        )
+
+    remote_state = synthesized["data"]["terraform_remote_state"]
+    assert len(remote_state) == 1
+    (config,) = remote_state.values()
+    assert config["config"]["bucket"] == bucket
+    assert config["config"]["key"] == "dev.tfstate"
+    assert synthesized["output"]["inlined"]["value"] == "http://example.com"
+    assert "terraform_remote_state" in synthesized["output"]["token"]["value"]
+
+
+def test_remote_outputs_own_state(monkeypatch):
+    import pytest
+    from cdktf import LocalBackend
+    from moto import mock_aws
+
+    from cdktf_helpers.settings.aws import AwsAppSettings
+    from cdktf_helpers.stacks import AwsS3StateStack
+
+    class Producer(AwsS3StateStack[AwsAppSettings]):
+        pass
+
+    class Consumer(AwsS3StateStack[AwsAppSettings]):
+        def build(self):
+            self.remote_outputs(Producer)
+
+    monkeypatch.setattr(
+        AwsS3StateStack, "register_backend", lambda self: LocalBackend(self)
+    )
+    with mock_aws(), pytest.raises(ValueError, match="override format_s3_key"):
+        settings = AwsAppSettings(app="app", environment="dev")
+        Consumer(Testing.app(), "Consumer", settings)
+
+
+def test_remote_outputs_other_bucket(monkeypatch):
+    import json
+
+    import boto3
+    from cdktf import LocalBackend, TerraformOutput
+    from moto import mock_aws
+
+    from cdktf_helpers.settings.aws import AwsAppSettings, ensure_backend_resources
+    from cdktf_helpers.stacks import AwsS3StateStack
+    from cdktf_helpers.state import cached_state_outputs
+
+    class Producer(AwsS3StateStack[AwsAppSettings]):
+        @classmethod
+        def format_s3_bucket_name(cls, app):
+            return f"{app}-producer-tfstate"
+
+    class Consumer(AwsS3StateStack[AwsAppSettings]):
+        def build(self):
+            by_token = self.remote_outputs(Producer)
+            TerraformOutput(self, "token", value=by_token.get_string("url"))
+            inlined = self.remote_outputs(Producer, inline=True)
+            TerraformOutput(self, "inlined", value=inlined["url"])
+
+    monkeypatch.setattr(
+        AwsS3StateStack, "register_backend", lambda self: LocalBackend(self)
+    )
+    cached_state_outputs.cache_clear()
+    with mock_aws():
+        bucket = Producer.format_s3_bucket_name("app")
+        ensure_backend_resources(bucket, "table")
+        state = {"outputs": {"url": {"value": "http://example.com"}}}
+        boto3.client("s3").put_object(
+            Bucket=bucket, Key="dev.tfstate", Body=json.dumps(state).encode()
+        )
+        settings = AwsAppSettings(app="app", environment="dev")
+        app = Testing.app()
+        # Added ahead of the producer, which it still depends on
+        consumer = Consumer(app, "Consumer", settings)
+        producer = Producer(app, "Producer", settings)
+        synthesized = json.loads(Testing.synth(consumer))
+    cached_state_outputs.cache_clear()
+
+    (config,) = synthesized["data"]["terraform_remote_state"].values()
+    assert config["config"]["bucket"] == bucket
+    assert synthesized["output"]["inlined"]["value"] == "http://example.com"
+    assert consumer.dependencies == [producer]
+
+
+def test_deferred_settings(monkeypatch, fake_aws):
+    import json
+    from typing import Optional
+
+    from cdktf import LocalBackend, TerraformOutput
+    from cdktf_cdktf_provider_aws.instance import Instance
+
+    from cdktf_helpers.settings import computed_field
+    from cdktf_helpers.settings.aws import (
+        AwsAppSettings,
+        DeferredSettings,
+        EagerField,
+        Vpc,
+        VpcField,
+    )
+    from cdktf_helpers.stacks import AwsS3StateStack
+
+    class Settings(AwsAppSettings):
+        ami: str
+        instance_type: str = "t2.micro"
+        volume_size: int = 8
+        instances: int = EagerField(1)
+        monitoring: bool = False
+        key_name: Optional[str] = None
+        vpc: Vpc = VpcField()
+
+        @computed_field("Name tag")
+        def name(self) -> str:
+            return self.ami.upper()
+
+    class Stack(AwsS3StateStack[Settings]):
+        deferred_settings = True
+
+        def build(self):
+            for i in range(self.settings.instances):
+                Instance(
+                    self,
+                    f"web{i}",
+                    ami=self.settings.ami,
+                    instance_type=self.settings.instance_type,
+                    root_block_device={"volume_size": self.settings.volume_size},
+                    key_name=self.settings.key_name,
+                    tags={"Name": self.settings.name},
+                )
+            if self.settings.monitoring:
+                TerraformOutput(self, "monitoring", value="on")
+            TerraformOutput(self, "vpc", value=self.settings.vpc.id)
+
+    monkeypatch.setattr(Stack, "register_backend", lambda self: LocalBackend(self))
+    Settings(app="app", environment="dev", ami="ami-1", instances=2).save()
+
+    settings = DeferredSettings(Settings, "app", "dev")
+    assert set(settings.eager_values()) == {"instances", "monitoring", "vpc"}
+    assert settings.eager_values()["monitoring"] is False
+    assert settings.computed_values() == {"name": "AMI-1"}
+    assert settings.as_dict()["instances"] == 2
+    synthesized = json.loads(Testing.synth(Stack(Testing.app(), "stack", settings)))
+
+    data = synthesized["data"]["aws_ssm_parameters_by_path"]["settings"]
+    assert data["path"] == "/app/dev/"
+    instances = synthesized["resource"]["aws_instance"]
+    assert set(instances) == {"web0", "web1"}
+    by_name = "zipmap(data.aws_ssm_parameters_by_path.settings.names"
+    assert by_name in instances["web0"]["ami"]
+    assert '["/app/dev/ami"]' in instances["web0"]["ami"]
+    default = '"/app/dev/instance_type", jsonencode("t2.micro")'
+    assert default in instances["web0"]["instance_type"]
+    assert by_name in instances["web0"]["root_block_device"]["volume_size"]
+    # Optional fields are deferred as their inner type
+    assert '"/app/dev/key_name", "null")' in instances["web0"]["key_name"]
+    assert instances["web0"]["tags"] == {"Name": "AMI-1"}
+    assert "monitoring" not in synthesized["output"]
+    assert synthesized["output"]["vpc"]["value"].startswith("vpc-")
+
+
+def test_deferred_settings_unsupported_type(fake_aws):
+    import pytest
+    from cdktf import App
+
+    from cdktf_helpers.settings.aws import AwsAppSettings, DeferredSettings
+    from cdktf_helpers.stacks import AwsS3StateStack
+
+    class Settings(AwsAppSettings):
+        labels: dict[str, str] = {}
+
+    with pytest.raises(TypeError, match="Can't defer labels"):
+        AwsS3StateStack(App(), "stack", DeferredSettings(Settings, "app", "dev"))
@@ -0,0 +1,52 @@
+import re
+import subprocess
+import sys
+
+import pytest
+
+# Packages that are slow to import. cdktf and constructs start the jsii Node
+# runtime as a side effect.
+HEAVY = {"boto3", "botocore", "cdktf", "constructs", "jsii", "pydantic", "tabulate"}
+
+# Generous upper bound on total import time. The heavy packages alone take
+# well over a second.
+BUDGET_SECONDS = 0.75
+
+RUN_CLI = "import sys; from cdktf_helpers.cli import main; main(sys.argv[1:])"
+
+
+def import_times(*args):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", RUN_CLI, *args],
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    times = {}
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \|( *)(\S+)", line)
+        if match:
+            cumulative, indent, module = match.groups()
+            times[module] = (int(cumulative) / 1e6, len(indent))
+    return times
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ["--help"],
+        ["synth", "--help"],
+        ["settings", "--help"],
+        ["backend", "--help"],
+        ["backend", "locks", "--help"],
+        ["output", "--help"],
+    ],
+)
+def test_startup(args):
+    times = import_times(*args)
+
+    heavy = {name for name in times if name.split(".")[0] in HEAVY}
+    assert not heavy, f"cdktf-python {' '.join(args)} imported {sorted(heavy)}"
+
+    total = sum(seconds for seconds, indent in times.values() if indent == 1)
+    assert total < BUDGET_SECONDS
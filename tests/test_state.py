@@ -0,0 +1,241 @@
+import hashlib
+import io
+import json
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from cdktf_helpers.settings.aws import ensure_backend_resources
+from cdktf_helpers.settings.aws.utils import boto3_session, set_session_provider
+from cdktf_helpers.state import (
+    break_lock,
+    fetch_locks,
+    fetch_state_outputs,
+    fetch_state_stats,
+    lock_contention,
+    migrate_states,
+    outputs_cache_file,
+    parse_timestamp,
+    plan_migration,
+    state_stats,
+)
+
+BUCKET = "testapp-tfstate"
+TABLE = "TestappTfstate"
+
+
+def put_lock(path, who="andy@laptop", age=0, operation="OperationTypeApply"):
+    created = datetime.now(timezone.utc) - timedelta(seconds=age)
+    info = {
+        "ID": f"id-{path}",
+        "Operation": operation,
+        "Info": "",
+        "Who": who,
+        "Version": "1.5.7",
+        "Created": created.strftime("%Y-%m-%dT%H:%M:%S.%f123Z"),
+        "Path": path,
+    }
+    boto3_session().client("dynamodb").put_item(
+        TableName=TABLE,
+        Item={"LockID": {"S": path}, "Info": {"S": json.dumps(info)}},
+    )
+
+
+def precondition_failed(**kwargs):
+    error = {"Code": "PreconditionFailed", "Message": "At least one failed"}
+    response = SimpleNamespace(status_code=412, headers={})
+    return response, {"Error": error, "ResponseMetadata": {"HTTPStatusCode": 412}}
+
+
+@pytest.fixture()
+def backend():
+    with mock_aws():
+        ensure_backend_resources(BUCKET, TABLE)
+        yield
+
+
+def test_parse_timestamp():
+    value = parse_timestamp("2025-01-02T03:04:05.123456789Z")
+    assert value == datetime(2025, 1, 2, 3, 4, 5, 123456, tzinfo=timezone.utc)
+    assert parse_timestamp("not a date") is None
+
+
+def test_fetch_locks(backend):
+    put_lock(f"{BUCKET}/dev.tfstate", age=120)
+    put_lock(f"{BUCKET}/prod.tfstate", who="ci@runner")
+    boto3_session().client("dynamodb").put_item(
+        TableName=TABLE,
+        Item={
+            "LockID": {"S": f"{BUCKET}/dev.tfstate-md5"},
+            "Digest": {"S": "abc123"},
+        },
+    )
+
+    locks = fetch_locks(TABLE)
+
+    assert [lock["path"] for lock in locks] == [
+        f"{BUCKET}/dev.tfstate",
+        f"{BUCKET}/prod.tfstate",
+    ]
+    assert locks[0]["operation"] == "OperationTypeApply"
+    assert 119 < locks[0]["age"] < 180
+    assert locks[1]["who"] == "ci@runner"
+
+
+def test_break_lock(backend):
+    put_lock(f"{BUCKET}/dev.tfstate", age=3600)
+    (lock,) = fetch_locks(TABLE)
+
+    # Lock was released and taken again since we looked, leave it alone
+    put_lock(f"{BUCKET}/dev.tfstate", who="someone@else")
+    assert not break_lock(TABLE, lock)
+
+    (lock,) = fetch_locks(TABLE)
+    assert break_lock(TABLE, lock)
+    assert fetch_locks(TABLE) == []
+
+
+def test_lock_contention():
+    def lock(path, id, who):
+        return {"path": path, "id": id, "who": who, "age": 10}
+
+    samples = [
+        [lock("a", "1", "andy"), lock("b", "2", "ci")],
+        [lock("a", "3", "ci")],
+    ]
+    metrics = lock_contention(samples)
+    assert metrics["a"]["locked_ratio"] == 1
+    assert metrics["a"]["distinct_locks"] == 2
+    assert metrics["a"]["distinct_holders"] == 2
+    assert metrics["b"]["locked_ratio"] == 0.5
+
+
+def make_state(resources):
+    return json.dumps(
+        {
+            "version": 4,
+            "outputs": {"name": {"value": "x" * 1000, "type": "string"}},
+            "resources": resources,
+        }
+    ).encode()
+
+
+def test_state_stats():
+    state = make_state(
+        [
+            {"mode": "managed", "type": "aws_instance", "instances": [{}, {}]},
+            {"mode": "data", "type": "aws_vpc", "instances": [{}]},
+            {
+                "module": "module.web",
+                "mode": "managed",
+                "type": "aws_instance",
+                "instances": [{"attributes": {"id": "i-123"}}],
+            },
+        ]
+    )
+    stats = state_stats(io.BytesIO(state))
+    assert stats["resources"] == 3
+    assert stats["instances"] == 4
+    assert stats["types"] == {"aws_instance": 2, "data.aws_vpc": 1}
+    assert stats["modules"] == {"root": 2, "module.web": 1}
+
+
+def test_fetch_state_stats(backend):
+    s3 = boto3_session().client("s3")
+    s3.put_object(Bucket=BUCKET, Key="dev.tfstate", Body=make_state([]))
+    s3.put_object(
+        Bucket=BUCKET,
+        Key="prod.tfstate",
+        Body=make_state([{"type": "aws_instance", "instances": [{}]}]),
+    )
+    s3.put_object(Bucket=BUCKET, Key="notes.txt", Body=b"not state")
+
+    stats = {s["key"]: s for s in fetch_state_stats(BUCKET)}
+    assert set(stats) == {"dev.tfstate", "prod.tfstate"}
+    assert stats["prod.tfstate"]["resources"] == 1
+    assert stats["dev.tfstate"]["size"] == len(make_state([]))
+
+
+def test_fetch_state_outputs(backend):
+    s3 = boto3_session().client("s3")
+    s3.put_object(Bucket=BUCKET, Key="dev.tfstate", Body=make_state([]))
+
+    outputs = fetch_state_outputs(BUCKET, "dev.tfstate")
+    assert outputs["name"]["value"] == "x" * 1000
+    assert fetch_state_outputs(BUCKET, "missing.tfstate") is None
+
+    # Unchanged state is served from the cache without reading the body
+    cache_file = outputs_cache_file(BUCKET, "dev.tfstate")
+    cached = json.loads(cache_file.read_text())
+    cached["outputs"]["name"]["value"] = "from cache"
+    cache_file.write_text(json.dumps(cached))
+    assert fetch_state_outputs(BUCKET, "dev.tfstate")["name"]["value"] == "from cache"
+
+    # A new state version invalidates the cache
+    state = json.dumps({"outputs": {"name": {"value": "new", "type": "string"}}})
+    s3.put_object(Bucket=BUCKET, Key="dev.tfstate", Body=state.encode())
+    assert fetch_state_outputs(BUCKET, "dev.tfstate")["name"]["value"] == "new"
+
+    # As does deleting the state
+    s3.delete_object(Bucket=BUCKET, Key="dev.tfstate")
+    assert fetch_state_outputs(BUCKET, "dev.tfstate") is None
+    assert not cache_file.exists()
+
+
+def test_migrate_states(backend):
+    s3 = boto3_session().client("s3")
+    dynamodb = boto3_session().client("dynamodb")
+    state = make_state([])
+    s3.put_object(Bucket=BUCKET, Key="dev.tfstate", Body=state)
+    s3.put_object(Bucket=BUCKET, Key="prod.tfstate", Body=state)
+    dynamodb.put_item(
+        TableName=TABLE,
+        Item={
+            "LockID": {"S": f"{BUCKET}/dev.tfstate-md5"},
+            "Digest": {"S": hashlib.md5(state).hexdigest()},
+        },
+    )
+    put_lock(f"{BUCKET}/prod.tfstate")
+    ensure_backend_resources("newapp-tfstate", "NewappTfstate")
+
+    plan = plan_migration(BUCKET, "newapp-tfstate")
+    assert {e["dest_key"] for e in plan} == {"dev.tfstate", "prod.tfstate"}
+    assert not any(e["dest_exists"] for e in plan)
+
+    results = migrate_states(BUCKET, TABLE, "newapp-tfstate", "NewappTfstate", plan)
+    status = {r["source_key"]: r["status"] for r in results}
+    assert status == {"dev.tfstate": "copied", "prod.tfstate": "locked"}
+
+    copied = s3.get_object(Bucket="newapp-tfstate", Key="dev.tfstate")
+    assert copied["Body"].read() == state
+    digest = dynamodb.get_item(
+        TableName="NewappTfstate",
+        Key={"LockID": {"S": "newapp-tfstate/dev.tfstate-md5"}},
+    )
+    assert digest["Item"]["Digest"]["S"] == hashlib.md5(state).hexdigest()
+
+    # Sources written to after planning are left alone. moto doesn't check
+    # CopySourceIfMatch, so S3's response is stood in for
+    plan = plan_migration(BUCKET, "newapp-tfstate", {"dev.tfstate": "dev.tfstate"})
+    s3.put_object(Bucket=BUCKET, Key="dev.tfstate", Body=make_state([{}]))
+    session = boto3.Session()
+    session.events.register("before-call.s3.CopyObject", precondition_failed)
+    previous = set_session_provider(lambda: session)
+    try:
+        results = migrate_states(
+            BUCKET, TABLE, "newapp-tfstate", "NewappTfstate", plan, workers=1
+        )
+    finally:
+        set_session_provider(previous)
+    assert [r["status"] for r in results] == ["changed"]
+
+    # Renaming keys within the same bucket
+    plan = plan_migration(BUCKET, BUCKET, {"dev.tfstate": "web/dev.tfstate"})
+    assert [(e["source_key"], e["dest_key"]) for e in plan] == [
+        ("dev.tfstate", "web/dev.tfstate")
+    ]
+    with pytest.raises(ValueError):
+        plan_migration(BUCKET, BUCKET, {"missing.tfstate": "x.tfstate"})
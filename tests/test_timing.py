@@ -0,0 +1,68 @@
+import json
+import threading
+import time
+
+from cdktf_helpers.timing import (
+    format_timings,
+    is_recording,
+    recording,
+    span,
+    summarise,
+    write_trace,
+)
+
+
+def record():
+    with recording() as spans, span("run"):
+        for _ in range(2):
+            with span("step", size=1):
+                time.sleep(0.01)
+
+        def work():
+            with span("work"):
+                pass
+
+        worker = threading.Thread(target=work, name="worker")
+        worker.start()
+        worker.join()
+    return spans
+
+
+def test_span_not_recording():
+    assert not is_recording()
+    with span("ignored"):
+        pass
+
+
+def test_summarise():
+    phases = summarise(record())
+    assert [p["path"] for p in phases] == [
+        ("run",),
+        ("run", "step"),
+        ("run", "work"),
+    ]
+    assert phases[1]["calls"] == 2
+    assert phases[1]["seconds"] >= 0.02
+    assert phases[0]["seconds"] >= phases[1]["seconds"]
+
+
+def test_format_timings():
+    lines = format_timings(record()).splitlines()
+    assert lines[2].split()[:2] == ["run", "1"]
+    assert lines[2].endswith("100%")
+    assert lines[3].split()[:3] == ["·", "step", "2"]
+
+
+def test_write_trace(tmp_path):
+    path = tmp_path / "trace.json"
+    write_trace(record(), path)
+    events = json.loads(path.read_text())["traceEvents"]
+
+    spans = [e for e in events if e["ph"] == "X"]
+    assert [e["name"] for e in spans] == ["run", "step", "step", "work"]
+    assert spans[0]["ts"] == 0
+    assert spans[1]["args"] == {"size": "1"}
+    assert spans[3]["tid"] != spans[0]["tid"]
+
+    threads = {e["args"]["name"] for e in events if e["ph"] == "M"}
+    assert "worker" in threads